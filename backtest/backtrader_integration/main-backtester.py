@@ -3,10 +3,13 @@ import argparse
 from datetime import datetime
 
 import backtrader as bt
-from pandas import read_pickle
+from pandas import Timedelta, Timestamp
 
+from polaristools.datasetstore import open_store
 from strategies import mystrategies
 
+DATASETS_DIR = '/home/llagask/Trading/polaris_beta/datasets'
+
 
 class PandasData_Extend(bt.feeds.PandasData):
     lines = (
@@ -26,8 +29,20 @@ class PandasData_Extend(bt.feeds.PandasData):
     )
 
 
-def add_data_to_cerebro(sample, symbol:str, timeframe:str):
-    df = read_pickle(f"/home/llagask/Trading/polaris_beta/datasets/df_continuous_klines_{symbol.upper()}_{timeframe}.pckl")
+def add_data_to_cerebro(sample, symbol:str, timeframe:str, dataformat:str='pickle'):
+    filename = f"df_continuous_klines_{symbol.upper()}_{timeframe}"
+    store = open_store(dataformat, DATASETS_DIR)
+    if isinstance(sample, dict):
+        # Columnar formats only read the files holding the window, end date included as in .loc
+        end = sample.get('end')
+        df = store.read(
+            filename,
+            start = sample.get('start'),
+            end = Timestamp(end) + Timedelta(days=1) if end else None,
+        )
+    else:
+        # pickle segments appended by dataframes-as-binary.py are merged in.
+        df = store.read(filename)
     if isinstance(sample, dict):
         df = df.loc[sample.get('start') : sample.get('end')]
     elif isinstance(sample, int):
@@ -100,20 +115,20 @@ def run_cerebro(args=None):
             # hilo=False, autosize=20.0, align=1.0,
         )
         if renko_dual:
-            data = add_data_to_cerebro(sample=sample, symbol=arg.symbol, timeframe='1d')
+            data = add_data_to_cerebro(sample=sample, symbol=arg.symbol, timeframe='1d', dataformat=arg.dataformat)
             cerebro.adddata(data)
             data1 = data.clone()
             data1.addfilter(bt.filters.Renko,**filter_kwargs)
             cerebro.adddata(data1)
         else:
-            data = add_data_to_cerebro(sample=sample, symbol=arg.symbol, timeframe='1d')
+            data = add_data_to_cerebro(sample=sample, symbol=arg.symbol, timeframe='1d', dataformat=arg.dataformat)
             cerebro.adddata(data)
             data.addfilter(bt.filters.Renko,**filter_kwargs)
         
     elif heikinashi:
         plot_args = dict(style='candle')
         filter_kwargs = dict()
-        data = add_data_to_cerebro(sample=sample, symbol=arg.symbol, timeframe='1d')
+        data = add_data_to_cerebro(sample=sample, symbol=arg.symbol, timeframe='1d', dataformat=arg.dataformat)
         data.addfilter(bt.filters.HeikinAshi, **filter_kwargs)
         cerebro.adddata(data)
     
@@ -125,12 +140,12 @@ def run_cerebro(args=None):
                 sample_mins = int((1440/ int(arg.timeframe[:-1]) )*arg.sample_batch)
             else:
                 sample_mins = sample
-            data0 = add_data_to_cerebro(sample=sample_mins, symbol=arg.symbol, timeframe=arg.timeframe)
-            data1 = add_data_to_cerebro(sample=sample, symbol=arg.symbol, timeframe='1d')
+            data0 = add_data_to_cerebro(sample=sample_mins, symbol=arg.symbol, timeframe=arg.timeframe, dataformat=arg.dataformat)
+            data1 = add_data_to_cerebro(sample=sample, symbol=arg.symbol, timeframe='1d', dataformat=arg.dataformat)
             cerebro.adddata(data0)
             cerebro.adddata(data1)
         else:
-            data0 = add_data_to_cerebro(sample=sample, symbol=arg.symbol, timeframe=arg.timeframe)
+            data0 = add_data_to_cerebro(sample=sample, symbol=arg.symbol, timeframe=arg.timeframe, dataformat=arg.dataformat)
             cerebro.adddata(data0)
     
     # RETRIEVE STRATEGY PARAMETERS FROM CLI.
@@ -212,6 +227,12 @@ def parse_inputs(pargs=None):
         # default='',
         help="e.g: start='2022-01-01',end='2022-06-01' "
     )
+    parser.add_argument('--dataformat',
+        action='store',
+        choices=['pickle', 'parquet', 'memmap'],
+        default='pickle',
+        help='Dataset format written by datasets/dataframes-as-binary.py'
+    )
     parser.add_argument('--sample_batch',
         action='store',
         type=int,
@@ -7,11 +7,66 @@ import backtrader as bt
 from numpy import nan as npnan
 import pandas as pd
 
+from polaristools.indicators import family_columns
 from polaristools.polarisbot import PolarisBot
 from strategies import mystrategies
 
 
+# Precomputed columns the feed can carry: talib_EMA_5 ... talib_EMA_100,
+# talib_AROON_down_5 ... talib_AROON_up_100. A fixed set keeps the feed
+# class at module level, where the optimization pool can pickle it.
+FAMILY_PERIODS = range(5, 101, 5)
+FAMILY_COLUMNS = tuple(
+    column
+    for name in mystrategies.AroonPlusMa.families
+    for period in FAMILY_PERIODS
+    for column in family_columns(name, period)
+)
+
+class PandasDataFamilies(bt.feeds.PandasData):
+    ''' 
+        PandasData with one line per FAMILY_COLUMNS column,
+        the ones missing from the frame stay empty.
+        '''
+    lines = FAMILY_COLUMNS
+    params = tuple((column, -1) for column in FAMILY_COLUMNS)
+
+def sample_range(sample:dict)->dict:
+    ''' 
+        {start, end} sample, end inclusive as with .loc (a date string covers
+        its whole day / month), to the [start, end) date_range of dataframeFromBinary.
+        '''
+    if not sample:
+        return {}
+    end = sample.get('end')
+    if isinstance(end, str):
+        end = pd.Period(end).end_time + pd.Timedelta(1, 'ns')
+    elif end is not None:
+        end = pd.Timestamp(end) + pd.Timedelta(1, 'ns')
+    return dict(start=sample.get('start'), end=end)
+
+def add_indicator_families(polaris, df, custom_strategy, parameters:dict, dataset:str=None):
+    ''' 
+        Every period swept by the grid computed once, e.g ema=range(10,51,5)
+        adds talib_EMA_10 ... talib_EMA_50. Returns the frame and the added columns.
+        '''
+    columns = []
+    for name, param in getattr(custom_strategy, 'families', {}).items():
+        periods = parameters.get(param)
+        if periods is None:
+            continue
+        periods = list(periods) if isinstance(periods, (list, tuple, range)) else [periods]
+        unknown = [period for period in periods if family_columns(name, period)[0] not in FAMILY_COLUMNS]
+        if unknown:
+            raise ValueError(f'{name} periods {unknown} have no PandasDataFamilies line, expected {FAMILY_PERIODS}')
+        before = set(df.columns)
+        df = polaris.addIndicatorFamily(df, name, periods, dataset=dataset)
+        columns += [column for column in df.columns if column not in before]
+    return df, columns
+
+
 def optimization(
+                polaris:PolarisBot,
                 symbol:str,
                 timeframe:str,
                 cash:int,
@@ -19,7 +74,8 @@ def optimization(
                 comm:float,
                 sample:dict,
                 custom_strategy:mystrategies,
-                parameters:dict
+                parameters:dict,
+                dataformat:str='pickle',
                 ):
     cerebro = bt.Cerebro()
     
@@ -33,16 +89,20 @@ def optimization(
         tframe = bt.TimeFrame.Minutes
     
     filename = f'df_klines_{symbol}_{timeframe}'
-    df = polaris.dataframeFromBinary(filename)
-    if sample:
-        df = df.loc[sample.get('start'):sample.get('end')].copy()
+    # Only the sample window is read from disk.
+    df = polaris.dataframeFromBinary(filename, fmt=dataformat, date_range=sample_range(sample))
     
-    feed = bt.feeds.PandasData(dataname=df, timeframe=tframe, compression = int(timeframe[:-1]))
+    # Indicators of every grid point computed here once, not in each strategy instance.
+    df, columns = add_indicator_families(polaris, df, custom_strategy, parameters, dataset=filename)
+    feed_class = PandasDataFamilies if columns else bt.feeds.PandasData
+    feed = feed_class(dataname=df, timeframe=tframe, compression = int(timeframe[:-1]))
     cerebro.adddata(feed)
     
     cerebro.addanalyzer(bt.analyzers.TradeAnalyzer, _name='tradeanalyzer')
     cerebro.addanalyzer(bt.analyzers.DrawDown, _name='drawdown')
     
+    if columns:
+        parameters = dict(parameters, precomputed=True)
     cerebro.optstrategy(custom_strategy, **parameters)
     backtests = cerebro.run()
     
@@ -114,7 +174,7 @@ def filter_results(dataframe, symbol:str, timeframe:str, by_col:str):
     best_horse = pd.concat([best5,worse3], keys=[bs, ws], axis=0)
     return best_horse
 
-def loop_optimizations(backtest_params, symbols, timeframes):
+def loop_optimizations(polaris, backtest_params, symbols, timeframes):
     # Store each results Dataframe here.
     symbols_df = pd.DataFrame()
     
@@ -137,7 +197,7 @@ def loop_optimizations(backtest_params, symbols, timeframes):
             backt_params.update(dict(symbol=symbol, timeframe=timeframe))
             
             # RUN BACKTEST.
-            backtest = optimization(**backt_params)
+            backtest = optimization(polaris, **backt_params)
             
             # *Update rolling values.
             # if idx==0:
@@ -196,10 +256,12 @@ if __name__== '__main__':
         comm = 0.05,
         sample = {'start':'2022-01-01', 'end':'2022-08-25'},
         custom_strategy = mystrategies.AroonPlusMa,
-        parameters = hyp_params
+        parameters = hyp_params,
+        dataformat = 'pickle', # memmap: instant load, page cache shared by every run.
     )
     
     opts_df = loop_optimizations(
+        polaris=polaris,
         symbols=symbols,
         timeframes=timeframes,
         backtest_params=backtest_params,
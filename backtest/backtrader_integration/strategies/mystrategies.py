@@ -336,8 +336,12 @@ class Indicators(bt.Strategy):
 
 # TRADING STRATEGIES ######################################
 class AroonPlusMa(bt.Strategy):
+    # Indicator families the optimizer may precompute: {indicator: period param}.
+    families = dict(talib_EMA='ema', talib_AROON='aroon_timeperiod')
     params = dict(
             verbose = False,
+            # Read talib_EMA_{ema} / talib_AROON_*_{aroon_timeperiod} from the data feed.
+            precomputed = False,
             
             futures_like = True,
             enter_long = False,
@@ -360,15 +364,22 @@ class AroonPlusMa(bt.Strategy):
         print(message)        
     
     def __init__(self):
-        self.aroon = bt.talib.AROON(
-            self.data.high,
-            self.data.low,
-            timeperiod = self.p.aroon_timeperiod,
-        )
-        self.ema = bt.talib.EMA(timeperiod=self.p.ema)
+        if self.p.precomputed:
+            # Columns computed once per optimization run, shared by every grid point.
+            aroonup = getattr(self.data, f'talib_AROON_up_{self.p.aroon_timeperiod}')
+            aroondown = getattr(self.data, f'talib_AROON_down_{self.p.aroon_timeperiod}')
+            self.ema = getattr(self.data, f'talib_EMA_{self.p.ema}')
+        else:
+            self.aroon = bt.talib.AROON(
+                self.data.high,
+                self.data.low,
+                timeperiod = self.p.aroon_timeperiod,
+            )
+            aroonup, aroondown = self.aroon.aroonup, self.aroon.aroondown
+            self.ema = bt.talib.EMA(timeperiod=self.p.ema)
         
-        self.cross_up = bt.ind.CrossUp(self.aroon.aroonup, self.aroon.aroondown)
-        self.cross_down = bt.ind.CrossDown(self.aroon.aroonup, self.aroon.aroondown)
+        self.cross_up = bt.ind.CrossUp(aroonup, aroondown)
+        self.cross_down = bt.ind.CrossDown(aroonup, aroondown)
         
         self.market_direction = None
     
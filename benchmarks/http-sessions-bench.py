@@ -0,0 +1,73 @@
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+from time import perf_counter
+
+import requests
+
+from polaristools.binanceconnection import BinanceConnection
+
+''' 
+    Requests/sec against a local stub server:
+    module-level requests.get (one connection per call)
+    vs BinanceConnection pooled keep-alive sessions.
+    
+    The stub speaks plain HTTP, so only the TCP handshake is saved here.
+    Against api.binance.com every saved connection is also a TLS handshake.
+    '''
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out in separate writes, with Nagle on every
+    # keep-alive request would wait for a delayed ACK (~40 ms).
+    disable_nagle_algorithm = True
+    body = b'{"serverTime": 1499827319559}'
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(self.body)))
+        if self.headers.get('Connection', '').lower() == 'close':
+            # Announce it as real servers do, so the client does not reuse the socket.
+            self.send_header('Connection', 'close')
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def run_stub():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_port}'
+
+def bench(label, func, calls):
+    start = perf_counter()
+    for _ in range(calls):
+        func()
+    elapsed = perf_counter() - start
+    print(f'{label:<30} {calls/elapsed:>10.1f} req/s')
+
+def parse_inputs(pargs=None):
+    parser = argparse.ArgumentParser(description='HTTP session pooling benchmark')
+    parser.add_argument('--calls', type=int, default=2000)
+    return parser.parse_args(pargs)
+
+
+if __name__== '__main__':
+    arg = parse_inputs()
+    server, stub_url = run_stub()
+    endpoint = '/fapi/v1/time'
+    
+    bench('requests.get (no pooling)', lambda: requests.get(stub_url+endpoint).json(), arg.calls)
+    
+    binance = BinanceConnection(keep_alive=False)
+    bench('BinanceConnection keep_alive=0', lambda: binance.futuresCheckserverTime(baseurl=stub_url), arg.calls)
+    binance.close()
+    
+    binance = BinanceConnection()
+    bench('BinanceConnection pooled', lambda: binance.futuresCheckserverTime(baseurl=stub_url), arg.calls)
+    binance.close()
+    
+    server.shutdown()
@@ -0,0 +1,47 @@
+import argparse
+import json
+import os
+import sys
+from timeit import repeat
+
+from polaristools.binanceconnection import JSON_BACKENDS
+from polaristools.utils import decode_klines, klines_to_records
+
+# Synthetic klines shared with the tests.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'tests'))
+from synthetic_klines import api_klines
+
+''' 
+    Decode cost of a 1500 rows continuousKlines response body.
+    
+    Record a real payload once with:
+        curl 'https://fapi.binance.com/fapi/v1/continuousKlines?pair=BTCBUSD&contractType=PERPETUAL&interval=1m&limit=1500' > payload.json
+    and pass it with --payload, otherwise a synthetic body of the same shape is used.
+    '''
+
+def synthetic_payload(rows:int=1500)->bytes:
+    return json.dumps(api_klines(rows), separators=(',', ':')).encode()
+
+def parse_inputs(pargs=None):
+    parser = argparse.ArgumentParser(description='Klines response decode benchmark')
+    parser.add_argument('--payload', help='recorded continuousKlines response body')
+    parser.add_argument('--number', type=int, default=200)
+    return parser.parse_args(pargs)
+
+
+if __name__== '__main__':
+    arg = parse_inputs()
+    if arg.payload:
+        with open(arg.payload, 'rb') as f:
+            content = f.read()
+    else:
+        content = synthetic_payload()
+    
+    cases = [(f'{name}.loads', loads) for name, loads in JSON_BACKENDS.items()]
+    cases += [(f'{name}.loads + klines_to_records', lambda c, loads=loads: klines_to_records(loads(c)))
+              for name, loads in JSON_BACKENDS.items()]
+    cases.append(('decode_klines', decode_klines))
+    
+    for label, decoder in cases:
+        best = min(repeat(lambda: decoder(content), number=arg.number, repeat=5)) / arg.number
+        print(f'{label:<36} {best*1e3:>8.3f} ms/page')
@@ -0,0 +1,55 @@
+import argparse
+import os
+import sys
+from timeit import repeat
+
+from pandas import DataFrame, to_datetime
+
+from polaristools.utils import historicalKlinesParser, klines_to_records
+
+# Synthetic klines shared with the tests.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'tests'))
+from synthetic_klines import api_klines
+
+''' 
+    Per page cost of parsing raw api klines, 1000 and 1500 rows pages.
+    legacy: the DataFrame + to_datetime + astype parser that used to be
+    historicalKlinesParser, kept here as the baseline.
+    '''
+
+def legacy_parser(klines:list):
+    columns_name = [ 'open_time','open','high','low','close',
+                    'volume','close_time','quote_asset_volume',
+                    'number_of_trades','taker_buy_base_asset_volume',
+                    'taker_buy_quote_asset_volume','ignore'
+                    ]
+    df = DataFrame(data=klines, columns=columns_name)
+    df['open_time'] = to_datetime(df['open_time'],   unit='ms')
+    df['close_time'] = to_datetime(df['close_time'],  unit='ms')
+    tofloat64 = [ 
+            'open','high','low','close','volume',
+            'quote_asset_volume',
+            'taker_buy_base_asset_volume',
+            'taker_buy_quote_asset_volume'
+    ]
+    df[tofloat64] = df[tofloat64].astype('float64') 
+    df.drop('ignore', axis=1, inplace=True)
+    return df
+
+def parse_inputs(pargs=None):
+    parser = argparse.ArgumentParser(description='Kline page parser benchmark')
+    parser.add_argument('--number', type=int, default=200)
+    return parser.parse_args(pargs)
+
+
+if __name__== '__main__':
+    arg = parse_inputs()
+    for rows in (1000, 1500):
+        page = api_klines(rows)
+        for label, parser in (
+            ('legacy DataFrame parser', legacy_parser),
+            ('klines_to_records', klines_to_records),
+            ('historicalKlinesParser', historicalKlinesParser),
+        ):
+            best = min(repeat(lambda: parser(page), number=arg.number, repeat=5)) / arg.number
+            print(f'{rows:>5} rows  {label:<26} {best*1e3:>8.3f} ms/page')
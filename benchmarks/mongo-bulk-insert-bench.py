@@ -0,0 +1,68 @@
+import argparse
+import os
+import sys
+from time import perf_counter
+
+import pdmongo
+
+from polaristools.mongodatabase import MongoDatabase
+from polaristools.utils import historicalKlinesParser
+
+# Synthetic klines shared with the tests.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'tests'))
+from synthetic_klines import api_klines
+
+''' 
+    Kline write throughput against a local mongod:
+    historicalKlinesParser + pdmongo.to_mongo (DataFrame round-trip)
+    vs MongoDatabase.insert_klines_bulk on the raw api arrays.
+    '''
+
+def bench(label, func, rows):
+    start = perf_counter()
+    func()
+    elapsed = perf_counter() - start
+    print(f'{label:<40} {rows/elapsed:>12.0f} docs/s')
+
+def parse_inputs(pargs=None):
+    parser = argparse.ArgumentParser(description='Mongo kline write benchmark')
+    parser.add_argument('--host', default='localhost:27017')
+    parser.add_argument('--user', default=None)
+    parser.add_argument('--password', default=None)
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--page', type=int, default=1000, help='klines per api page')
+    return parser.parse_args(pargs)
+
+
+if __name__== '__main__':
+    arg = parse_inputs()
+    mongo = MongoDatabase(dict(db_host=arg.host, db_user=arg.user, db_pass=arg.password))
+    db_name = 'polaris_bench_bulk_insert'
+    klines = api_klines(arg.rows)
+    pages = [klines[i:i+arg.page] for i in range(0, arg.rows, arg.page)]
+    
+    def dataframe_roundtrip():
+        for page in pages:
+            pdmongo.to_mongo(
+                frame     = historicalKlinesParser(page),
+                name      = 'pdmongo',
+                db        = mongo.client[db_name],
+                if_exists = 'append',
+            )
+    bench('pdmongo.to_mongo', dataframe_roundtrip, arg.rows)
+    
+    for batch_size in (1000, 5000, 20000):
+        collection = f'bulk_{batch_size}'
+        bench(
+            f'insert_klines_bulk page batch={batch_size}',
+            lambda: [mongo.insert_klines_bulk(db_name, collection, page, batch_size=batch_size) for page in pages],
+            arg.rows,
+        )
+        collection = f'bulk_all_{batch_size}'
+        bench(
+            f'insert_klines_bulk all batch={batch_size}',
+            lambda: mongo.insert_klines_bulk(db_name, collection, klines, batch_size=batch_size),
+            arg.rows,
+        )
+    
+    mongo.dropDatabase(db_name)
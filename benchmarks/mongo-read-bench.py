@@ -0,0 +1,71 @@
+import argparse
+import os
+import sys
+from time import perf_counter
+
+from pandas import DataFrame
+import pdmongo
+
+from polaristools import mongodatabase
+from polaristools.mongodatabase import MongoDatabase
+
+# Synthetic klines shared with the tests.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'tests'))
+from synthetic_klines import api_klines
+
+''' 
+    Full history read into a DataFrame against a local mongod:
+    pdmongo.read_mongo (aggregation, one dict per document)
+    vs MongoDatabase.readKlineColumns (pymongoarrow when installed, raw BSON batches otherwise).
+    
+    Either reads an existing collection (--db / --collection) or fills a
+    throwaway database with --rows synthetic 1m klines and drops it at the end.
+    '''
+
+FIELDS = ['open_time','open','high','low','close','volume']
+
+def bench(label, func):
+    start = perf_counter()
+    df = func()
+    elapsed = perf_counter() - start
+    print(f'{label:<40} {elapsed:>8.2f} s {len(df)/elapsed:>12.0f} docs/s')
+
+def parse_inputs(pargs=None):
+    parser = argparse.ArgumentParser(description='Mongo kline read benchmark')
+    parser.add_argument('--host', default='localhost:27017')
+    parser.add_argument('--user', default=None)
+    parser.add_argument('--password', default=None)
+    parser.add_argument('--db', default=None, help='existing database, synthetic data when omitted')
+    parser.add_argument('--collection', default=None)
+    parser.add_argument('--rows', type=int, default=3000000)
+    return parser.parse_args(pargs)
+
+
+if __name__== '__main__':
+    arg = parse_inputs()
+    mongo = MongoDatabase(dict(db_host=arg.host, db_user=arg.user, db_pass=arg.password))
+    if arg.db:
+        db_name, collection = arg.db, arg.collection
+    else:
+        db_name, collection = 'polaris_bench_read', 'btcusdt'
+        # Generated chunk by chunk, the whole history as python lists would not fit in memory.
+        for i in range(0, arg.rows, 100000):
+            klines = api_klines(min(100000, arg.rows-i), start_ms=1577836800000 + i*60000, seed=i)
+            mongo.insert_klines_bulk(db_name, collection, klines, batch_size=20000)
+    
+    bench('pdmongo.read_mongo', lambda: pdmongo.read_mongo(
+        db         = mongo.client[db_name],
+        collection = collection,
+        query      = [{'$project': dict(_id=0, **dict.fromkeys(FIELDS, 1))}],
+        index_col  = ['open_time'],
+    ))
+    
+    def columnar():
+        return DataFrame(mongo.readKlineColumns(db_name, collection, FIELDS), columns=FIELDS).set_index('open_time')
+    if mongodatabase.find_numpy_all is not None:
+        bench('readKlineColumns pymongoarrow', columnar)
+        mongodatabase.find_numpy_all = None
+    bench('readKlineColumns raw batches', columnar)
+    
+    if not arg.db:
+        mongo.dropDatabase(db_name)
@@ -0,0 +1,56 @@
+import argparse
+import os
+import sys
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+from polaristools.datasetstore import open_store
+from polaristools.panel import compute_panel
+
+# Synthetic klines shared with the tests.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'tests'))
+from synthetic_klines import klines_frame
+
+''' 
+    Indicator panel scaling: the same indicator set over N synthetic
+    symbols, computed with 1, 2, 4 ... worker processes.
+    The indicator cache is disabled so every run computes.
+    '''
+
+REQUEST = {
+    'talib_EMA': [10, 20, 50, 100, 200],
+    'talib_RSI': {},
+    'talib_MACD': {},
+    'talib_ATR': {},
+    'talib_BBANDS': {'timeperiod':20},
+    'talib_ADX': {},
+    'talib_AROON': {},
+    'talib_STOCHRSI': {},
+}
+
+def parse_inputs(pargs=None):
+    parser = argparse.ArgumentParser(description='Multi symbol indicator panel benchmark')
+    parser.add_argument('--symbols', type=int, default=36)
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--dataformat', choices=['pickle', 'parquet', 'memmap'], default='pickle')
+    parser.add_argument('--workers', type=int, nargs='+', default=None,
+        help='Worker counts to try, by default 1, 2, 4 ... up to the core count')
+    return parser.parse_args(pargs)
+
+
+if __name__== '__main__':
+    arg = parse_inputs()
+    workers = arg.workers or [2**i for i in range(os.cpu_count().bit_length()) if 2**i <= os.cpu_count()]
+    with TemporaryDirectory() as root:
+        store = open_store(arg.dataformat, root)
+        names = [f'df_klines_SYM{i:02d}USDT_1m' for i in range(arg.symbols)]
+        for seed, name in enumerate(names):
+            store.write(klines_frame(arg.rows, '2019-09-01', '1min', seed, price=10000), name)
+        print(f'{arg.symbols} symbols x {arg.rows} rows, {arg.dataformat}, {os.cpu_count()} cores')
+        baseline = None
+        for count in workers:
+            start = perf_counter()
+            panel = compute_panel(names, REQUEST, fmt=arg.dataformat, root=root, workers=count, cache=False)
+            elapsed = perf_counter() - start
+            baseline = baseline or elapsed
+            print(f'{count:>3} worker(s) {elapsed:>8.2f} s  speedup x{baseline/elapsed:.2f}  panel {panel.shape}')
@@ -0,0 +1,51 @@
+import argparse
+import os
+import sys
+from time import perf_counter
+
+from pandas.testing import assert_frame_equal
+
+from polaristools.resampler import OHLCV_AGGREGATIONS, resample_many
+
+# Synthetic klines shared with the tests.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'tests'))
+from synthetic_klines import klines_frame
+
+''' 
+    dataframes-as-binary.py --resample_df on one symbol:
+    one DataFrame.resample().agg() per timeframe vs resample_many
+    (single hierarchical pass), on a synthetic 1m history.
+    '''
+
+PERIODS = [240,120,60,30,15,10,5,3]
+
+def pandas_loop(df):
+    return {
+        p: df.resample(f'{p}T', label='right', closed='right').agg(OHLCV_AGGREGATIONS)
+        for p in PERIODS
+    }
+
+def bench(label, func, df, number):
+    best = float('inf')
+    for _ in range(number):
+        start = perf_counter()
+        frames = func(df)
+        best = min(best, perf_counter() - start)
+    print(f'{label:<32} {best:>8.3f} s')
+    return frames
+
+def parse_inputs(pargs=None):
+    parser = argparse.ArgumentParser(description='Multi timeframe resample benchmark')
+    parser.add_argument('--years', type=float, default=3)
+    parser.add_argument('--number', type=int, default=3)
+    return parser.parse_args(pargs)
+
+
+if __name__== '__main__':
+    arg = parse_inputs()
+    df = klines_frame(int(arg.years*365*1440), '2019-09-01', '1min', seed=7, price=10000)
+    print(f'{len(df)} 1m rows -> {PERIODS}')
+    expected = bench('DataFrame.resample per period', pandas_loop, df, arg.number)
+    frames = bench('resample_many', lambda df: resample_many(df, PERIODS), df, arg.number)
+    for p in PERIODS:
+        assert_frame_equal(frames[p], expected[p], check_freq=False)
@@ -55,11 +55,19 @@ def obtain_data_klines(polaris, args=None):
         quoted_asset = arg.quotedasset,
         stream_type  = arg.streamtype,
         market_type  = arg.markettype,
+        concurrency  = arg.concurrency,
+        page_concurrency = arg.pageconcurrency,
     )
     if arg.createdb:
-        polaris.createDatabaseKlines(**kwargs)
+        polaris.createDatabaseKlines(timeseries=arg.timeseries, **kwargs)
     elif arg.updatedb:
         polaris.updateDatabaseKlines(**kwargs)
+    elif arg.migratetimeseries:
+        db_name = f"binance_{arg.markettype}_{arg.quotedasset}"
+        for symbol in symbols:
+            collection = f"{arg.streamtype}_{symbol.upper()}_{arg.interval.lower()}"
+            copied = polaris.mongo.migrateToTimeseries(db_name, collection)
+            print(f'{collection} migrated to time-series, {copied} candles copied.')
     chdir('/home/llagask/Trading/polaris_beta')
 
 def parse_inputs(pargs=None):
@@ -75,6 +83,14 @@ def parse_inputs(pargs=None):
         action='store_true',
         help='Update existent collections in a database'
     )
+    parser.add_argument('--timeseries',
+        action='store_true',
+        help='With --createdb, create collections as MongoDB time-series collections'
+    )
+    parser.add_argument('--migratetimeseries',
+        action='store_true',
+        help='Move existent collections into time-series collections, originals kept as *_legacy'
+    )
     
     # parser.add_argument('--portfolio',
         # choices=['futures_busd', 'spot_usdt'],
@@ -94,6 +110,16 @@ def parse_inputs(pargs=None):
     parser.add_argument('--streamtype',
         choices=['klines', 'continuous_klines']
     )
+    parser.add_argument('--concurrency',
+        type=int,
+        default=1,
+        help='Symbols captured in parallel, all of them share the exchange weight budget'
+    )
+    parser.add_argument('--pageconcurrency',
+        type=int,
+        default=1,
+        help='Pages of a single symbol requested in parallel'
+    )
     
     return parser.parse_args(pargs)
 
@@ -104,7 +130,8 @@ if __name__== '__main__':
         db_user = 'admin',
         db_pass = environ.get('mongodbadminpass')
     )
-    polaris = PolarisBot(mongo_cred=database_config)
+    arg = parse_inputs()
+    polaris = PolarisBot(mongo_cred=database_config, pool_size=max(10, arg.concurrency*arg.pageconcurrency))
     
     obtain_data_klines(polaris)
 
@@ -153,7 +180,8 @@ if __name__== '__main__':
         --interval 1m \
         --quotedasset busd \
         --markettype futures_stable \
-        --streamtype continuous_klines
+        --streamtype continuous_klines \
+        --concurrency 8
         
             ###################################
             # 1 MINUTE - FUTURES_STABLE
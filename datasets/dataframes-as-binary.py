@@ -1,12 +1,13 @@
 import argparse
+import json
+from concurrent.futures import ProcessPoolExecutor
 from os import environ
 # from os import getcwd, chdir
 from time import perf_counter
 from datetime import datetime
 
-import pandas as pd
-
 from polaristools.polarisbot import PolarisBot
+from polaristools.utils import KLINE_COLUMNS
 
 ''' 
     This script does two things.
@@ -31,70 +32,145 @@ database_config = {
     'db_user':db_user,
     'db_pass':db_pass,
 }
-polaris = PolarisBot(mongo_cred=database_config)
+# One PolarisBot (and Mongo client) per process, see init_polaris.
+polaris = None
 
+def init_polaris(mongo_cred:dict):
+    global polaris
+    polaris = PolarisBot(mongo_cred=mongo_cred)
 
-def from_mongo_to_binary_df(symbols:list, stream_type:str, interval:int, database:str):
-    start=perf_counter()
+
+def update_symbol_dataset(symbol:str, stream_type:str, interval:int, database:str, dataformat:str='pickle'):
+    # Define filename
+    filename = f'df_{stream_type}_{symbol}_{interval}'
+    collection = f'{stream_type}_{symbol}_{interval}'
     
-    for symbol in symbols:
-        # Define filename
-        filename = f'df_{stream_type}_{symbol}_{interval}'
-        
-        # Read dataframe from binary.
-        df_bin = polaris.dataframeFromBinary(filename)
-        
-        if df_bin is None:
-            # Query database for entire data.
-            collection = f'{stream_type}_{symbol}_{interval}'
-            df_new = polaris.createDataframe(mydb=database, collection=collection)
-            polaris.dataframeToBinary(dataframe=df_new, filename=filename)
-            print(f'*** New Dataframe persisted as binary... {symbol} - {interval} ***\n')
-            continue
-        
-        # Capture newest date from last row in previously saved Dataframe.
-        last_date = df_bin.last_valid_index().to_pydatetime()
-        
-        # Query databse
-        collection = f'{stream_type}_{symbol}_{interval}'
-        df_new = polaris.createDataframe(mydb=database, collection=collection, date_range={'gt':last_date})
-        if df_new.empty:
-            print('There are no new data to add in: ',filename)
-            continue
-        
-        # Concatenate dataframes
-        df_updated = pd.concat([df_bin, df_new])
-        
-        # Persist again as .pckl. Overwrite
-        polaris.dataframeToBinary(dataframe=df_updated, filename=filename)
-        print(f'*** Updated Dataframe persisted as binary... {symbol} - {interval} ***')
-    end=perf_counter()
-    totalt= (end-start)
-    print(f'Elapsed time: {totalt:.2f} seconds.\n')
-
-def read_resample_write(stream_type:str, symbols:list):
+    # Capture newest date from last row in previously saved Dataframe.
+    last_date = polaris.datasetLastIndex(filename, fmt=dataformat)
+    
+    if last_date is None:
+        # Query database for entire data, every kline column so the
+        # resampled datasets carry quote volume, trades and taker volumes too.
+        df_new = polaris.createDataframe(mydb=database, collection=collection, fields=KLINE_COLUMNS)
+        polaris.dataframeToBinary(dataframe=df_new, filename=filename, fmt=dataformat)
+        print(f'*** New Dataframe persisted as binary... {symbol} - {interval} ***\n')
+        return len(df_new)
+    
+    # Query databse
+    df_new = polaris.createDataframe(mydb=database, collection=collection, date_range={'gt':last_date.to_pydatetime()}, fields=KLINE_COLUMNS)
+    if df_new.empty:
+        print('There are no new data to add in: ',filename)
+        return 0
+    
+    # Append-only, just the new rows are written.
+    polaris.dataframeUpdateBinary(dataframe=df_new, filename=filename, fmt=dataformat)
+    print(f'*** Updated Dataframe persisted as binary... {symbol} - {interval} ***')
+    return len(df_new)
+
+def compact_symbol_dataset(symbol:str, stream_type:str, interval:int, dataformat:str='pickle'):
+    filename = f'df_{stream_type}_{symbol}_{interval}'
+    merged = polaris.datasetCompact(filename, fmt=dataformat)
+    print(f'{filename}: {merged} segments compacted')
+    return merged
+
+def resample_symbol_dataset(symbol:str, stream_type:str, dataformat:str='pickle', incremental:bool=True):
+    df = f"df_{stream_type}_{symbol}_1m"
+    rs_p = [240,120,60,30,15,10,5,3]
+    # Every timeframe in one pass, each from the finest one dividing it.
+    # Incremental: only the 1m rows after the last complete buckets are read.
+    written = polaris.resampleBinary(df, rs_p, fmt=dataformat, incremental=incremental)
+    for p, rows in written.items():
+        print(f'Ready with {df} // resampled to {p} minutes, {rows} rows written')
+    return sum(written.values())
+
+def indicators_symbol_dataset(symbol:str, stream_type:str, interval:int, indicators:dict, dataformat:str='pickle', incremental:bool=True):
+    filename = f'df_{stream_type}_{symbol}_{interval}'
+    # Only the bars appended since the last run, from the saved indicator states.
+    rows = polaris.updateIndicatorsBinary(filename, indicators, fmt=dataformat, incremental=incremental)
+    print(f'{filename}: {rows} indicator rows written')
+    return rows
+
+
+def timed_symbol_task(function, symbol:str, kwargs:dict):
+    ''' 
+        Run a per symbol task, timing and errors are reported instead of raised
+        so one failing symbol does not stop the others.
+        '''
+    start=perf_counter()
+    try:
+        result, error = function(symbol, **kwargs), None
+    except Exception as e:
+        result, error = None, f'{type(e).__name__}: {e}'
+    return dict(symbol=symbol, result=result, error=error, elapsed=perf_counter()-start)
+
+def run_per_symbol(function, symbols:list, workers:int=1, **kwargs)->list:
+    ''' 
+        workers > 1 fans the symbols out to a process pool,
+        every worker with its own PolarisBot / Mongo client.
+        '''
+    if workers <= 1:
+        if polaris is None:
+            init_polaris(database_config)
+        return [timed_symbol_task(function, symbol, kwargs) for symbol in symbols]
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_polaris, initargs=(database_config,)) as executor:
+        futures = [executor.submit(timed_symbol_task, function, symbol, kwargs) for symbol in symbols]
+        return [future.result() for future in futures]
+
+def report(task:str, reports:list, wall:float, workers:int):
+    ''' 
+        Per symbol timings and errors. The sum of the per symbol times is
+        what the serial loop takes, compared against the wall-clock.
+        '''
+    for item in sorted(reports, key=lambda item: -item['elapsed']):
+        status = f"ERROR {item['error']}" if item['error'] else f"ok ({item['result']})"
+        print(f"{item['symbol']:<16} {item['elapsed']:>8.2f} s  {status}")
+    serial = sum(item['elapsed'] for item in reports)
+    failed = [item['symbol'] for item in reports if item['error']]
+    print(f'{task} finished. Elapsed time: {wall:.2f} seconds with {workers} worker(s), '
+          f'serial {serial:.2f} seconds, speedup x{serial/wall if wall else 1:.2f}.')
+    if failed:
+        print(f'{len(failed)} symbol(s) failed: {failed}')
+    print()
+
+def from_mongo_to_binary_df(symbols:list, stream_type:str, interval:int, database:str, dataformat:str='pickle', workers:int=1):
+    start=perf_counter()
+    reports = run_per_symbol(
+        update_symbol_dataset, symbols, workers,
+        stream_type=stream_type, interval=interval, database=database, dataformat=dataformat,
+    )
+    report('Mongo to binary', reports, perf_counter()-start, workers)
+
+def compact_datasets(symbols:list, stream_type:str, interval:int, dataformat:str='pickle', workers:int=1):
+    ''' 
+        Merge the segments appended by the daily updates, run it now and then.
+        '''
+    start=perf_counter()
+    reports = run_per_symbol(
+        compact_symbol_dataset, symbols, workers,
+        stream_type=stream_type, interval=interval, dataformat=dataformat,
+    )
+    report('Compaction', reports, perf_counter()-start, workers)
+
+def read_resample_write(stream_type:str, symbols:list, dataformat:str='pickle', workers:int=1, incremental:bool=True):
     ''' 
         open 1 minute datasets
         and resample to 240,120,60,30,15,10,5,3.
         '''
     start=perf_counter()
-    dfs_1m = [f"df_{stream_type}_{symbol}_1m" for symbol in symbols]
-    rs_p = [240,120,60,30,15,10,5,3]
-    for df in dfs_1m:
-        dataframe = polaris.dataframeFromBinary(df)
-        for p in rs_p:
-            period = str(p)+'T'
-            df_rs = dataframe.resample(
-                period, label='right',closed='right'
-                ).agg(
-                    {'open':'first','high':'max','low':'min','close':'last','volume':'sum'}
-                )
-            filename = df[:-2]+str(p)+'m'
-            polaris.dataframeToBinary(df_rs, filename)
-            print(f'Ready with {df} // resampled to {p} minutes')
-    end=perf_counter()
-    elapsed = end-start
-    print(f'Resample finished succesfully. Elapsed time: {elapsed:.2f} seconds.')
+    reports = run_per_symbol(
+        resample_symbol_dataset, symbols, workers,
+        stream_type=stream_type, dataformat=dataformat, incremental=incremental,
+    )
+    report('Resample', reports, perf_counter()-start, workers)
+
+def update_indicators(symbols:list, stream_type:str, interval:int, indicators:dict, dataformat:str='pickle', workers:int=1, incremental:bool=True):
+    start=perf_counter()
+    reports = run_per_symbol(
+        indicators_symbol_dataset, symbols, workers,
+        stream_type=stream_type, interval=interval, indicators=indicators,
+        dataformat=dataformat, incremental=incremental,
+    )
+    report('Indicators', reports, perf_counter()-start, workers)
 
 def parse_inputs(pargs=None):
     parser = argparse.ArgumentParser(
@@ -109,6 +185,27 @@ def parse_inputs(pargs=None):
         action='store_true',
         help='...'
     )
+    parser.add_argument('--fullresample',
+        action='store_true',
+        help='Recompute resampled datasets from the first 1m bar instead of the new bars only'
+    )
+    parser.add_argument('--compact',
+        action='store_true',
+        help='Merge the segments appended by --mongo_to_df updates'
+    )
+    parser.add_argument('--indicators',
+        type=json.loads,
+        help='Update persisted indicators after --mongo_to_df, e.g \'{"talib_EMA":[10,20],"talib_RSI":{}}\''
+    )
+    parser.add_argument('--fullindicators',
+        action='store_true',
+        help='Recompute --indicators over the whole history instead of the new bars only'
+    )
+    parser.add_argument('--workers',
+        type=int,
+        default=1,
+        help='Symbols processed in parallel worker processes, each with its own Mongo client'
+    )
     
     # parser.add_argument('--portfolio',
         # choices=['futures_busd', 'spot_usdt'],
@@ -128,6 +225,11 @@ def parse_inputs(pargs=None):
     parser.add_argument('--markettype',
         choices=['spot_margin', 'futures_stable', 'futures_coins']
     )
+    parser.add_argument('--dataformat',
+        choices=['pickle', 'parquet', 'memmap'],
+        default='pickle',
+        help='pickle: datasets/{filename}.pckl, parquet: datasets/{filename}/month=YYYY-MM/, memmap: datasets/{filename}.mm/'
+    )
     return parser.parse_args(pargs)
 
 def main(args=None):
@@ -167,11 +269,34 @@ def main(args=None):
             stream_type = arg.streamtype,
             interval = arg.interval,
             database = database,
+            dataformat = arg.dataformat,
+            workers = arg.workers,
+        )
+    if arg.indicators:
+        update_indicators(
+            symbols = symbols,
+            stream_type = arg.streamtype,
+            interval = arg.interval,
+            indicators = arg.indicators,
+            dataformat = arg.dataformat,
+            workers = arg.workers,
+            incremental = not arg.fullindicators,
+        )
+    if arg.compact:
+        compact_datasets(
+            symbols = symbols,
+            stream_type = arg.streamtype,
+            interval = arg.interval,
+            dataformat = arg.dataformat,
+            workers = arg.workers,
         )
     if arg.resample_df:
         read_resample_write(
             stream_type=arg.streamtype,
             symbols=symbols,
+            dataformat=arg.dataformat,
+            workers=arg.workers,
+            incremental=not arg.fullresample,
         )
 
 
@@ -203,5 +328,6 @@ if __name__== '__main__':
             --interval 1m \
             --quotedasset busd \
             --markettype futures_stable \
+            --workers 4 \
         
         '''
\ No newline at end of file
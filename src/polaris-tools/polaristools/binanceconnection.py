@@ -1,5 +1,6 @@
 from datetime import datetime, timezone
 import inspect
+import json
 import os
 import re
 from time import time
@@ -10,22 +11,119 @@ import hmac
 import pandas as pd
 import pytz
 import requests
-from urllib.parse import urljoin, urlencode
+from requests.adapters import HTTPAdapter
+from urllib.parse import urljoin, urlencode, urlsplit
 
-from polaristools.utils import date_to_milliseconds
+from polaristools.ratelimiter import WeightRateLimiter, continuous_klines_weight, order_book_weight
+from polaristools.utils import date_to_milliseconds, decode_klines
 # importar logger
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+# Response decoders, all of them take the raw body bytes.
+JSON_BACKENDS = {'json': json.loads}
+if ujson is not None:
+    JSON_BACKENDS['ujson'] = ujson.loads
+if orjson is not None:
+    JSON_BACKENDS['orjson'] = orjson.loads
+
+def default_json_backend():
+    for name in ('orjson', 'ujson', 'json'):
+        if name in JSON_BACKENDS:
+            return name
+
 class BinanceConnection:
     baseurl_spot_margin = 'https://api.binance.com'
     baseurl_futures_usd = 'https://fapi.binance.com'
     baseurl_futures_coins = 'https://dapi.binance.com'
-
-    def __init__(self):
+    
+    # Request weight allowed per minute and IP. Other hosts (e.g. a local stub) are not limited.
+    weight_limits = {
+        baseurl_spot_margin: 1200,
+        baseurl_futures_usd: 2400,
+        baseurl_futures_coins: 2400,
+    }
+
+    def __init__(self, pool_size:int=10, timeout=10, keep_alive:bool=True, max_retries:int=3, json_backend:str=None):
+        '''
+            pool_size:    max connections kept alive per base url (spot, fapi, dapi).
+            timeout:      seconds, or a (connect, read) tuple, applied to every request.
+            keep_alive:   reuse TCP+TLS connections between calls.
+            max_retries:  resend a request answered 429 once the limiter allows it.
+            json_backend: 'orjson', 'ujson' or 'json'. Defaults to the fastest installed.
+            '''
         self.api_key = os.environ.get('binance_apikey'),
         self.api_secret = os.environ.get('binance_secretkey')
         self.headers = {'X-MBX-APIKEY': self.api_key[0]}
 
-    def __requestUserdata(self, baseurl, endpoint, rmethod='get', **kwargs):
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.keep_alive = keep_alive
+        self.max_retries = max_retries
+        self.json_backend = json_backend or default_json_backend()
+        self.loads = JSON_BACKENDS[self.json_backend]
+        self.sessions = {}
+        self.limiters = {}
+        for baseurl in (self.baseurl_spot_margin, self.baseurl_futures_usd, self.baseurl_futures_coins):
+            self.session(baseurl)
+
+    def session(self, baseurl:str):
+        '''
+            Pooled session shared by every endpoint under baseurl.
+            Created on first use for any other host (e.g. a local stub server),
+            without a rate limiter unless the host is in weight_limits.
+            '''
+        if baseurl not in self.sessions:
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+            session = requests.Session()
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            if not self.keep_alive:
+                session.headers['Connection'] = 'close'
+            self.sessions[baseurl] = session
+            limit = self.weight_limits.get(baseurl)
+            self.limiters[baseurl] = WeightRateLimiter(limit=limit) if limit else None
+        return self.sessions[baseurl]
+
+    def limiter(self, baseurl:str):
+        '''
+            WeightRateLimiter of baseurl, None for hosts without a known weight limit.
+            '''
+        self.session(baseurl)
+        return self.limiters[baseurl]
+
+    def close(self):
+        for session in self.sessions.values():
+            session.close()
+        self.sessions = {}
+
+    def __send(self, url, rmethod='get', weight=1, **request_params):
+        baseurl = '{0.scheme}://{0.netloc}'.format(urlsplit(url))
+        request_params.setdefault('timeout', self.timeout)
+        session = self.session(baseurl)
+        limiter = self.limiters[baseurl]
+        for _ in range(self.max_retries+1):
+            if limiter is not None:
+                limiter.acquire(weight)
+            response = session.request(rmethod.upper(), url, **request_params)
+            if limiter is not None:
+                limiter.update(response.headers, response.status_code)
+            # 418 means banned IP, insisting only makes it longer.
+            if response.status_code != 429:
+                break
+        return response
+
+    def __decode(self, response):
+        return self.loads(response.content)
+
+    def __requestUserdata(self, baseurl, endpoint, rmethod='get', weight=1, **kwargs):
         payload = {}
         payload['recvWindow'] = 5000
         payload['timestamp'] = int(time()*1000)
@@ -44,20 +142,16 @@ class BinanceConnection:
         
         request_params = dict(url=url, params=payload, headers=self.headers,)
         
-        if rmethod=='get':
-            response = requests.get(**request_params)
-        elif rmethod=='post':
-            response = requests.post(**request_params)
-        elif rmethod=='delete':
-            response = requests.delete(**request_params)
+        if rmethod in ('get','post','delete'):
+            response = self.__send(rmethod=rmethod, weight=weight, **request_params)
         
         if response.status_code != 200:
             print('Unsuccessful operation / code:400',inspect.currentframe().f_code.co_name)
             return response
         else:
-            return response.json()
+            return self.__decode(response)
 
-    def __request(self, baseurl, endpoint, rmethod='get', **kwargs):
+    def __request(self, baseurl, endpoint, rmethod='get', weight=1, **kwargs):
         payload = {}
         
         if kwargs:
@@ -65,13 +159,13 @@ class BinanceConnection:
         url = (baseurl + endpoint)
         
         if rmethod == 'get':
-            response = requests.get(url=url, params=payload)
+            response = self.__send(url=url, weight=weight, params=payload)
         
         if response.status_code != 200:
             print('Unsuccessful operation', inspect.currentframe().f_code.co_name)
             return response
         else:
-            return response.json()
+            return self.__decode(response)
 
 
     #  *** FUTURES // MARKET DATA ENDPOINTS ***
@@ -149,6 +243,7 @@ class BinanceConnection:
         return self.__request(
                             baseurl=baseurl,
                             endpoint=endpoint,
+                            weight=order_book_weight(limit),
                             symbol=symbol,
                             limit=limit)
 
@@ -250,7 +345,8 @@ class BinanceConnection:
         payload = {}
         if kwargs:
             payload['symbol'] = kwargs['symbol']
-        return self.__request(baseurl, endpoint, **payload)
+        weight = 1 if payload else 40
+        return self.__request(baseurl, endpoint, weight=weight, **payload)
 
     def futuresSymbolPriceTicker(self, baseurl=baseurl_futures_usd, endpoint='/fapi/v1/ticker/price', **kwargs):
         ''' 
@@ -270,7 +366,8 @@ class BinanceConnection:
         payload = {}
         if kwargs:
             payload['symbol'] = kwargs['symbol']
-        return self.__request(baseurl, endpoint, **payload)
+        weight = 1 if payload else 2
+        return self.__request(baseurl, endpoint, weight=weight, **payload)
 
     def futuresOpenInterest(self, symbol, baseurl=baseurl_futures_usd, endpoint='/fapi/v1/openInterest'):
         ''' 
@@ -477,12 +574,12 @@ class BinanceConnection:
             type=type,
         )
         url = urljoin(baseurl, endpoint)
-        response = requests.post(url, params=payload,)
+        response = self.__send(url, rmethod='post', params=payload,)
         if response.status_code != 200:
             print('Unsuccessful operation', inspect.currentframe().f_code.co_name)
             return response
         else:
-            return response.json()
+            return self.__decode(response)
 
 
     # *** SPOT MARGIN // WALLET ENDPOINTS***
@@ -493,13 +590,14 @@ class BinanceConnection:
         GET /sapi/v1/system/status
         '''
         url       =  baseurl + endpoint
-        response  = requests.get(url=url)
+        response  = self.__send(url=url)
         if response.status_code != 200:
             print('Unsuccessful operation', inspect.currentframe().f_code.co_name)
             return response.status_code
         else:
-            msg = response.json()['msg']
-            status = response.json()['status']
+            body = self.__decode(response)
+            msg = body['msg']
+            status = body['status']
             return f'System Status : {msg}'
 
     # Userdata, get
@@ -651,7 +749,7 @@ class BinanceConnection:
             recvWindow	LONG	NO	
             timestamp	LONG	YES
             '''
-        return self.__requestUserdata(baseurl=baseurl, endpoint=endpoint, limit=500)
+        return self.__requestUserdata(baseurl=baseurl, endpoint=endpoint, weight=10, limit=500)
 
     # Userdata, get
     def assetDetail(self, baseurl=baseurl_spot_margin, endpoint='/sapi/v1/asset/assetDetail'):
@@ -806,8 +904,8 @@ class BinanceConnection:
         '''
             GET /api/v3/ping 
             '''
-        r = requests.get(baseurl, endpoint)
-        return r.json()
+        r = self.__send(url=baseurl+endpoint)
+        return self.__decode(r)
 
     # get
     def checkServerTime(self):
@@ -815,11 +913,11 @@ class BinanceConnection:
             GET /api/v3/time 
             '''
         endpoint = '/api/v3/time'
-        r = requests.get(url=self.baseurl_spot_margin+endpoint)
+        r = self.__send(url=self.baseurl_spot_margin+endpoint)
         if r.status_code != 200:
             print('Unsuccessful operation', inspect.currentframe().f_code.co_name)
         else:
-            return r.json()
+            return self.__decode(r)
 
     # get
     def currentAveragePrice(self,symbol):
@@ -835,12 +933,12 @@ class BinanceConnection:
         endpoint    = '/api/v3/avgPrice'
         payload     = {'symbol': symbol.upper()}
         url = urljoin(self.baseurl_spot_margin, endpoint)
-        response = requests.get(url=url,params=payload)
+        response = self.__send(url=url,params=payload)
         if response.status_code != 200:
             print('Unsuccessful operation', inspect.currentframe().f_code.co_name)
             return response.status_code
         else:
-            r = response.json()
+            r = self.__decode(response)
             return float(r['price'])
 
     # get
@@ -873,19 +971,27 @@ class BinanceConnection:
         payload = {}
         if kwargs:
             payload.update(kwargs)
+        if 'symbol' in payload:
+            weight = 1
+        elif 'symbols' in payload:
+            n_symbols = len(payload['symbols'].split(','))
+            weight = 1 if n_symbols <= 20 else (20 if n_symbols <= 100 else 40)
+        else:
+            weight = 40
         url = urljoin(self.baseurl_spot_margin, endpoint)
-        response = requests.get(
+        response = self.__send(
                                 url=url,
+                                weight=weight,
                                 params=payload
                                 )
         if response.status_code != 200:
             print('Unsuccessful operation', inspect.currentframe().f_code.co_name)
             return response
         else:
-            return response.json()
+            return self.__decode(response)
 
     # get
-    def klineCandlestick(self, symbol, interval, endpoint='/api/v3/klines', **kwargs):
+    def klineCandlestick(self, symbol, interval, endpoint='/api/v3/klines', as_array:bool=False, **kwargs):
         ''' 
             Kline/Candlestick Data
             GET /api/v3/klines
@@ -904,6 +1010,8 @@ class BinanceConnection:
             
             If startTime and endTime are not sent, the most recent klines are returned.
             Data Source: Database
+            
+            as_array=True returns a KLINE_DTYPE record array decoded from the raw body.
             '''
         payload = dict(symbol=symbol, interval=interval)
         for k in kwargs:
@@ -920,15 +1028,17 @@ class BinanceConnection:
             elif k=='limit':
                 payload['limit'] = kwargs[k]
         url = urljoin(self.baseurl_spot_margin, endpoint)
-        r = requests.get(url, params=payload,)
+        r = self.__send(url, params=payload,)
         if r.status_code != 200:
             print('Unsuccessful operation', inspect.currentframe().f_code.co_name)
             return r.status_code
+        elif as_array:
+            return decode_klines(r.content)
         else:
-            return r.json()
+            return self.__decode(r)
 
     # get
-    def futuresContinuousKlines(self,pair,interval,endpoint='/fapi/v1/continuousKlines',**kwargs):
+    def futuresContinuousKlines(self,pair,interval,endpoint='/fapi/v1/continuousKlines',as_array:bool=False,**kwargs):
         ''' 
             Continuous Contract Kline/Candlestick Data 
             GET /fapi/v1/continuousKlines
@@ -958,6 +1068,8 @@ class BinanceConnection:
                 PERPETUAL
                 CURRENT_QUARTER
                 NEXT_QUARTER
+            
+            as_array=True returns a KLINE_DTYPE record array decoded from the raw body.
             '''
         baseurl = self.baseurl_futures_usd
         payload = dict(
@@ -979,13 +1091,16 @@ class BinanceConnection:
             elif k=='limit':
                 payload['limit'] = kwargs[k]
         url = urljoin(baseurl, endpoint)
-        r = requests.get(url, params=payload,)
+        weight = continuous_klines_weight(payload.get('limit', 500))
+        r = self.__send(url, weight=weight, params=payload,)
         
         if r.status_code != 200:
             # print('Unsuccessful operation', inspect.currentframe().f_code.co_name)
             return r
+        elif as_array:
+            return decode_klines(r.content)
         else:
-            return r.json()
+            return self.__decode(r)
 
     def getEarliestValidTimestamp(self, symbol, interval, stream_type):
         """
@@ -1248,6 +1363,7 @@ class BinanceConnection:
         return self.__requestUserdata(
                                     endpoint=endpoint,
                                     rmethod='get',
+                                    weight=2,
                                     **mandatory
                                     )
 
@@ -1270,6 +1386,7 @@ class BinanceConnection:
         return self.__requestUserdata(
             baseurl=baseurl,
             endpoint=endpoint,
+            weight=40,
         )
 
     # Userdata, get. No probado
@@ -1322,7 +1439,8 @@ class BinanceConnection:
             '''
         return self.__requestUserdata(
             baseurl=self.baseurl_spot_margin,
-            endpoint=endpoint
+            endpoint=endpoint,
+            weight=10,
         )
 
     # Userdata, get. No probado
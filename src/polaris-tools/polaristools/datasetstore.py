@@ -0,0 +1,451 @@
+from glob import escape, glob
+import json
+import os
+import pickle
+import shutil
+
+import numpy as np
+from pandas import DataFrame, DatetimeIndex, Timestamp, concat
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+'''
+    On-disk datasets of kline DataFrames indexed by open_time:
+    the original pickled datasets/{filename}.pckl files and
+    columnar alternatives (parquet, memmap).
+
+    A date window only reads the files / row groups / pages holding it,
+    and an update only writes the new rows.
+    '''
+
+def month_key(ts)->str:
+    return Timestamp(ts).strftime('%Y-%m')
+
+def load_metadata(root:str, name:str)->dict:
+    '''
+        Small json sidecar {root}/{name}.meta.json kept next to a dataset
+        of any format, {} when there is none.
+        '''
+    try:
+        with open(os.path.join(root, f'{name}.meta.json')) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+def save_metadata(root:str, name:str, metadata:dict):
+    filepath = os.path.join(root, f'{name}.meta.json')
+    with open(filepath+'.tmp', 'w') as f:
+        json.dump(metadata, f, default=str)
+    os.replace(filepath+'.tmp', filepath)
+
+def drop_replaced(df):
+    '''
+        Rows of later segments win over earlier ones holding the same open_time.
+        '''
+    if not df.index.is_unique:
+        df = df[~df.index.duplicated(keep='last')]
+    if not df.index.is_monotonic_increasing:
+        df = df.sort_index(kind='stable')
+    return df
+
+
+class PickleStore:
+    '''
+        Original format, one pickled DataFrame: {root}/{name}.pckl
+        update() pickles only the new rows as a segment {root}/{name}.seg-{first open_time ms}.pckl,
+        compact() folds the segments back into {name}.pckl.
+        '''
+    def __init__(self, root:str='datasets', index_col:str='open_time', max_segments:int=32):
+        self.root = root
+        self.index_col = index_col
+        # A dataset is compacted on update once it holds more segments than this.
+        self.max_segments = max_segments
+
+    def path(self, name:str)->str:
+        return os.path.join(self.root, f'{name}.pckl')
+
+    def exists(self, name:str)->bool:
+        return os.path.isfile(self.path(name))
+
+    def segments(self, name:str)->list:
+        return sorted(glob(os.path.join(escape(self.root), escape(name)+'.seg-*.pckl')))
+
+    def _load(self, filepath:str):
+        with open(filepath, 'rb') as df_bin:
+            return pickle.load(df_bin)
+
+    def _dump(self, df, filepath:str):
+        with open(filepath+'.tmp', 'wb') as bin_df:
+            pickle.dump(df, bin_df)
+        os.replace(filepath+'.tmp', filepath)
+
+    def write(self, df, name:str):
+        self._dump(df, self.path(name))
+        for segment in self.segments(name):
+            os.remove(segment)
+
+    def update(self, df, name:str)->int:
+        '''
+            Pickle the new rows as a segment, stored rows from the first
+            new open_time on are replaced on read and on compaction.
+            The stored columns are kept, extra columns in df are ignored.
+            '''
+        if not len(df):
+            return 0
+        if not self.exists(name):
+            self.write(df, name)
+            return len(df)
+        df = df.reindex(columns=self._newest(name).columns)
+        first_ms = int(df.index[0].value // 10**6)
+        self._dump(df, os.path.join(self.root, f'{name}.seg-{first_ms:015d}.pckl'))
+        if len(self.segments(name)) > self.max_segments:
+            self.compact(name)
+        return len(df)
+
+    def _newest(self, name:str):
+        '''
+            Newest segment, or the compacted file when there is none.
+            '''
+        segments = self.segments(name)
+        return self._load(segments[-1] if segments else self.path(name))
+
+    def _loadAll(self, name:str):
+        frames = [self._load(self.path(name))] + [self._load(segment) for segment in self.segments(name)]
+        return drop_replaced(concat(frames)) if len(frames) > 1 else frames[0]
+
+    def compact(self, name:str)->int:
+        segments = self.segments(name)
+        if segments:
+            self.write(self._loadAll(name), name)
+        return len(segments)
+
+    def read(self, name:str, start=None, end=None, columns:list=None):
+        '''
+            Rows with start <= open_time < end, None if the dataset does not exist.
+            The whole history is unpickled, then sliced.
+            '''
+        if not self.exists(name):
+            return None
+        df = self._loadAll(name)
+        if start is not None:
+            df = df[df.index >= Timestamp(start)]
+        if end is not None:
+            df = df[df.index < Timestamp(end)]
+        if columns is not None:
+            df = df[columns]
+        return df
+
+    def lastIndex(self, name:str):
+        '''
+            Newest open_time, from the newest segment when there is one.
+            '''
+        if not self.exists(name):
+            return None
+        return self._newest(name).last_valid_index()
+
+
+class ParquetStore:
+    '''
+        One directory per dataset, hive partitioned by month:
+            {root}/{name}/month=2022-08/data.parquet
+            {root}/{name}/month=2022-08/part-{first open_time ms}.parquet ...
+        The dataset name already carries stream type, symbol and interval,
+        e.g df_continuous_klines_BTCBUSD_1m.
+        update() is append-only, new rows land in a new part file (segment),
+        compact() merges the segments of a month back into data.parquet.
+        read() prunes the months outside the window and pushes the open_time
+        filter down to the row group statistics.
+        '''
+    def __init__(self, root:str='datasets', row_group_size:int=50000, compression:str='zstd', index_col:str='open_time', max_segments:int=32):
+        if pa is None:
+            raise ImportError('ParquetStore needs pyarrow: pip install pyarrow')
+        self.root = root
+        self.row_group_size = row_group_size
+        self.compression = compression
+        self.index_col = index_col
+        # A month is compacted on update once it holds more segments than this.
+        self.max_segments = max_segments
+        self.partitioning = ds.partitioning(pa.schema([('month', pa.string())]), flavor='hive')
+
+    def path(self, name:str)->str:
+        return os.path.join(self.root, name)
+
+    def exists(self, name:str)->bool:
+        return os.path.isdir(self.path(name))
+
+    def months(self, name:str)->list:
+        if not self.exists(name):
+            return []
+        return sorted(
+            entry[len('month='):] for entry in os.listdir(self.path(name)) if entry.startswith('month=')
+        )
+
+    def _monthDir(self, name:str, month:str)->str:
+        return os.path.join(self.path(name), f'month={month}')
+
+    def segments(self, name:str, month:str)->list:
+        '''
+            Parquet files of a month, data.parquet (compacted) first then parts in append order.
+            '''
+        return sorted(
+            os.path.join(self._monthDir(name, month), entry)
+            for entry in os.listdir(self._monthDir(name, month)) if entry.endswith('.parquet')
+        )
+
+    def _readMonth(self, name:str, month:str):
+        df = ds.dataset(self.segments(name, month), format='parquet').to_table().to_pandas()
+        return drop_replaced(df.set_index(self.index_col))
+
+    def _writeFile(self, filepath:str, df):
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        table = pa.Table.from_pandas(df.reset_index(), preserve_index=False)
+        # Write aside (hidden from dataset discovery) then rename, a reader never sees half a file.
+        tmp_path = os.path.join(os.path.dirname(filepath), '.'+os.path.basename(filepath)+'.tmp')
+        pq.write_table(table, tmp_path, row_group_size=self.row_group_size, compression=self.compression)
+        os.replace(tmp_path, filepath)
+
+    def _groupByMonth(self, df):
+        return df.groupby(df.index.strftime('%Y-%m'), sort=True)
+
+    def write(self, df, name:str):
+        '''
+            Replace the whole dataset.
+            '''
+        if self.exists(name):
+            shutil.rmtree(self.path(name))
+        for month, part in self._groupByMonth(df):
+            self._writeFile(os.path.join(self._monthDir(name, month), 'data.parquet'), part)
+
+    def update(self, df, name:str)->int:
+        '''
+            Append-only: the new rows are written as a new segment per month,
+            stored rows are never read back. Rows with an already stored
+            open_time replace the stored ones on read and on compaction.
+            '''
+        if not len(df):
+            return 0
+        for month, part in self._groupByMonth(df):
+            first_ms = int(part.index[0].value // 10**6)
+            self._writeFile(os.path.join(self._monthDir(name, month), f'part-{first_ms:015d}.parquet'), part)
+            if len(self.segments(name, month)) > self.max_segments:
+                self.compactMonth(name, month)
+        return len(df)
+
+    def compactMonth(self, name:str, month:str)->int:
+        segments = self.segments(name, month)
+        if len(segments) < 2:
+            return 0
+        self._writeFile(os.path.join(self._monthDir(name, month), 'data.parquet'), self._readMonth(name, month))
+        for segment in segments:
+            if os.path.basename(segment) != 'data.parquet':
+                os.remove(segment)
+        return len(segments) - 1
+
+    def compact(self, name:str)->int:
+        '''
+            Merge the segments of every month into its data.parquet,
+            returns the number of segments merged away.
+            '''
+        return sum(self.compactMonth(name, month) for month in self.months(name))
+
+    def read(self, name:str, start=None, end=None, columns:list=None):
+        '''
+            Rows with start <= open_time < end, None if the dataset does not exist.
+            '''
+        if not self.exists(name):
+            return None
+        dataset = ds.dataset(self.path(name), format='parquet', partitioning=self.partitioning)
+        # Bounds as nanosecond scalars, a datetime would drop the nanoseconds.
+        index_type = pa.timestamp('ns', tz=dataset.schema.field(self.index_col).type.tz)
+        bound = lambda timestamp: pa.scalar(timestamp.value, type=index_type)
+        condition = None
+        if start is not None:
+            start = Timestamp(start)
+            condition = (ds.field('month') >= month_key(start)) & (ds.field(self.index_col) >= bound(start))
+        if end is not None:
+            end = Timestamp(end)
+            upper = (ds.field('month') <= month_key(end)) & (ds.field(self.index_col) < bound(end))
+            condition = upper if condition is None else condition & upper
+        if columns is None:
+            columns = [field for field in dataset.schema.names if field not in ('month', self.index_col)]
+        table = dataset.to_table(columns=[self.index_col]+list(columns), filter=condition)
+        return drop_replaced(table.to_pandas().set_index(self.index_col))
+
+    def lastIndex(self, name:str):
+        '''
+            Newest open_time from the row group statistics of the last month,
+            no data page is read.
+            '''
+        months = self.months(name)
+        if not months:
+            return None
+        newest = []
+        for segment in self.segments(name, months[-1]):
+            metadata = pq.ParquetFile(segment).metadata
+            column = metadata.schema.to_arrow_schema().get_field_index(self.index_col)
+            statistics = [metadata.row_group(idx).column(column).statistics for idx in range(metadata.num_row_groups)]
+            if all(stats is not None and stats.has_min_max for stats in statistics):
+                newest += [Timestamp(stats.max) for stats in statistics]
+            else:
+                table = pq.read_table(segment, columns=[self.index_col])
+                newest.append(Timestamp(table.column(self.index_col).to_pandas().max()))
+        return max(newest) if newest else None
+
+
+class MemmapStore:
+    '''
+        One directory per dataset holding raw little-endian column files
+        and a small json header:
+            {root}/{name}.mm/header.json  {rows, index, columns: {name: dtype}}
+            {root}/{name}.mm/open_time.bin, open.bin, high.bin ...
+        Columns are opened lazily with np.memmap, so loading is instant and
+        every process reading the same dataset shares the OS page cache.
+        The header is written last, it is the source of truth for the row count.
+        '''
+    version = 1
+
+    def __init__(self, root:str='datasets', index_col:str='open_time'):
+        self.root = root
+        self.index_col = index_col
+
+    def path(self, name:str)->str:
+        return os.path.join(self.root, f'{name}.mm')
+
+    def exists(self, name:str)->bool:
+        return os.path.isfile(os.path.join(self.path(name), 'header.json'))
+
+    def header(self, name:str)->dict:
+        with open(os.path.join(self.path(name), 'header.json')) as f:
+            return json.load(f)
+
+    def _writeHeader(self, name:str, header:dict):
+        filepath = os.path.join(self.path(name), 'header.json')
+        with open(filepath+'.tmp', 'w') as f:
+            json.dump(header, f)
+        os.replace(filepath+'.tmp', filepath)
+
+    def _columnPath(self, name:str, column:str)->str:
+        return os.path.join(self.path(name), f'{column}.bin')
+
+    def _frameColumns(self, df)->dict:
+        columns = {self.index_col: np.ascontiguousarray(df.index.values)}
+        for column in df.columns:
+            columns[column] = np.ascontiguousarray(df[column].values)
+        return columns
+
+    def _appendColumns(self, name:str, columns:dict, header:dict, keep_rows:int):
+        '''
+            Cut every column file at keep_rows (drops bytes of an interrupted
+            append too) and write the new rows at the end.
+            When stored rows are replaced the header is shrunk to keep_rows
+            first, so it never counts rows the files no longer hold.
+            '''
+        if header['rows'] > keep_rows:
+            header['rows'] = keep_rows
+            self._writeHeader(name, header)
+        for column, dtype in header['columns'].items():
+            dtype = np.dtype(dtype)
+            with open(self._columnPath(name, column), 'ab') as f:
+                f.truncate(keep_rows*dtype.itemsize)
+                f.write(columns[column].astype(dtype, copy=False).tobytes())
+        header['rows'] = keep_rows + len(columns[self.index_col])
+        self._writeHeader(name, header)
+
+    def write(self, df, name:str):
+        '''
+            Replace the whole dataset.
+            '''
+        if os.path.isdir(self.path(name)):
+            shutil.rmtree(self.path(name))
+        os.makedirs(self.path(name))
+        columns = self._frameColumns(df)
+        header = dict(
+            version = self.version,
+            rows    = 0,
+            index   = self.index_col,
+            columns = {column: values.dtype.newbyteorder('<').str for column, values in columns.items()},
+        )
+        self._appendColumns(name, columns, header, keep_rows=0)
+
+    def update(self, df, name:str)->int:
+        '''
+            Append new rows, only the new bytes are written.
+            Stored rows from the first new open_time on are replaced.
+            The stored columns are kept, extra columns in df are ignored.
+            '''
+        if not len(df):
+            return 0
+        if not self.exists(name):
+            self.write(df, name)
+            return len(df)
+        header = self.header(name)
+        df = df.reindex(columns=[column for column in header['columns'] if column != self.index_col])
+        keep_rows = int(np.searchsorted(self.arrays(name)[self.index_col], df.index.values[0]))
+        self._appendColumns(name, self._frameColumns(df), header, keep_rows)
+        return len(df)
+
+    def arrays(self, name:str, start=None, end=None, columns:list=None)->dict:
+        '''
+            {column: read-only memmap view} of the rows with start <= open_time < end,
+            zero copy. None if the dataset does not exist.
+            '''
+        if not self.exists(name):
+            return None
+        header = self.header(name)
+        if columns is None:
+            columns = [column for column in header['columns'] if column != self.index_col]
+        columns = [self.index_col] + list(columns)
+        mapped = {
+            column: np.memmap(self._columnPath(name, column), dtype=header['columns'][column], mode='r', shape=(header['rows'],))
+                    if header['rows'] else np.empty(0, dtype=header['columns'][column])
+            for column in columns
+        }
+        index = mapped[self.index_col]
+        first = 0 if start is None else np.searchsorted(index, np.datetime64(Timestamp(start)), side='left')
+        last = len(index) if end is None else np.searchsorted(index, np.datetime64(Timestamp(end)), side='left')
+        return {column: values[first:last] for column, values in mapped.items()}
+
+    def read(self, name:str, start=None, end=None, columns:list=None):
+        '''
+            Rows with start <= open_time < end as a DataFrame, None if the dataset does not exist.
+            Zero copy: one block per column over the memmap views (copy=False keeps
+            pandas from consolidating them into a new 2-D block), so only the pages
+            actually used are touched. The frame is read-only, new columns can be
+            added, writes to stored columns need a .copy() first.
+            '''
+        arrays = self.arrays(name, start, end, columns)
+        if arrays is None:
+            return None
+        index = DatetimeIndex(arrays.pop(self.index_col), name=self.index_col, copy=False)
+        return DataFrame(arrays, index=index, copy=False)
+
+    def compact(self, name:str)->int:
+        '''
+            Columns are appended in place, there are no segments to merge.
+            '''
+        return 0
+
+    def lastIndex(self, name:str):
+        '''
+            Newest open_time, only the last page of the index file is touched.
+            '''
+        if not self.exists(name) or not self.header(name)['rows']:
+            return None
+        return Timestamp(self.arrays(name)[self.index_col][-1])
+
+
+DATASET_STORES = {
+    'pickle': PickleStore,
+    'parquet': ParquetStore,
+    'memmap': MemmapStore,
+}
+
+def open_store(fmt:str, root:str='datasets', **kwargs):
+    if fmt not in DATASET_STORES:
+        raise ValueError(f'Unknown dataset format {fmt}, expected one of {list(DATASET_STORES)}')
+    return DATASET_STORES[fmt](root, **kwargs)
@@ -0,0 +1,283 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+from pandas import DataFrame, Series
+import talib
+
+'''
+    Indicator engine behind PolarisBot.addIndicators.
+
+    Every indicator is a spec in INDICATORS: input columns, default
+    parameters, output column names and a compute function over
+    contiguous float64 arrays. Inputs are prepared once per frame.
+
+    With a cache directory, results are content addressed:
+        key = hash(indicator, params)-hash(dataset version)
+    where the dataset version is a hash of the open_time index and of the
+    input columns the indicator reads. Repeated notebook / backtest runs
+    on the same data load the columns instead of recomputing them, and
+    any change in the data (e.g new bars) yields a new key. Only the newest
+    version of every (indicator, params) is kept, older ones are deleted
+    when it is saved.
+    '''
+
+def _simple_returns(close, lookback):
+    return Series(close).pct_change(lookback).values
+
+def _log_returns(close, lookback):
+    return np.log(1 + Series(close).pct_change(lookback).values)
+
+INDICATORS = {
+    'simple_returns': dict(
+        inputs  = ('close',),
+        params  = dict(lookback=1),
+        outputs = ('simple_returns',),
+        compute = _simple_returns,
+    ),
+    'log_returns': dict(
+        inputs  = ('close',),
+        params  = dict(lookback=1),
+        outputs = ('log_returns_{lookback}',),
+        compute = _log_returns,
+    ),
+    'talib_EMA': dict(
+        inputs  = ('close',),
+        params  = dict(timeperiod=30),
+        outputs = ('talib_EMA_{timeperiod}',),
+        compute = talib.EMA,
+    ),
+    'talib_ATR': dict(
+        inputs  = ('high','low','close'),
+        params  = dict(timeperiod=14),
+        outputs = ('talib_ATR',),
+        compute = talib.ATR,
+    ),
+    'talib_SAR': dict(
+        inputs  = ('high','low'),
+        params  = dict(acceleration=0.02, maximum=0.2),
+        outputs = ('talib_SAR',),
+        compute = talib.SAR,
+    ),
+    'talib_BBANDS': dict(
+        inputs  = ('close',),
+        params  = dict(timeperiod=5, nbdevup=2, nbdevdn=2, matype=0),
+        outputs = ('BB_up','BB_mid','BB_low'),
+        compute = talib.BBANDS,
+    ),
+    'talib_STOCHRSI': dict(
+        inputs  = ('close',),
+        params  = dict(timeperiod=14, fastk_period=5, fastd_period=3, fastd_matype=0),
+        outputs = ('talib_STOCHRSI_k','talib_STOCHRSI_d'),
+        compute = talib.STOCHRSI,
+    ),
+    'talib_MACD': dict(
+        inputs  = ('close',),
+        params  = dict(fastperiod=12, slowperiod=26, signalperiod=9),
+        outputs = ('talib_MACD','talib_MACD_signal','talib_MACD_hist'),
+        compute = talib.MACD,
+    ),
+    'talib_ADX': dict(
+        inputs  = ('high','low','close'),
+        params  = dict(timeperiod=14),
+        outputs = ('talib_ADX',),
+        compute = talib.ADX,
+    ),
+    'talib_RSI': dict(
+        inputs  = ('close',),
+        params  = dict(timeperiod=14),
+        outputs = ('talib_RSI',),
+        compute = talib.RSI,
+    ),
+    'talib_AROON': dict(
+        inputs  = ('high','low'),
+        params  = dict(timeperiod=14),
+        outputs = ('talib_AROON_down','talib_AROON_up'),
+        compute = talib.AROON,
+    ),
+    'talib_OBV': dict(
+        inputs  = ('close','volume'),
+        params  = dict(),
+        outputs = ('talib_OBV',),
+        compute = talib.OBV,
+    ),
+    'talib_doji': dict(
+        inputs  = ('open','high','low','close'),
+        params  = dict(),
+        outputs = ('talib_doji',),
+        compute = talib.CDLDOJI,
+    ),
+}
+
+
+def expand_request(indicators:dict)->list:
+    '''
+        addIndicators request -> [(indicator, params)], params completed with the defaults.
+        {'talib_EMA':[10,20], 'talib_RSI':{'timeperiod':7}}
+            -> [('talib_EMA', {timeperiod:10}), ('talib_EMA', {timeperiod:20}), ('talib_RSI', {timeperiod:7})]
+        '''
+    jobs = []
+    for name, request in indicators.items():
+        if name not in INDICATORS:
+            raise ValueError(f'Unknown indicator {name}, expected one of {list(INDICATORS)}')
+        defaults = INDICATORS[name]['params']
+        if name == 'talib_EMA' and not isinstance(request, dict):
+            jobs += [(name, dict(timeperiod=period)) for period in request]
+            continue
+        request = request or {}
+        jobs.append((name, {param: request.get(param, default) for param, default in defaults.items()}))
+    return jobs
+
+def output_columns(name:str, params:dict)->list:
+    return [column.format(**params) for column in INDICATORS[name]['outputs']]
+
+def family_outputs(name:str)->list:
+    '''
+        Output names of a timeperiod family, without the period.
+        talib_EMA -> ['talib_EMA'], talib_AROON -> ['talib_AROON_down', 'talib_AROON_up']
+        '''
+    if 'timeperiod' not in INDICATORS[name]['params']:
+        raise ValueError(f'{name} has no timeperiod, it can not be computed as a family')
+    return [column.replace('_{timeperiod}', '') for column in INDICATORS[name]['outputs']]
+
+def family_columns(name:str, period:int)->list:
+    '''
+        DataFrame columns of one period of a family, e.g talib_EMA_20, talib_AROON_up_20.
+        '''
+    return [f'{output}_{period}' for output in family_outputs(name)]
+
+
+class IndicatorEngine:
+    '''
+        cache_dir: directory of the npz cache, usually datasets/{filename}.indicators
+                   next to the dataset. None disables the cache.
+        '''
+    def __init__(self, cache_dir:str=None):
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.misses = 0
+
+    def prepareInputs(self, df, columns)->dict:
+        '''
+            Contiguous float64 copies of the input columns, made once per frame.
+            '''
+        return {column: np.ascontiguousarray(df[column].values, dtype=np.float64) for column in columns}
+
+    def datasetVersions(self, df, inputs:dict)->dict:
+        '''
+            Content hash of the index, and of every input column on top of it.
+            '''
+        index_hash = hashlib.blake2b(np.ascontiguousarray(df.index.values).view(np.uint8), digest_size=16)
+        versions = {}
+        for column, values in inputs.items():
+            digest = index_hash.copy()
+            digest.update(column.encode())
+            digest.update(values.view(np.uint8))
+            versions[column] = digest.hexdigest()
+        return versions
+
+    def cacheKey(self, versions:dict, name:str, params:dict)->str:
+        '''
+            {job hash}-{version hash}, entries sharing the job hash are
+            versions of the same (indicator, params).
+            '''
+        job = json.dumps([name, params], sort_keys=True)
+        version = json.dumps([versions[column] for column in INDICATORS[name]['inputs']])
+        return '-'.join(
+            hashlib.blake2b(payload.encode(), digest_size=10).hexdigest() for payload in (job, version)
+        )
+
+    def _load(self, key:str)->dict:
+        if self.cache_dir is None:
+            return None
+        filepath = os.path.join(self.cache_dir, f'{key}.npz')
+        if not os.path.isfile(filepath):
+            return None
+        with np.load(filepath) as cached:
+            return {column: cached[column] for column in cached.files}
+
+    def _save(self, key:str, columns:dict):
+        if self.cache_dir is None:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        filepath = os.path.join(self.cache_dir, f'{key}.npz')
+        # np.savez appends .npz, write aside then rename.
+        np.savez(filepath[:-len('.npz')] + '.tmp', **columns)
+        os.replace(filepath[:-len('.npz')] + '.tmp.npz', filepath)
+        # Evict the other dataset versions of this job.
+        job = key.split('-')[0]
+        for entry in os.listdir(self.cache_dir):
+            if entry.startswith(job+'-') and entry.endswith('.npz') and entry != f'{key}.npz':
+                try:
+                    os.remove(os.path.join(self.cache_dir, entry))
+                except FileNotFoundError:
+                    # Evicted by another engine sharing the directory.
+                    pass
+
+    def computeOne(self, name:str, params:dict, inputs:dict)->dict:
+        spec = INDICATORS[name]
+        result = spec['compute'](*(inputs[column] for column in spec['inputs']), **params)
+        if not isinstance(result, tuple):
+            result = (result,)
+        return dict(zip(output_columns(name, params), result))
+
+    def compute(self, df, indicators:dict)->dict:
+        '''
+            {output column: ndarray} for an addIndicators request.
+            '''
+        jobs = expand_request(indicators)
+        needed = {column for name, _ in jobs for column in INDICATORS[name]['inputs']}
+        inputs = self.prepareInputs(df, sorted(needed))
+        versions = self.datasetVersions(df, inputs) if self.cache_dir is not None else None
+        columns = {}
+        for name, params in jobs:
+            columns.update(self._cachedOne(name, params, inputs, versions))
+        return columns
+
+    def _cachedOne(self, name:str, params:dict, inputs:dict, versions:dict)->dict:
+        key = self.cacheKey(versions, name, params) if versions is not None else None
+        result = self._load(key) if key else None
+        if result is None:
+            self.misses += 1
+            result = self.computeOne(name, params, inputs)
+            if key:
+                self._save(key, result)
+        else:
+            self.hits += 1
+        return result
+
+    def computeFamily(self, df, name:str, periods:list, **params)->dict:
+        '''
+            {output: 2-D array (len(periods), rows)} of an indicator over many
+            timeperiods in one call, e.g every EMA / AROON of an optimization grid.
+            Inputs are prepared and hashed once for the whole family, every row
+            is a C TA-Lib pass (cached like compute), so a parameter sweep
+            computes each period once instead of once per grid point.
+            '''
+        outputs = family_outputs(name)
+        spec = INDICATORS[name]
+        inputs = self.prepareInputs(df, spec['inputs'])
+        versions = self.datasetVersions(df, inputs) if self.cache_dir is not None else None
+        family = {output: np.empty((len(periods), len(df)), dtype=np.float64) for output in outputs}
+        for row, period in enumerate(periods):
+            job = dict(spec['params'], **params, timeperiod=period)
+            result = self._cachedOne(name, job, inputs, versions)
+            for output, column in zip(outputs, output_columns(name, job)):
+                family[output][row] = result[column]
+        return family
+
+    def familyFrame(self, df, name:str, periods:list, **params):
+        '''
+            computeFamily as a DataFrame indexed like df, columns family_columns(name, period).
+            '''
+        family = self.computeFamily(df, name, periods, **params)
+        columns = {}
+        for row, period in enumerate(periods):
+            columns.update(zip(family_columns(name, period), (values[row] for values in family.values())))
+        return DataFrame(columns, index=df.index)
+
+    def apply(self, df, indicators:dict):
+        for column, values in self.compute(df, indicators).items():
+            df[column] = values
+        return df
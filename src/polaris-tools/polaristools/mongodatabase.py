@@ -1,9 +1,92 @@
+import bson
 from bson.objectid import ObjectId
 import inspect
-from pymongo import MongoClient
-from pymongo.errors import ConnectionFailure
+import logging
+
+import numpy as np
+from pymongo import ASCENDING, MongoClient, ReplaceOne
+from pymongo.errors import BulkWriteError, ConnectionFailure, OperationFailure
 import pytz
 
+from polaristools.utils import KLINE_DTYPE, interval_to_granularity, kline_documents
+
+try:
+    import pyarrow
+    from pymongoarrow.api import Schema, find_numpy_all
+except ImportError:
+    find_numpy_all = None
+
+logger = logging.getLogger(__name__)
+
+
+def kline_column_dtype(field:str):
+    ''' 
+        NumPy dtype of a stored kline field, dates as datetime64[ms].
+        '''
+    if field in ('open_time', 'close_time'):
+        return np.dtype('datetime64[ms]')
+    return KLINE_DTYPE[field]
+
+
+# Fixed size BSON element types, the only ones decode_kline_batch reads in place.
+BSON_FIXED_SIZES = {0x01:8, 0x07:12, 0x08:1, 0x09:8, 0x10:4, 0x11:8, 0x12:8}
+BSON_NUMPY_TYPES = {0x01:'<f8', 0x09:'<i8', 0x10:'<i4', 0x12:'<i8'}
+
+def bson_layout(document:bytes):
+    ''' 
+        {field: (element type, value offset)} of a flat BSON document and the
+        mask of its non value bytes (length, types, names, terminator).
+        None if a value has a variable size (strings, sub documents ...).
+        '''
+    layout = {}
+    mask = np.ones(len(document), dtype=bool)
+    offset = 4
+    while document[offset] != 0:
+        kind = document[offset]
+        name_end = document.index(b'\x00', offset+1)
+        size = BSON_FIXED_SIZES.get(kind)
+        if size is None:
+            return None
+        layout[document[offset+1:name_end].decode()] = (kind, name_end+1)
+        mask[name_end+1:name_end+1+size] = False
+        offset = name_end + 1 + size
+    return layout, mask
+
+def decode_kline_batch(batch:bytes, fields:list)->dict:
+    ''' 
+        Raw BSON batch (find_raw_batches) to {field: ndarray}.
+        Kline documents of a collection share one layout (same fields, same
+        types, same size), so the batch is viewed as a (documents, size) byte
+        matrix and every field is read in place, no Python object per document.
+        Batches that do not share a layout go through bson.decode_all.
+        '''
+    if not batch:
+        return {field: np.empty(0, dtype=kline_column_dtype(field)) for field in fields}
+    size = int.from_bytes(batch[:4], 'little')
+    parsed = bson_layout(batch[:size]) if len(batch) % size == 0 else None
+    if parsed is not None and all(field in parsed[0] for field in fields):
+        layout, mask = parsed
+        rows = np.frombuffer(batch, dtype=np.uint8).reshape(-1, size)
+        if (rows[:, mask] == rows[0, mask]).all():
+            columns = {}
+            for field in fields:
+                kind, offset = layout[field]
+                numpy_type = BSON_NUMPY_TYPES.get(kind)
+                if numpy_type is None:
+                    break
+                width = np.dtype(numpy_type).itemsize
+                values = np.ascontiguousarray(rows[:, offset:offset+width]).view(numpy_type).ravel()
+                dtype = kline_column_dtype(field)
+                # BSON datetimes are int64 epoch milliseconds.
+                columns[field] = values.view(dtype) if dtype.kind == 'M' else values.astype(dtype, copy=False)
+            else:
+                return columns
+    docs = bson.decode_all(batch)
+    return {
+        field: np.array([doc.get(field) for doc in docs], dtype=kline_column_dtype(field))
+        for field in fields
+    }
+
 
 class MongoDatabase:
     
@@ -13,6 +96,11 @@ class MongoDatabase:
         self.db_user = credentials.get('db_user')
         self.db_pass = credentials.get('db_pass')
         self.db_host = credentials.get('db_host')
+        # (db_name, collection) -> True with the open_time unique index in place,
+        # False when duplicated candles only allowed a plain open_time index.
+        self.indexed = {}
+        # (db_name, collection) -> True when it is a time-series collection.
+        self.timeseries = {}
         
         if credentials.get('db_name'):
             self.db_name = credentials.get('db_name')
@@ -21,7 +109,10 @@ class MongoDatabase:
             self.collection_name = credentials.get('collection_name')
         
         try:
-            uri = f'mongodb://{self.db_user}:{self.db_pass}@{self.db_host}'
+            if self.db_user:
+                uri = f'mongodb://{self.db_user}:{self.db_pass}@{self.db_host}'
+            else:
+                uri = f'mongodb://{self.db_host}'
             self.client = MongoClient(uri)
             self.client.admin.command('ping')
             print(f'MongoDB server. host : {self.db_host}\n')
@@ -52,23 +143,132 @@ class MongoDatabase:
             my_db = self.client[self.db_name]
         return my_db.list_collection_names()
 
+    def _edgePipeline(self, direction:int, collection:str=None)->list:
+        ''' 
+            Oldest (1) or newest (-1) open_time, served by the open_time index.
+            '''
+        project = {'_id':0, 'open_time':1}
+        if collection:
+            project['collection'] = {'$literal':collection}
+        return [
+            {'$sort': {'open_time':direction}},
+            {'$limit': 1},
+            {'$project': project},
+        ]
+
+    def _ensureIndexes(self, db_name:str, collections:list):
+        ''' 
+            Index only collections that exist, creating an index would create them.
+            '''
+        pending = [collection for collection in collections if (db_name, collection) not in self.indexed]
+        if not pending:
+            return
+        existing = set(self.client[db_name].list_collection_names())
+        for collection in pending:
+            if collection in existing:
+                self.ensureKlinesIndex(db_name, collection)
+
     def readEdges(self, db_name:str, collection:str):
-        my_db           = self.client[db_name]
-        query_startdate = my_db[collection].find().sort('open_time',1).limit(1)
-        query_enddate   = my_db[collection].find().sort('open_time',-1).limit(1)
-        startdate       = query_startdate.next()['open_time']
-        enddate         = query_enddate.next()['open_time']
+        ''' 
+            (oldest, newest) open_time in a single round-trip,
+            (None, None) if the collection does not exist or is empty.
+            '''
+        self._ensureIndexes(db_name, [collection])
+        query_edges = self.client[db_name][collection].aggregate(
+            self._edgePipeline(1) + [
+                {'$unionWith': {'coll':collection, 'pipeline':self._edgePipeline(-1)}},
+            ]
+        )
+        edges     = [doc['open_time'] for doc in query_edges]
+        if not edges:
+            return (None, None)
+        startdate = edges[0]
+        enddate   = edges[-1]
         # print('start date: ',startdate,'\n','end date: ',enddate)
         return (startdate,enddate)
 
+    def extractNewestDates(self, db_name:str, collections:list)->dict:
+        ''' 
+            Newest open_time (utc) of every collection in a single round-trip.
+            Collections not created yet, or empty, map to None.
+            '''
+        if not collections:
+            return {}
+        self._ensureIndexes(db_name, collections)
+        pipeline = self._edgePipeline(-1, collections[0])
+        for collection in collections[1:]:
+            pipeline.append(
+                {'$unionWith': {'coll':collection, 'pipeline':self._edgePipeline(-1, collection)}}
+            )
+        newest = dict.fromkeys(collections)
+        for doc in self.client[db_name][collections[0]].aggregate(pipeline):
+            newest[doc['collection']] = doc['open_time'].replace(tzinfo=pytz.utc)
+        return newest
+
     def extractNewestDate(self, db_name:str, collection:str):
-        my_db = self.client[db_name]
-        try:
-            query_newest = my_db[collection].find().sort('open_time',-1).limit(1)
-            dtime = (query_newest.next()['open_time']).replace(tzinfo=pytz.utc)
-            return dtime
-        except:
+        dtime = self.extractNewestDates(db_name, [collection])[collection]
+        if dtime is None:
             print(f'Parece que la base de datos {db_name} o colección {collection} no han sido creadas aún. {inspect.currentframe().f_code.co_name}')
+        return dtime
+
+    def iterKlineColumns(self, db_name:str, collection:str, fields:list, query:dict=None, sort:list=None, limit:int=0, chunk_rows:int=100000):
+        ''' 
+            Yield {field: ndarray} chunks of exactly chunk_rows rows (the last one
+            may be shorter). The cursor is batched server-side, raw BSON batches
+            are decoded one at a time by decode_kline_batch, so at most about two
+            chunks are held in memory.
+            '''
+        self._ensureIndexes(db_name, [collection])
+        projection = dict.fromkeys(fields, 1)
+        projection['_id'] = 0
+        cursor = self.client[db_name][collection].find_raw_batches(
+            query or {}, projection, sort=sort, limit=limit, batch_size=chunk_rows,
+        )
+        buffered = {field: [] for field in fields}
+        rows = 0
+        for batch in cursor:
+            decoded = decode_kline_batch(batch, fields)
+            for field in fields:
+                buffered[field].append(decoded[field])
+            rows += len(decoded[fields[0]]) if fields else 0
+            while rows >= chunk_rows:
+                columns = {field: np.concatenate(buffered[field]) for field in fields}
+                yield {field: column[:chunk_rows] for field, column in columns.items()}
+                buffered = {field: [column[chunk_rows:].copy()] for field, column in columns.items()}
+                rows -= chunk_rows
+        if rows:
+            yield {field: np.concatenate(buffered[field]) for field in fields}
+
+    def readKlineColumns(self, db_name:str, collection:str, fields:list, query:dict=None, sort:list=None, limit:int=0, batch_size:int=100000)->dict:
+        ''' 
+            Columnar read, {field: ndarray} in `sort` order (natural order by default).
+            pymongoarrow (requirements.txt) decodes BSON in C straight into the
+            arrays. Without it the chunks of iterKlineColumns are joined, read in
+            place from the raw batches by decode_kline_batch.
+            '''
+        self._ensureIndexes(db_name, [collection])
+        if find_numpy_all is not None:
+            schema = Schema({
+                field: pyarrow.timestamp('ms') if kline_column_dtype(field).kind == 'M'
+                       else pyarrow.from_numpy_dtype(kline_column_dtype(field))
+                for field in fields
+            })
+            return find_numpy_all(self.client[db_name][collection], query or {}, schema=schema, sort=sort, limit=limit)
+        chunks = list(self.iterKlineColumns(db_name, collection, fields, query, sort, limit, batch_size))
+        return {
+            field: np.concatenate([chunk[field] for chunk in chunks]) if chunks
+                   else np.empty(0, dtype=kline_column_dtype(field))
+            for field in fields
+        }
+
+    def explainKlinesQuery(self, db_name:str, collection:str, query:dict, sort:list=None)->dict:
+        ''' 
+            Winning plan of a kline read, to check it is served by the open_time index.
+            '''
+        cursor = self.client[db_name][collection].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        return cursor.explain()['queryPlanner']['winningPlan']
 
     def deleteNewestEntry(self, db_name:str, collection:str):
         my_db   = self.client[db_name]
@@ -91,6 +291,168 @@ class MongoDatabase:
         created_id = coll.insert_one(data).inserted_id
         return created_id
 
+    def isTimeseries(self, db_name:str, collection:str)->bool:
+        if (db_name, collection) not in self.timeseries:
+            info = list(self.client[db_name].list_collections(filter={'name':collection}))
+            if not info:
+                # Not created yet, do not cache.
+                return False
+            self.timeseries[(db_name, collection)] = info[0].get('type') == 'timeseries'
+        return self.timeseries[(db_name, collection)]
+
+    def createKlinesCollection(self, db_name:str, collection:str, interval:str, timeseries:bool=False):
+        ''' 
+            Create a klines collection if it does not exist yet.
+            timeseries=True makes it a MongoDB (>=5.0) time-series collection:
+                timeField open_time, metaField meta {symbol, interval},
+                granularity derived from the interval. Documents are stored
+                in compressed buckets instead of one document per candle.
+            '''
+        my_db = self.client[db_name]
+        if collection not in my_db.list_collection_names():
+            if timeseries:
+                my_db.create_collection(collection, timeseries={
+                    'timeField':'open_time',
+                    'metaField':'meta',
+                    'granularity':interval_to_granularity(interval),
+                })
+            else:
+                my_db.create_collection(collection)
+        self.ensureKlinesIndex(db_name, collection)
+
+    def migrateToTimeseries(self, db_name:str, collection:str, batch_size:int=10000, drop_legacy:bool=False)->int:
+        ''' 
+            Move a plain {stream_type}_{SYMBOL}_{interval} collection into a
+            time-series collection with the same name.
+            The original is renamed to {collection}_legacy and dropped only
+            when drop_legacy=True. Returns the number of copied candles.
+            '''
+        symbol, interval = collection.rsplit('_', 2)[1:]
+        meta = {'symbol':symbol, 'interval':interval}
+        legacy = f'{collection}_legacy'
+        my_db = self.client[db_name]
+        my_db[collection].rename(legacy)
+        self.indexed.pop((db_name, collection), None)
+        self.timeseries.pop((db_name, collection), None)
+        self.createKlinesCollection(db_name, collection, interval, timeseries=True)
+        
+        copied = 0
+        batch = []
+        for doc in my_db[legacy].find({}, {'_id':0}).sort('open_time', 1).batch_size(batch_size):
+            doc['meta'] = meta
+            batch.append(doc)
+            if len(batch) == batch_size:
+                copied += len(my_db[collection].insert_many(batch, ordered=False).inserted_ids)
+                batch = []
+        if batch:
+            copied += len(my_db[collection].insert_many(batch, ordered=False).inserted_ids)
+        if drop_legacy:
+            my_db[legacy].drop()
+        return copied
+
+    def ensureKlinesIndex(self, db_name:str, collection:str, retry:bool=False)->bool:
+        ''' 
+            Unique index on open_time, one candle per open time.
+            Time-series collections do not support unique indexes, they get
+            a plain open_time index and insert_klines_bulk skips stored candles.
+            Legacy collections holding duplicated open_time cannot get the unique
+            index: they get a plain one, so reads are still served by an index,
+            and the failure is remembered instead of rescanning the collection on
+            every read, until retry=True (see removeDuplicateKlines).
+            Only hits the server the first time per collection.
+            Returns True when stored candles are unique by open_time.
+            '''
+        key = (db_name, collection)
+        if key in self.indexed and (self.indexed[key] or not retry):
+            return self.indexed[key]
+        coll = self.client[db_name][collection]
+        if self.isTimeseries(db_name, collection):
+            coll.create_index([('open_time', ASCENDING)])
+            self.indexed[key] = True
+            return True
+        try:
+            if 'open_time_1' in coll.index_information():
+                # Plain index left by an earlier failed attempt, same key pattern.
+                coll.drop_index('open_time_1')
+            coll.create_index([('open_time', ASCENDING)], unique=True, name='open_time_unique')
+            self.indexed[key] = True
+        except OperationFailure as e:
+            logger.error('Duplicated open_time in %s.%s, plain open_time index built instead, '
+                         'run removeDuplicateKlines. %s', db_name, collection, e)
+            coll.create_index([('open_time', ASCENDING)])
+            self.indexed[key] = False
+        return self.indexed[key]
+
+    def removeDuplicateKlines(self, db_name:str, collection:str)->int:
+        ''' 
+            One-off cleanup for collections filled before the unique index existed.
+            Keeps the first document of every open_time, returns deleted count.
+            '''
+        coll = self.client[db_name][collection]
+        duplicates = coll.aggregate([
+            {'$group': {'_id':'$open_time', 'ids':{'$push':'$_id'}, 'count':{'$sum':1}}},
+            {'$match': {'count':{'$gt':1}}},
+        ], allowDiskUse=True)
+        extra_ids = [_id for group in duplicates for _id in group['ids'][1:]]
+        deleted = 0
+        for i in range(0, len(extra_ids), 10000):
+            deleted += coll.delete_many({'_id':{'$in':extra_ids[i:i+10000]}}).deleted_count
+        self.ensureKlinesIndex(db_name, collection, retry=True)
+        return deleted
+
+    def insert_klines_bulk(self, db_name:str, collection:str, klines, batch_size:int=5000, upsert:bool=False, meta:dict=None):
+        ''' 
+            Write a page of klines with unordered writes, batch_size docs per call.
+            klines: raw api arrays, a NumPy record array or documents
+                    already built by utils.kline_documents.
+            upsert: False, candles already stored are skipped (duplicate key tolerated).
+                    True, candles already stored are replaced by the new ones.
+            Re-running a window is safe both ways thanks to the open_time unique index.
+            meta:   {symbol, interval}, stored as metaField on time-series collections.
+                    Those cannot be updated in place, candles up to the newest stored
+                    one are skipped instead and upsert is ignored.
+            A legacy collection holding duplicated candles is deduplicated with
+            removeDuplicateKlines first, OperationFailure if the unique index
+            still can not be built: writing without it would duplicate candles.
+            Returns the number of inserted (or upserted and replaced) documents.
+            '''
+        if len(klines) and isinstance(klines[0], dict):
+            documents = klines
+        else:
+            documents = kline_documents(klines)
+        if not self.ensureKlinesIndex(db_name, collection):
+            logger.warning('Removing duplicated open_time from %s.%s before writing.', db_name, collection)
+            self.removeDuplicateKlines(db_name, collection)
+            if not self.ensureKlinesIndex(db_name, collection):
+                raise OperationFailure(f'No open_time unique index on {db_name}.{collection}, klines not written.')
+        coll = self.client[db_name][collection]
+        if self.isTimeseries(db_name, collection):
+            upsert = False
+            newest = coll.find_one({}, {'_id':0, 'open_time':1}, sort=[('open_time', -1)])
+            if newest:
+                documents = [doc for doc in documents if doc['open_time'] > newest['open_time']]
+            if meta:
+                for doc in documents:
+                    doc['meta'] = meta
+        written = 0
+        for i in range(0, len(documents), batch_size):
+            batch = documents[i:i+batch_size]
+            try:
+                if upsert:
+                    result = coll.bulk_write(
+                        [ReplaceOne({'open_time':doc['open_time']}, doc, upsert=True) for doc in batch],
+                        ordered=False,
+                    )
+                    written += result.upserted_count + result.modified_count
+                else:
+                    result = coll.insert_many(batch, ordered=False)
+                    written += len(result.inserted_ids)
+            except BulkWriteError as e:
+                if any(error['code'] != 11000 for error in e.details['writeErrors']):
+                    raise
+                written += e.details['nInserted'] + e.details['nUpserted'] + e.details['nModified']
+        return written
+
     def countDocuments(self, db_name, collection):
         my_db = self.client[db_name]
         collection = my_db[collection]
@@ -0,0 +1,82 @@
+from concurrent.futures import ProcessPoolExecutor
+from os import path
+
+import numpy as np
+from pandas import DataFrame, DatetimeIndex, MultiIndex
+
+from polaristools.datasetstore import open_store
+from polaristools.indicators import IndicatorEngine
+
+'''
+    Indicator panel of many datasets (symbols), computed in worker processes.
+
+    Every worker reads one dataset from the store and runs the indicator
+    engine on its own rows, TA-Lib holds the GIL so parallelism comes from
+    processes. The results are aligned on the union of the open_time
+    indexes, missing bars as NaN, into one DataFrame with columns
+    (dataset, column):
+        panel['df_klines_BTCUSDT_240m']['talib_RSI']            one dataset
+        panel.xs('talib_RSI', axis=1, level='column')           every dataset, time x dataset
+    Mix datasets of one timeframe, the union of 1m and 240m indexes is mostly empty.
+    '''
+
+def dataset_indicators(fmt:str, root:str, name:str, indicators:dict, start=None, end=None, include:tuple=('close',), cache:bool=True):
+    '''
+        (name, open_time int64 ns, {column: ndarray}) of one dataset, None columns if it does not exist.
+        Runs in the workers, only the arrays travel back.
+        '''
+    df = open_store(fmt, root).read(name, start=start, end=end)
+    if df is None:
+        return name, None, None
+    engine = IndicatorEngine(path.join(root, f'{name}.indicators') if cache else None)
+    columns = {column: df[column].values for column in include if column in df.columns}
+    if indicators:
+        columns.update(engine.compute(df, indicators))
+    return name, df.index.values.astype('datetime64[ns]').view('int64'), columns
+
+def align_panel(results:list, index_name:str='open_time'):
+    '''
+        [(name, int64 index, {column: ndarray})] -> DataFrame on the union of the
+        indexes, columns MultiIndex (dataset, column).
+        '''
+    index = np.unique(np.concatenate([labels for _, labels, _ in results])) if results else np.empty(0, dtype='int64')
+    data = {}
+    for name, labels, columns in results:
+        positions = np.searchsorted(index, labels)
+        dense = len(labels) == len(index)
+        for column, values in columns.items():
+            if dense:
+                data[(name, column)] = values
+                continue
+            if values.dtype.kind == 'M':
+                filled = np.full(len(index), np.datetime64('NaT'), dtype=values.dtype)
+            else:
+                filled = np.full(len(index), np.nan, dtype=np.result_type(values.dtype, np.float64))
+            filled[positions] = values
+            data[(name, column)] = filled
+    panel = DataFrame(data, index=DatetimeIndex(index.view('datetime64[ns]'), name=index_name))
+    if data:
+        panel.columns = MultiIndex.from_tuples(list(data), names=['dataset','column'])
+    return panel
+
+def compute_panel(names:list, indicators:dict, fmt:str='pickle', root:str='datasets', workers:int=1,
+                  start=None, end=None, include:tuple=('close',), cache:bool=True):
+    '''
+        names:      dataset names, e.g every symbol of one timeframe.
+        indicators: addIndicators request, see indicators.INDICATORS.
+        workers:    > 1 computes the datasets in a process pool.
+        include:    dataset columns copied next to the indicators.
+        cache:      use each dataset's npz indicator cache, datasets/{name}.indicators.
+        Rows with start <= open_time < end.
+        '''
+    root = path.abspath(root)
+    args = [(fmt, root, name, indicators, start, end, tuple(include), cache) for name in names]
+    if workers <= 1 or len(args) <= 1:
+        results = [dataset_indicators(*arg) for arg in args]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(dataset_indicators, *zip(*args)))
+    missing = [name for name, labels, _ in results if labels is None]
+    if missing:
+        raise FileNotFoundError(f'Datasets not found in {root}: {missing}')
+    return align_panel(results)
@@ -0,0 +1,152 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from queue import Queue, Empty, Full
+from threading import Event, Thread
+from time import perf_counter
+
+'''
+    Bounded producer/consumer pipeline for kline ingestion.
+
+    fetch -> parse -> write, every stage in its own thread and linked
+    by queues of maxsize pages. A full queue blocks the stage upstream
+    (backpressure), so at most a few pages are held in memory while
+    page N+1 is in flight and page N is being written.
+    '''
+
+_DONE = object()
+
+
+def new_stage_stats(stages=('fetch', 'parse', 'write')):
+    '''
+        items: pages processed.
+        busy:  seconds spent doing the stage work.
+        wait:  seconds blocked on an empty input or a full output queue.
+        '''
+    return {stage: dict(items=0, busy=0.0, wait=0.0) for stage in stages}
+
+def merge_stage_stats(total:dict, stats:dict):
+    for stage, counters in stats.items():
+        total.setdefault(stage, dict(items=0, busy=0.0, wait=0.0))
+        for counter, value in counters.items():
+            total[stage][counter] += value
+    return total
+
+
+class KlinesPipeline:
+    '''
+        fetch: callable returning an iterator of raw pages.
+        parse: callable(page) -> parsed page.
+        write: callable(parsed page), runs in the calling thread.
+        '''
+    def __init__(self, fetch, parse, write, maxsize:int=4):
+        self.fetch = fetch
+        self.parse = parse
+        self.write = write
+        self.maxsize = maxsize
+        self.stats = new_stage_stats()
+        self.stop = Event()
+        self.errors = []
+
+    def _put(self, queue, item, stage):
+        start = perf_counter()
+        while not self.stop.is_set():
+            try:
+                queue.put(item, timeout=0.1)
+                break
+            except Full:
+                continue
+        self.stats[stage]['wait'] += perf_counter() - start
+
+    def _get(self, queue, stage):
+        start = perf_counter()
+        item = _DONE
+        while not self.stop.is_set():
+            try:
+                item = queue.get(timeout=0.1)
+                break
+            except Empty:
+                continue
+        self.stats[stage]['wait'] += perf_counter() - start
+        return item
+
+    def _fetcher(self, q_out):
+        try:
+            pages = iter(self.fetch())
+            while not self.stop.is_set():
+                start = perf_counter()
+                page = next(pages, _DONE)
+                self.stats['fetch']['busy'] += perf_counter() - start
+                if page is _DONE:
+                    break
+                self.stats['fetch']['items'] += 1
+                self._put(q_out, page, 'fetch')
+        except Exception as e:
+            self.errors.append(e)
+            self.stop.set()
+        finally:
+            self._put(q_out, _DONE, 'fetch')
+
+    def _parser(self, q_in, q_out):
+        try:
+            while True:
+                page = self._get(q_in, 'parse')
+                if page is _DONE:
+                    break
+                start = perf_counter()
+                parsed = self.parse(page)
+                self.stats['parse']['busy'] += perf_counter() - start
+                self.stats['parse']['items'] += 1
+                self._put(q_out, parsed, 'parse')
+        except Exception as e:
+            self.errors.append(e)
+            self.stop.set()
+        finally:
+            self._put(q_out, _DONE, 'parse')
+
+    def run(self):
+        q_raw = Queue(maxsize=self.maxsize)
+        q_parsed = Queue(maxsize=self.maxsize)
+        threads = [
+            Thread(target=self._fetcher, args=(q_raw,), daemon=True),
+            Thread(target=self._parser, args=(q_raw, q_parsed), daemon=True),
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            while True:
+                parsed = self._get(q_parsed, 'write')
+                if parsed is _DONE:
+                    break
+                start = perf_counter()
+                self.write(parsed)
+                self.stats['write']['busy'] += perf_counter() - start
+                self.stats['write']['items'] += 1
+        except Exception as e:
+            self.errors.append(e)
+        finally:
+            self.stop.set()
+            for thread in threads:
+                thread.join()
+        if self.errors:
+            raise self.errors[0]
+        return self.stats
+
+
+def ordered_map(function, items, workers:int=1):
+    '''
+        Like map(function, items) with up to `workers` calls in flight.
+        Results are yielded in input order and at most `workers` of them
+        are held ahead of the consumer.
+        '''
+    if workers <= 1:
+        for item in items:
+            yield function(item)
+        return
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        in_flight = deque()
+        for item in items:
+            in_flight.append(executor.submit(function, item))
+            if len(in_flight) >= workers:
+                yield in_flight.popleft().result()
+        while in_flight:
+            yield in_flight.popleft().result()
@@ -1,17 +1,20 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 import inspect
 # import os
-import pickle 
-from time import time, sleep
-from os import chdir, getcwd, listdir
+from os import chdir, getcwd, listdir, path
 
 import numpy as np
 from pandas import DataFrame
-import pdmongo
-import talib
 
 from polaristools.binanceconnection import BinanceConnection
+from polaristools.datasetstore import open_store
+from polaristools.indicators import IndicatorEngine
 from polaristools.mongodatabase import MongoDatabase
+from polaristools.panel import compute_panel
+from polaristools.pipeline import KlinesPipeline, merge_stage_stats, new_stage_stats, ordered_map
+from polaristools.resampler import resample_dataset
+from polaristools.streaming import update_indicator_dataset
 from polaristools.utils import *
 
 ''' 
@@ -22,8 +25,11 @@ class PolarisBot:
 
     def __init__(self, mongo_cred={}, **kwargs):
         ''' 
+            kwargs:
+                pool_size: http connections kept per binance base url,
+                           should be >= the capture concurrency.
             '''
-        self.binance = BinanceConnection()
+        self.binance = BinanceConnection(pool_size=kwargs.get('pool_size', 10))
         
         if mongo_cred:
             credentials = dict(
@@ -40,135 +46,166 @@ class PolarisBot:
         # else:
             # print('No credentials passed yet')
 
-    def createDatabaseKlines(self,symbols:list,interval:str,quoted_asset:str,stream_type:str,market_type:str,):
+    def createDatabaseKlines(self,symbols:list,interval:str,quoted_asset:str,stream_type:str,market_type:str,concurrency:int=1,page_concurrency:int=1,timeseries:bool=False):
+        ''' 
+            timeseries: create the collections as MongoDB time-series collections.
+            '''
         logger = logger_func(logger_name=__name__, filename='file.log')
         testConn = self.mongo.pingServer()
         if testConn == 400:
             return 'MongoServer is NOT available\n'
-        ms_now              = int(time()*1000)
         db_name             = f"binance_{market_type}_{quoted_asset}"
-        limit               = 500
+        limit               = optimal_page_size(stream_type)
         timeframe:int       = interval_to_milliseconds(interval)
         last_valid_ms:int   = latest_valid_timestamp(timeframe)
-        for symbol in symbols:
+        
+        def createSymbol(symbol):
             collection_name = f"{stream_type}_{symbol.upper()}_{interval.lower()}"
-            start_ms:int    = self.binance.getEarliestValidTimestamp(symbol, interval, stream_type)
-            while True:
-                if stream_type=='klines':
-                    temp_data = self.binance.klineCandlestick(
-                        symbol = symbol,
-                        interval = interval,
-                        startTime = start_ms,
-                        endTime = last_valid_ms,
-                        limit = limit,
-                    )
-                elif stream_type=='continuous_klines':
-                    temp_data = self.binance.futuresContinuousKlines(
-                        pair = symbol,
-                        interval = interval,
-                        startTime = start_ms,
-                        endTime = last_valid_ms,
-                        limit = limit,
-                    )
-                else:
-                    print('Wrong parameters', inspect.currentframe().f_code.co_name)
-                    break
-                if not temp_data:
-                    logger.warning('Empty data returned from: %s %s'%(symbol,interval))
-                    break
-                firstdata = datetime.utcfromtimestamp(temp_data[0][0]/1000)
-                lastdata = datetime.utcfromtimestamp(temp_data[-1][0]/1000)
-                logger.warning('DATA FETCHED # symbol: %s chuncksize: %d start time: %s end time: %s '%\
-                    (symbol, len(temp_data), firstdata, lastdata))
-                dataframe = historicalKlinesParser(temp_data)
-                my_db = self.mongo_client[db_name]
-                ptm = pdmongo.to_mongo(
-                    frame     = dataframe,
-                    name      = collection_name,
-                    db        = my_db,
-                    if_exists = 'append',
-                )
-                logger.warning('# A new collection: %s has been append to database: %s'% \
-                    (collection_name,db_name))
-                start_ms = temp_data[-1][0] + timeframe
-                if (temp_data[-1][0]) >= last_valid_ms:
-                    logger.warning('Last valid open_time kline has been reached')
-                    print('\n')
-                    break
-                sleep(2)
+            self.mongo.createKlinesCollection(db_name, collection_name, interval, timeseries=timeseries)
+            start_ms:int = self.binance.getEarliestValidTimestamp(symbol, interval, stream_type)
+            return self._captureKlines(symbol, interval, stream_type, db_name, start_ms, last_valid_ms, limit, logger, page_concurrency)
+        
+        results = self._forEachSymbol(createSymbol, symbols, concurrency, logger)
+        self._logStageTimings(results, logger)
         logger.warning('New Database created successfully')
         print('\n')
 
-    def updateDatabaseKlines(self,symbols:list,interval:str,quoted_asset:str,stream_type:str,market_type:str,):
+    def updateDatabaseKlines(self,symbols:list,interval:str,quoted_asset:str,stream_type:str,market_type:str,concurrency:int=1,page_concurrency:int=1):
         logger = logger_func(logger_name=__name__, filename='file.log')
         testConn = self.mongo.pingServer()
         if testConn == 400:
             return 'MongoServer is not available\n'
-        ms_now            = int(time()*1000)
         db_name           = f"binance_{market_type}_{quoted_asset}"
+        limit             = optimal_page_size(stream_type)
         timeframe:int     = interval_to_milliseconds(interval)
         last_valid_ms:int = latest_valid_timestamp(timeframe)
-        for symbol in symbols:
+        
+        collections = [f"{stream_type}_{symbol.upper()}_{interval.lower()}" for symbol in symbols]
+        newest_entries = self.mongo.extractNewestDates(db_name, collections)
+        
+        def updateSymbol(symbol):
             collection_name = f"{stream_type}_{symbol.upper()}_{interval.lower()}"
             try:
-                newest_entry = self.mongo.extractNewestDate(db_name, collection_name)
+                newest_entry = newest_entries[collection_name]
                 newest_ms = int(newest_entry.timestamp()*1000)
                 logger.warning('The Newest entry stored is: %s'%newest_entry)
             except:
                 logger.warning('Database or collection seems does not exists')
                 print('\n')
                 # In a continuous execution environment you don't want to Return the function.
-                # return
-                continue
+                return
             difference = last_valid_ms - newest_ms
             if difference < timeframe:
                 logger.warning('Newest valid data stored yet for collection: %s'%collection_name)
                 print('\n')
-                continue
+                return
             start_ms = (newest_ms + timeframe)
-            while True:
-                if stream_type=='klines':
-                    temp_data = self.binance.klineCandlestick(
-                        symbol = symbol,
-                        interval = interval,
-                        startTime = start_ms,
-                        endTime = last_valid_ms,
-                    )
-                elif stream_type=='continuous_klines':
-                    temp_data = self.binance.futuresContinuousKlines(
-                        pair = symbol,
-                        interval = interval,
-                        startTime = start_ms,
-                        endTime = last_valid_ms,
-                    )
-                else:
-                    print('Wrong parameters', inspect.currentframe().f_code.co_name)
-                    break
-                if not temp_data:
+            return self._captureKlines(symbol, interval, stream_type, db_name, start_ms, last_valid_ms, limit, logger, page_concurrency)
+        
+        results = self._forEachSymbol(updateSymbol, symbols, concurrency, logger)
+        self._logStageTimings(results, logger)
+        logger.warning('##### ##### ##### Databases UPDATED successfully ##### ##### #####')
+        print('\n')
+
+    def _forEachSymbol(self, function, symbols:list, concurrency:int, logger):
+        ''' 
+            Run function(symbol) for every symbol.
+            With concurrency > 1 symbols run in a thread pool; all threads share
+            the BinanceConnection weight budget, pages of a single symbol are still
+            fetched and written in order by the same thread.
+            In both modes a failing symbol is logged and skipped, the others go on.
+            Returns the results of the symbols that succeeded.
+            '''
+        results = []
+        if concurrency <= 1:
+            for symbol in symbols:
+                try:
+                    results.append(function(symbol))
+                except Exception as e:
+                    logger.error('Capture failed for symbol: %s -> %s'%(symbol, e))
+            return results
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures = {executor.submit(function, symbol):symbol for symbol in symbols}
+            for future in as_completed(futures):
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    logger.error('Capture failed for symbol: %s -> %s'%(futures[future], e))
+        return results
+
+    def _captureKlines(self,symbol:str,interval:str,stream_type:str,db_name:str,start_ms:int,last_valid_ms:int,limit:int,logger,page_concurrency:int=1):
+        ''' 
+            Fetch klines from start_ms up to last_valid_ms and append them, in order,
+            to collection {stream_type}_{SYMBOL}_{interval}.
+            Page windows are planned up front, page_concurrency of them are requested
+            at once. Fetch, parse and write run as a pipeline, returns its stage timings.
+            '''
+        collection_name = f"{stream_type}_{symbol.upper()}_{interval.lower()}"
+        timeframe:int   = interval_to_milliseconds(interval)
+        windows:list    = plan_kline_windows(start_ms, last_valid_ms, timeframe, limit)
+        
+        def fetchWindow(window):
+            if stream_type=='klines':
+                temp_data = self.binance.klineCandlestick(
+                    symbol = symbol,
+                    interval = interval,
+                    startTime = window[0],
+                    endTime = window[1],
+                    limit = limit,
+                    as_array = True,
+                )
+            elif stream_type=='continuous_klines':
+                temp_data = self.binance.futuresContinuousKlines(
+                    pair = symbol,
+                    interval = interval,
+                    startTime = window[0],
+                    endTime = window[1],
+                    limit = limit,
+                    as_array = True,
+                )
+            if not isinstance(temp_data, np.ndarray):
+                raise ConnectionError('Unsuccessful request %s %s window: %s -> %s'%(symbol,interval,window,temp_data))
+            return temp_data
+        
+        def fetchPages():
+            if stream_type not in KLINES_ENDPOINTS:
+                print('Wrong parameters', inspect.currentframe().f_code.co_name)
+                return
+            for temp_data in ordered_map(fetchWindow, windows, page_concurrency):
+                if not len(temp_data):
+                    # Exchange downtime leaves gaps, keep going with the next window.
                     logger.warning('Empty data returned from: %s %s'%(symbol,interval))
-                    print('\n')
-                    break
+                    continue
                 firstdata = datetime.utcfromtimestamp(temp_data[0][0]/1000)
                 lastdata = datetime.utcfromtimestamp(temp_data[-1][0]/1000)
                 logger.warning('DATA FETCHED # symbol: %s chuncksize: %d start time: %s end time: %s '%\
                     (symbol, len(temp_data), firstdata, lastdata))
-                dataframe = historicalKlinesParser(temp_data)
-                my_db = self.mongo_client[db_name]
-                ptm = pdmongo.to_mongo(
-                    frame     = dataframe,
-                    name      = collection_name,
-                    db        = my_db,
-                    if_exists = 'append')
-                logger.warning('# UPDATED database %s  in collection -> %s '%\
-                    (db_name, collection_name))
-                start_ms = temp_data[-1][0] + timeframe
-                if (temp_data[-1][0]) >= last_valid_ms:
-                    logger.warning('Last valid open_time kline has been reached')
-                    print('\n')
-                    break
-                sleep(2) # Be gentle with the server, avoid ban.
-        logger.warning('##### ##### ##### Databases UPDATED successfully ##### ##### #####')
-        print('\n')
+                yield temp_data
+            logger.warning('Last valid open_time kline has been reached')
+            print('\n')
+        
+        meta = {'symbol':symbol.upper(), 'interval':interval.lower()}
+        
+        def writePage(documents):
+            self.mongo.insert_klines_bulk(db_name, collection_name, documents, meta=meta)
+            logger.warning('# UPDATED database %s  in collection -> %s '%\
+                (db_name, collection_name))
+        
+        pipeline = KlinesPipeline(fetch=fetchPages, parse=kline_documents, write=writePage)
+        return pipeline.run()
+
+    def _logStageTimings(self, results:list, logger):
+        ''' 
+            Sum per symbol pipeline timings, keep them in self.stage_timings.
+            '''
+        self.stage_timings = new_stage_stats()
+        for stats in results:
+            if stats:
+                merge_stage_stats(self.stage_timings, stats)
+        for stage, counters in self.stage_timings.items():
+            logger.warning('STAGE %s # pages: %d busy: %.2fs waiting: %.2fs'%\
+                (stage, counters['items'], counters['busy'], counters['wait']))
+        return self.stage_timings
 
     def verifyDatasetDatesIntegrity(self):
         ''' 
@@ -177,6 +214,10 @@ class PolarisBot:
             '''
         pass
 
+    def _klineFields(self, index_col:str, fields:list=None)->list:
+        fields = fields or ['open','high','low','close','volume']
+        return [index_col] + [field for field in fields if field != index_col]
+
     def createDataframe(
                         self,
                         mydb:str,
@@ -184,108 +225,78 @@ class PolarisBot:
                         date_range:dict={},
                         limit_output:int=1e7,
                         index_col:str='open_time',
+                        fields:list=None,
                         ):
         ''' 
-            date_range: {gt:datetime(2020,1,1,0,0)} 
-            
+            date_range: {start:datetime(2020,1,1), end:datetime(2021,1,1)} read as [start, end),
+                        date strings allowed, {gt:datetime(2020,1,1,0,0)} still works.
+            fields:     kline columns besides index_col, OHLCV by default, KLINE_COLUMNS for all.
+            Rows come sorted by index_col, filter and sort are served by the open_time index.
             '''
-        project_fields={
-            '$project':
-                {
-                    '_id' :0,
-                    'open_time' :1,
-                    'open' :1,
-                    'high' :1,
-                    'low' :1,
-                    'close' :1,
-                    'volume' :1,
-                }
-        }
-        if date_range:
-            match_date_range = {
-                '$match':{
-                    index_col:{
-                        '$gt':date_range['gt'],
-                        # '$lte':date_range['lte']
-                    }
-                }
-            }
-        else: 
-            match_date_range = {'$match':{}}
-        df = pdmongo.read_mongo(
-            db          = self.mongo_client[mydb],
+        fields = self._klineFields(index_col, fields)
+        columns = self.mongo.readKlineColumns(
+            db_name     = mydb,
             collection  = collection,
-            query       = [
-                project_fields,
-                match_date_range,
-                {'$limit':limit_output},
-            ], 
-            index_col   = [index_col],
+            fields      = fields,
+            query       = date_range_query(date_range, index_col),
+            sort        = [(index_col, 1)],
+            limit       = int(limit_output),
         )
+        df = DataFrame(columns, columns=fields)
+        df.set_index(index_col, inplace=True)
         return df
 
-    def addIndicators(self,df:DataFrame,indicators:dict):
+    def iterKlines(
+                        self,
+                        mydb:str,
+                        collection:str,
+                        start:datetime=None,
+                        end:datetime=None,
+                        chunk_rows:int=100000,
+                        index_col:str='open_time',
+                        fields:list=None,
+                        ):
+        ''' 
+            Generator over [start, end) in open_time order, yields DataFrames
+            of chunk_rows rows shaped like createDataframe, so long histories
+            can be resampled / exported in bounded memory.
+            '''
+        fields = self._klineFields(index_col, fields)
+        chunks = self.mongo.iterKlineColumns(
+            db_name     = mydb,
+            collection  = collection,
+            fields      = fields,
+            query       = date_range_query(dict(start=start, end=end), index_col),
+            sort        = [(index_col, 1)],
+            chunk_rows  = chunk_rows,
+        )
+        for columns in chunks:
+            df = DataFrame(columns, columns=fields)
+            df.set_index(index_col, inplace=True)
+            yield df
+
+    def addIndicators(self,df:DataFrame,indicators:dict,dataset:str=None):
+        ''' 
+            indicators: {'talib_EMA':[10,20], 'talib_RSI':{'timeperiod':14}, ...}, see indicators.INDICATORS.
+            dataset:    persisted dataframe filename, caches the computed columns in
+                        datasets/{dataset}.indicators so repeated runs reuse them.
+            '''
         if not indicators:
             print('No indicators added !')
             return df
-        for indicator in indicators.keys():
-            if indicator=='simple_returns':
-                lookback = indicators[indicator].get('lookback', 1)
-                df['simple_returns'] = df.close.pct_change(lookback)
-            elif indicator=='log_returns':
-                lookback = indicators[indicator].get('lookback', 1)
-                colname = f"log_returns_{lookback}"
-                df[colname] = np.log(1 + df.close.pct_change(lookback))
-            elif indicator=='talib_EMA':
-                for period in indicators[indicator]:
-                    colname = f'talib_EMA_{period}'
-                    df[colname] = talib.EMA(df.close, timeperiod=period)
-            elif indicator=='talib_ATR':
-                timeperiod = indicators[indicator].get('timeperiod', 14)
-                df['talib_ATR'] = talib.ATR(df.high.copy(), df.low.copy(), df.close.copy(), timeperiod=timeperiod)
-            elif indicator=='talib_SAR':
-                acceleration = indicators[indicator].get('acceleration', 0.02)
-                maximum = indicators[indicator].get('maximum', 0.2)
-                df['talib_SAR'] = talib.SAR(df.high.copy(), df.low.copy(), acceleration=acceleration, maximum=maximum)
-            elif indicator=='talib_BBANDS':
-                timeperiod = indicators[indicator].get('timeperiod', 5)
-                nbdevup = indicators[indicator].get('nbdevup', 2)
-                nbdevdn = indicators[indicator].get('nbdevdn', 2)
-                matype = indicators[indicator].get('matype', 0)
-                df['BB_up'],df['BB_mid'],df['BB_low'] = talib.BBANDS(
-                    df.close.copy(), timeperiod=timeperiod, nbdevup=nbdevup, nbdevdn=nbdevdn, matype=matype
-                )
-            elif indicator=='talib_STOCHRSI':
-                timeperiod = indicators[indicator].get('timeperiod', 14)
-                fastk_period = indicators[indicator].get('fastk_period', 5)
-                fastd_period = indicators[indicator].get('fastd_period', 3)
-                fastd_matype = indicators[indicator].get('fastd_matype', 0)
-                df['talib_STOCHRSI_k'], df['talib_STOCHRSI_d'] = talib.STOCHRSI(
-                    df.close, timeperiod=timeperiod, 
-                    fastk_period=fastk_period, fastd_period=fastd_period, fastd_matype=fastd_matype,
-                )                
-            elif indicator=='talib_MACD':
-                fastperiod = indicators[indicator].get('fastperiod', 12)
-                slowperiod = indicators[indicator].get('slowperiod', 26)
-                signalperiod = indicators[indicator].get('signalperiod', 9)
-                df['talib_MACD'], df['talib_MACD_signal'], df['talib_MACD_hist'] = talib.MACD(
-                    df.close, fastperiod=fastperiod, slowperiod=slowperiod, signalperiod=signalperiod
-                ) 
-            elif indicator=='talib_ADX':
-                timeperiod = indicators[indicator].get('timeperiod', 14)
-                df['talib_ADX'] = talib.ADX(df.high, df.low, df.close, timeperiod=timeperiod)
-            elif indicator=='talib_RSI':
-                timeperiod = indicators[indicator].get('timeperiod', 14)
-                df['talib_RSI'] = talib.RSI(df.close, timeperiod=timeperiod)
-            elif indicator=='talib_AROON':
-                timeperiod = indicators[indicator].get('timeperiod', 14)
-                df['talib_AROON_down'], df['talib_AROON_up'] = talib.AROON(
-                    df.high, df.low, timeperiod=timeperiod
-                )
-            elif indicator=='talib_OBV':
-                df['talib_OBV'] = talib.OBV(df.close, df.volume)
-            elif indicator=='talib_doji':
-                df['talib_doji'] = talib.CDLDOJI(df.open, df.high, df.low, df.close)
+        cache_dir = self.indicatorsCacheDir(dataset) if dataset else None
+        return IndicatorEngine(cache_dir).apply(df, indicators)
+
+    def addIndicatorFamily(self,df:DataFrame,name:str,periods:list,dataset:str=None,**params):
+        '''
+            Every timeperiod of one indicator at once, e.g the grid of an optimization:
+            addIndicatorFamily(df, 'talib_AROON', range(10,51,5)) adds talib_AROON_down_10, talib_AROON_up_10, ...
+            dataset: same cache as addIndicators.
+            '''
+        cache_dir = self.indicatorsCacheDir(dataset) if dataset else None
+        family = IndicatorEngine(cache_dir).familyFrame(df, name, list(periods), **params)
+        for column in family.columns:
+            df[column] = family[column].values
         return df
 
     def _find_directory(target_dir):
@@ -305,24 +316,93 @@ class PolarisBot:
         return decorator_a
     
     @_find_directory(target_dir='datasets')
-    def dataframeToBinary(self,dataframe:DataFrame,filename:str): 
+    def dataframeToBinary(self,dataframe:DataFrame,filename:str,fmt:str='pickle'): 
+        ''' 
+            fmt: pickle (datasets/{filename}.pckl), parquet or memmap, see datasetstore.
+            '''
         try: 
-            filepath = f"datasets/{filename}.pckl"
-            with open(filepath, 'wb') as bin_df:
-                pickle.dump(dataframe, bin_df)
+            open_store(fmt).write(dataframe, filename)
             print(f'{filename} persisted as binary ok')
         except Exception as e:
             print(f"{e}\nfrom:{inspect.currentframe().f_code.co_name}")
 
     @_find_directory(target_dir='datasets')
-    def dataframeFromBinary(self,filename:str):
-        try:
-            filepath = f"datasets/{filename}.pckl"
-            with open(filepath, 'rb') as df_bin:
-                dataframe = pickle.load(df_bin)
-                return dataframe
-        except:
+    def dataframeFromBinary(self,filename:str,fmt:str='pickle',date_range:dict={},columns:list=None):
+        ''' 
+            date_range: {start:.., end:..} read as [start, end).
+                        Columnar formats only read the files holding the window.
+            fmt='memmap' returns a read-only frame over the mapped files, no copy.
+            '''
+        dataframe = open_store(fmt).read(
+            filename,
+            start   = date_range.get('start'),
+            end     = date_range.get('end'),
+            columns = columns,
+        )
+        if dataframe is None:
             print("Requested file does not exists yet")
+        return dataframe
+
+    @_find_directory(target_dir='datasets')
+    def dataframeUpdateBinary(self,dataframe:DataFrame,filename:str,fmt:str='pickle'):
+        ''' 
+            Append-only, only the new rows are written (a new segment,
+            or new bytes at the end of the memmap columns).
+            '''
+        try:
+            open_store(fmt).update(dataframe, filename)
+            print(f'{filename} updated ok')
+        except Exception as e:
+            print(f"{e}\nfrom:{inspect.currentframe().f_code.co_name}")
+
+    @_find_directory(target_dir='datasets')
+    def datasetCompact(self,filename:str,fmt:str='pickle')->int:
+        ''' 
+            Merge the segments appended by dataframeUpdateBinary.
+            '''
+        return open_store(fmt).compact(filename)
+
+    @_find_directory(target_dir='datasets')
+    def datasetLastIndex(self,filename:str,fmt:str='pickle'):
+        ''' 
+            Newest open_time of a persisted dataframe without loading the
+            whole history, None if it does not exist.
+            '''
+        return open_store(fmt).lastIndex(filename)
+
+    @_find_directory(target_dir='datasets')
+    def indicatorsCacheDir(self,filename:str)->str:
+        return path.abspath(f"datasets/{filename}.indicators")
+
+    @_find_directory(target_dir='datasets')
+    def indicatorsPanel(self,filenames:list,indicators:dict,fmt:str='pickle',workers:int=1,date_range:dict={},include:tuple=('close',))->DataFrame:
+        ''' 
+            addIndicators over many datasets at once, one worker process per dataset at a time.
+            Returns a DataFrame aligned on open_time with columns (dataset, column), see panel.
+            '''
+        return compute_panel(
+            filenames, indicators, fmt=fmt, root='datasets', workers=workers,
+            start   = date_range.get('start'),
+            end     = date_range.get('end'),
+            include = include,
+        )
+
+    @_find_directory(target_dir='datasets')
+    def resampleBinary(self,filename:str,periods:list,fmt:str='pickle',incremental:bool=True)->dict:
+        ''' 
+            Resample a persisted 1m dataframe to every period (minutes) in a single pass.
+            incremental: only the new 1m rows since the last run are read, see resampler.
+            '''
+        return resample_dataset(open_store(fmt), filename, periods, incremental=incremental)
+
+    @_find_directory(target_dir='datasets')
+    def updateIndicatorsBinary(self,filename:str,indicators:dict,fmt:str='pickle',incremental:bool=True)->int:
+        ''' 
+            Persist indicator columns of a dataset as {filename}__indicators, updated
+            from their saved states with the new bars only, see streaming.
+            EMA, RSI, MACD, ATR, OBV and BBANDS are supported.
+            '''
+        return update_indicator_dataset(open_store(fmt), filename, indicators, incremental=incremental)
 
     def checkWallet(self, market_type):
         return self.binance.dailyAccountSnapshot(type=market_type)
@@ -0,0 +1,113 @@
+import re
+from threading import Lock
+from time import monotonic, sleep
+
+'''
+    Request weight budget for Binance REST endpoints.
+
+    Binance counts the weight of every request per IP in a fixed window
+    (1 minute) and reports it back in X-MBX-USED-WEIGHT-* headers.
+    Going over the limit answers 429, insisting answers 418 (IP ban).
+    '''
+
+INTERVAL_SECONDS = {'s':1, 'm':60, 'h':3600, 'd':86400}
+USED_WEIGHT_HEADER = re.compile(r'^x-mbx-used-weight(?:-(\d+)([smhd]))?$', re.IGNORECASE)
+
+
+def continuous_klines_weight(limit:int=500)->int:
+    '''
+        GET /fapi/v1/continuousKlines weight based on LIMIT.
+        [1,100) 1 / [100, 500) 2 / [500, 1000] 5 / > 1000 10
+        '''
+    if limit < 100:
+        return 1
+    elif limit < 500:
+        return 2
+    elif limit <= 1000:
+        return 5
+    return 10
+
+def order_book_weight(limit:int=500)->int:
+    '''
+        GET /fapi/v1/depth weight based on LIMIT.
+        5, 10, 20, 50 -> 2 / 100 -> 5 / 500 -> 10 / 1000 -> 20
+        '''
+    if limit <= 50:
+        return 2
+    elif limit <= 100:
+        return 5
+    elif limit <= 500:
+        return 10
+    return 20
+
+
+class WeightRateLimiter:
+    '''
+        Thread safe token bucket holding the weight budget of one base url.
+
+        limit:    weight allowed by the exchange per interval.
+        interval: seconds of the exchange window.
+        safety:   fraction of the limit this process is allowed to spend.
+
+        acquire() only sleeps when the budget is exhausted.
+        update() trusts the used weight reported by the server over
+        the local estimate, and honours Retry-After on 418/429.
+        '''
+    def __init__(self, limit:int=1200, interval:float=60.0, safety:float=0.9):
+        self.limit = limit
+        self.interval = interval
+        self.capacity = limit * safety
+        self.refill_rate = self.capacity / interval
+        self.tokens = self.capacity
+        self.blocked_until = 0.0
+        self.updated = monotonic()
+        self.lock = Lock()
+
+    def _refill(self, now:float):
+        elapsed = now - self.updated
+        self.tokens = min(self.capacity, self.tokens + elapsed*self.refill_rate)
+        self.updated = now
+
+    def acquire(self, weight:int=1):
+        weight = min(weight, self.capacity)
+        while True:
+            with self.lock:
+                now = monotonic()
+                self._refill(now)
+                if now >= self.blocked_until and self.tokens >= weight:
+                    self.tokens -= weight
+                    return
+                wait = max(
+                    self.blocked_until - now,
+                    (weight - self.tokens) / self.refill_rate,
+                )
+            sleep(wait)
+
+    def usedWeight(self, headers)->int:
+        '''
+            Used weight for the window matching this limiter, None if absent.
+            '''
+        used = None
+        for key, value in headers.items():
+            match = USED_WEIGHT_HEADER.match(key)
+            if not match:
+                continue
+            num, unit = match.groups()
+            if num is None:
+                used = int(value) if used is None else used
+            elif int(num)*INTERVAL_SECONDS[unit.lower()] == self.interval:
+                used = int(value)
+        return used
+
+    def update(self, headers, status_code:int=200):
+        used = self.usedWeight(headers)
+        with self.lock:
+            now = monotonic()
+            self._refill(now)
+            if used is not None:
+                self.tokens = self.capacity - used
+            if status_code in (418, 429):
+                retry_after = headers.get('Retry-After')
+                delay = float(retry_after) if retry_after else self.interval
+                self.blocked_until = max(self.blocked_until, now + delay)
+                self.tokens = 0
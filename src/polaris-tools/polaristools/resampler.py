@@ -0,0 +1,201 @@
+import numpy as np
+from pandas import DataFrame, DatetimeIndex, Timedelta, Timestamp
+
+from polaristools.datasetstore import load_metadata, save_metadata
+
+'''
+    Single pass multi-timeframe kline resampler.
+
+    Same output as, for every period,
+        df.resample(f'{period}T', label='right', closed='right').agg(how)
+    but every timeframe is reduced from the finest one already computed
+    that divides it (3m from 1m, 15m from 5m, 240m from 120m ...),
+    with NumPy reduceat on the bucket boundaries instead of rescanning
+    the whole 1m history once per timeframe.
+
+    A bucket labeled L holds the bars with L - period < open_time <= L.
+    Periods must divide a day (1440 minutes), so buckets anchored to the
+    epoch match pandas' default start_day origin.
+    Input rows are expected sorted by open_time and without NaN.
+    All kline columns are carried, see KLINE_AGGREGATIONS.
+    '''
+
+MINUTE_NS = 60 * 10**9
+
+OHLCV_AGGREGATIONS = {'open':'first','high':'max','low':'min','close':'last','volume':'sum'}
+# Every stored kline column (utils.KLINE_COLUMNS but open_time).
+KLINE_AGGREGATIONS = dict(
+    OHLCV_AGGREGATIONS,
+    close_time                   = 'last',
+    quote_asset_volume           = 'sum',
+    number_of_trades             = 'sum',
+    taker_buy_base_asset_volume  = 'sum',
+    taker_buy_quote_asset_volume = 'sum',
+)
+
+def aggregations_for(columns)->dict:
+    '''
+        Aggregation of every known kline column present, in KLINE_AGGREGATIONS order.
+        '''
+    return {column: how for column, how in KLINE_AGGREGATIONS.items() if column in columns}
+
+
+def _reduce(values, starts, ends, how:str):
+    if how == 'first':
+        return values[starts]
+    if how == 'last':
+        return values[ends - 1]
+    if how == 'max':
+        return np.maximum.reduceat(values, starts)
+    if how == 'min':
+        return np.minimum.reduceat(values, starts)
+    if how == 'sum':
+        return np.add.reduceat(values, starts)
+    raise ValueError(f'Unsupported aggregation {how}')
+
+def reduce_buckets(labels, columns:dict, how:dict, period_ns:int):
+    '''
+        Merge consecutive non empty buckets (or bars) into buckets of period_ns.
+        labels: sorted int64 ns, bucket label (right edge) or bar open time.
+        Returns the new labels and columns, still without empty buckets.
+        '''
+    keys = -(-labels // period_ns) * period_ns
+    starts = np.concatenate(([0], np.flatnonzero(keys[1:] != keys[:-1]) + 1)) if len(keys) else np.empty(0, dtype='int64')
+    ends = np.append(starts[1:], len(keys))
+    reduced = {
+        column: _reduce(values, starts, ends, how[column]) if len(starts) else values[:0]
+        for column, values in columns.items()
+    }
+    return keys[starts], reduced
+
+def to_frame(labels, columns:dict, how:dict, period_ns:int, index_name:str='open_time', first_label:int=None):
+    '''
+        Reindex on the full label range, empty buckets as pandas leaves them:
+        NaN (NaT for dates) for first/last/max/min, 0 for sum.
+        first_label (int64 ns) extends the range back with empty buckets.
+        '''
+    if not len(labels):
+        return DataFrame({column: values for column, values in columns.items()},
+                         index=DatetimeIndex([], name=index_name))
+    first = labels[0] if first_label is None else min(labels[0], first_label)
+    full = np.arange(first, labels[-1] + period_ns, period_ns)
+    positions = (labels - first) // period_ns
+    data = {}
+    for column, values in columns.items():
+        if len(full) == len(labels):
+            data[column] = values
+            continue
+        if how[column] == 'sum':
+            filled = np.zeros(len(full), dtype=values.dtype)
+        elif values.dtype.kind == 'M':
+            filled = np.full(len(full), np.datetime64('NaT'), dtype=values.dtype)
+        else:
+            filled = np.full(len(full), np.nan, dtype=np.result_type(values.dtype, np.float64))
+        filled[positions] = values
+        data[column] = filled
+    index = DatetimeIndex(full.view('datetime64[ns]'), name=index_name)
+    return DataFrame(data, index=index)
+
+def plan_sources(periods:list, base:int=1)->dict:
+    '''
+        {period: source period}, the biggest smaller period dividing it.
+        e.g [3,5,10,15,30,60,120,240] -> 3:1, 5:1, 10:5, 15:5, 30:15, 60:30, 120:60, 240:120
+        '''
+    computed = [base]
+    sources = {}
+    for period in sorted(periods):
+        if period % base or 1440 % period:
+            raise ValueError(f'{period} minutes must be a multiple of {base} and divide a day')
+        sources[period] = max(p for p in computed if period % p == 0)
+        computed.append(period)
+    return sources
+
+def resample_many(df, periods:list, how:dict=None, base:int=1, first_labels:dict=None)->dict:
+    '''
+        {period: resampled DataFrame} of a base (1m by default) DataFrame
+        indexed by open_time, for every period in minutes.
+        how: {column: first / last / max / min / sum}, by default every kline
+             column present in df (OHLCV, quote volume, trades, taker volumes, close_time).
+        first_labels: {period: Timestamp}, first bucket label to emit even if empty.
+        '''
+    first_labels = first_labels or {}
+    how = how or aggregations_for(df.columns)
+    levels = {
+        base: (
+            df.index.values.astype('datetime64[ns]').view('int64'),
+            {column: np.ascontiguousarray(df[column].values) for column in how},
+        )
+    }
+    frames = {}
+    for period, source in plan_sources(periods, base).items():
+        labels, columns = levels[source]
+        levels[period] = reduce_buckets(labels, columns, how, period*MINUTE_NS)
+        first_label = first_labels.get(period)
+        frames[period] = to_frame(
+            *levels[period], how, period*MINUTE_NS, df.index.name,
+            None if first_label is None else Timestamp(first_label).value,
+        )
+    return {period: frames[period] for period in periods}
+
+
+def resampled_name(name:str, period:int)->str:
+    '''
+        df_continuous_klines_BTCBUSD_1m -> df_continuous_klines_BTCBUSD_240m
+        '''
+    return name[:name.rindex('_')+1] + f'{period}m'
+
+def last_complete_label(last_bar, period:int):
+    '''
+        Label of the newest bucket holding all its bars, given the newest base bar
+        (L - period < open_time <= L, so the bucket closes with the bar opened at L).
+        '''
+    period_ns = period*MINUTE_NS
+    return Timestamp(Timestamp(last_bar).value // period_ns * period_ns)
+
+def resample_dataset(store, name:str, periods:list, how:dict=None, incremental:bool=True)->dict:
+    '''
+        Resample a stored base dataset into {period: resampled_name(name, period)}.
+
+        Every resampled dataset keeps its last complete bucket label in its
+        metadata. incremental=True only reads the base rows after the oldest of
+        those labels, rewrites the trailing partial bucket and appends the new
+        ones, O(new bars). Without metadata for every period it starts over.
+        Each run adds one segment per period, the store compacts a target once
+        it holds more than store.max_segments of them (pickle and parquet).
+        PickleStore reads unpickle the whole base history whatever the window,
+        there only the resampling and the writes are incremental.
+        Returns {period: rows written}.
+        '''
+    targets = {period: resampled_name(name, period) for period in periods}
+    complete = {}
+    if incremental:
+        for period, target in targets.items():
+            metadata = load_metadata(store.root, target)
+            if metadata.get('source') == name and metadata.get('last_complete') and store.exists(target):
+                complete[period] = Timestamp(metadata['last_complete'])
+    full = len(complete) < len(periods)
+    if full:
+        df = store.read(name)
+        first_labels = None
+    else:
+        # Rows after the oldest complete bucket, open_time > label.
+        df = store.read(name, start=min(complete.values()) + Timedelta(1, 'ns'))
+        first_labels = {period: label + Timedelta(minutes=period) for period, label in complete.items()}
+    if df is None or df.empty:
+        return dict.fromkeys(periods, 0)
+    frames = resample_many(df, periods, how, first_labels=first_labels)
+    written = {}
+    for period, frame in frames.items():
+        if full:
+            store.write(frame, targets[period])
+        else:
+            # Buckets up to the stored complete one may be cut short by the read window.
+            frame = frame[frame.index > complete[period]]
+            store.update(frame, targets[period])
+        save_metadata(store.root, targets[period], dict(
+            source        = name,
+            period        = period,
+            last_complete = last_complete_label(df.index[-1], period).isoformat(),
+        ))
+        written[period] = len(frame)
+    return written
@@ -0,0 +1,299 @@
+from itertools import accumulate
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from pandas import DataFrame, Timedelta, Timestamp
+
+from polaristools.datasetstore import load_metadata, save_metadata
+from polaristools.indicators import expand_request, output_columns
+
+'''
+    Incremental indicators for appended bars.
+
+    Every class keeps the recursive state of one TA-Lib indicator
+    (EMA values, Wilder averages, running windows, warm-up buffers) as a
+    json friendly dict, so a day of new bars is processed in O(new bars)
+    instead of recomputing the whole history. Outputs match TA-Lib,
+    including its seeding (SMA seed, MACD fast EMA aligned on the slow one)
+    and its NaN warm-up.
+    '''
+
+def _ema_tail(values, k:float, prev:float):
+    '''
+        prev, then prev + k*(x - prev) for every x, run in C by accumulate.
+        '''
+    return np.fromiter(
+        accumulate(values, lambda ema, x: ema + k*(x - ema), initial=prev),
+        dtype=np.float64, count=len(values)+1,
+    )[1:]
+
+
+class StreamingEMA:
+    inputs = ('close',)
+
+    def __init__(self, timeperiod:int=30, state:dict=None):
+        self.timeperiod = timeperiod
+        self.k = 2.0 / (timeperiod + 1)
+        self.state = state or dict(seed=[], ema=None)
+
+    def update(self, close):
+        out = np.full(len(close), np.nan)
+        start = 0
+        if self.state['ema'] is None:
+            need = self.timeperiod - len(self.state['seed'])
+            self.state['seed'] += close[:need].tolist()
+            if len(self.state['seed']) < self.timeperiod:
+                return (out,)
+            start = need
+            self.state['ema'] = sum(self.state['seed']) / self.timeperiod
+            self.state['seed'] = []
+            out[start-1] = self.state['ema']
+        if start < len(close):
+            out[start:] = _ema_tail(close[start:], self.k, self.state['ema'])
+            self.state['ema'] = float(out[-1])
+        return (out,)
+
+
+class StreamingRSI:
+    inputs = ('close',)
+
+    def __init__(self, timeperiod:int=14, state:dict=None):
+        self.timeperiod = timeperiod
+        self.state = state or dict(prev=None, n=0, gain=0.0, loss=0.0)
+
+    def update(self, close):
+        p = self.timeperiod
+        state = self.state
+        out = np.full(len(close), np.nan)
+        for idx, value in enumerate(close.tolist()):
+            if state['prev'] is None:
+                state['prev'] = value
+                continue
+            diff = value - state['prev']
+            state['prev'] = value
+            gain, loss = (diff, 0.0) if diff > 0 else (0.0, -diff)
+            if state['n'] < p:
+                # Warm-up, plain sums averaged once p diffs are in.
+                state['gain'] += gain
+                state['loss'] += loss
+                state['n'] += 1
+                if state['n'] < p:
+                    continue
+                state['gain'] /= p
+                state['loss'] /= p
+            else:
+                # Wilder smoothing.
+                state['gain'] = (state['gain']*(p-1) + gain) / p
+                state['loss'] = (state['loss']*(p-1) + loss) / p
+            total = state['gain'] + state['loss']
+            out[idx] = 100.0*state['gain']/total if abs(total) >= 1e-8 else 0.0
+        return (out,)
+
+
+class StreamingMACD:
+    inputs = ('close',)
+
+    def __init__(self, fastperiod:int=12, slowperiod:int=26, signalperiod:int=9, state:dict=None):
+        if slowperiod < fastperiod:
+            fastperiod, slowperiod = slowperiod, fastperiod
+        self.fastperiod = fastperiod
+        self.slowperiod = slowperiod
+        self.signalperiod = signalperiod
+        self.k_fast = 2.0 / (fastperiod + 1)
+        self.k_slow = 2.0 / (slowperiod + 1)
+        self.k_signal = 2.0 / (signalperiod + 1)
+        self.state = state or dict(seed=[], fast=None, slow=None, signal_seed=[], signal=None)
+
+    def update(self, close):
+        state = self.state
+        n = len(close)
+        macd = np.full(n, np.nan)
+        start = 0
+        if state['slow'] is None:
+            need = self.slowperiod - len(state['seed'])
+            state['seed'] += close[:need].tolist()
+            if len(state['seed']) < self.slowperiod:
+                return macd, macd.copy(), macd.copy()
+            start = need
+            # Both EMAs start on the same bar, the fast one seeded with its last fastperiod closes.
+            state['slow'] = sum(state['seed']) / self.slowperiod
+            state['fast'] = sum(state['seed'][-self.fastperiod:]) / self.fastperiod
+            state['seed'] = []
+            macd[start-1] = state['fast'] - state['slow']
+        if start < n:
+            fast = _ema_tail(close[start:], self.k_fast, state['fast'])
+            slow = _ema_tail(close[start:], self.k_slow, state['slow'])
+            macd[start:] = fast - slow
+            state['fast'], state['slow'] = float(fast[-1]), float(slow[-1])
+        signal = np.full(n, np.nan)
+        first = max(start - 1, 0)
+        if state['signal'] is None:
+            need = self.signalperiod - len(state['signal_seed'])
+            state['signal_seed'] += macd[first:first+need].tolist()
+            if len(state['signal_seed']) < self.signalperiod:
+                nan = np.full(n, np.nan)
+                return nan, nan.copy(), nan.copy()
+            first += need
+            state['signal'] = sum(state['signal_seed']) / self.signalperiod
+            state['signal_seed'] = []
+            signal[first-1] = state['signal']
+        if first < n:
+            signal[first:] = _ema_tail(macd[first:], self.k_signal, state['signal'])
+            state['signal'] = float(signal[-1])
+        # TA-Lib leaves the macd line empty until the signal line exists.
+        macd[np.isnan(signal)] = np.nan
+        return macd, signal, macd - signal
+
+
+class StreamingATR:
+    inputs = ('high','low','close')
+
+    def __init__(self, timeperiod:int=14, state:dict=None):
+        self.timeperiod = timeperiod
+        self.state = state or dict(prev_close=None, n=0, atr=0.0)
+
+    def update(self, high, low, close):
+        p = self.timeperiod
+        state = self.state
+        out = np.full(len(close), np.nan)
+        prev_close = np.concatenate(([np.nan if state['prev_close'] is None else state['prev_close']], close[:-1]))
+        true_range = np.maximum(high - low, np.maximum(np.abs(high - prev_close), np.abs(low - prev_close)))
+        start = 1 if state['prev_close'] is None else 0
+        if len(close):
+            state['prev_close'] = float(close[-1])
+        if state['n'] < p:
+            need = p - state['n']
+            warmup = true_range[start:start+need]
+            state['atr'] += float(warmup.sum())
+            state['n'] += len(warmup)
+            if state['n'] < p:
+                return (out,)
+            start += need
+            state['atr'] /= p
+            out[start-1] = state['atr']
+        if start < len(close):
+            out[start:] = _ema_tail(true_range[start:], 1.0/p, state['atr'])
+            state['atr'] = float(out[-1])
+        return (out,)
+
+
+class StreamingOBV:
+    inputs = ('close','volume')
+
+    def __init__(self, state:dict=None):
+        self.state = state or dict(prev_close=None, obv=None)
+
+    def update(self, close, volume):
+        state = self.state
+        if not len(close):
+            return (np.empty(0),)
+        if state['obv'] is None:
+            steps = np.sign(np.diff(close)) * volume[1:]
+            out = volume[0] + np.concatenate(([0.0], np.cumsum(steps)))
+        else:
+            steps = np.sign(np.diff(close, prepend=state['prev_close'])) * volume
+            out = state['obv'] + np.cumsum(steps)
+        state['prev_close'], state['obv'] = float(close[-1]), float(out[-1])
+        return (out,)
+
+
+class StreamingBBANDS:
+    inputs = ('close',)
+
+    def __init__(self, timeperiod:int=5, nbdevup:float=2, nbdevdn:float=2, matype:int=0, state:dict=None):
+        if matype != 0:
+            raise ValueError('Streaming BBANDS only supports the SMA middle band (matype=0)')
+        self.timeperiod = timeperiod
+        self.nbdevup = nbdevup
+        self.nbdevdn = nbdevdn
+        self.state = state or dict(window=[])
+
+    def update(self, close):
+        p = self.timeperiod
+        window = np.asarray(self.state['window'], dtype=np.float64)
+        values = np.concatenate((window, close))
+        self.state['window'] = values[-(p-1):].tolist() if p > 1 else []
+        upper, middle, lower = (np.full(len(close), np.nan) for _ in range(3))
+        if len(values) < p:
+            return upper, middle, lower
+        windows = sliding_window_view(values, p)
+        mean = windows.mean(axis=1)
+        std = windows.std(axis=1)
+        # Rows of the new bars holding a full window.
+        first = len(close) - len(mean)
+        middle[first:] = mean
+        upper[first:] = mean + self.nbdevup*std
+        lower[first:] = mean - self.nbdevdn*std
+        return upper, middle, lower
+
+
+STREAMING_INDICATORS = {
+    'talib_EMA': StreamingEMA,
+    'talib_RSI': StreamingRSI,
+    'talib_MACD': StreamingMACD,
+    'talib_ATR': StreamingATR,
+    'talib_OBV': StreamingOBV,
+    'talib_BBANDS': StreamingBBANDS,
+}
+
+
+def job_key(name:str, params:dict)->str:
+    return name + ''.join(f'_{param}={value}' for param, value in sorted(params.items()))
+
+def streaming_jobs(indicators:dict)->list:
+    jobs = expand_request(indicators)
+    for name, _ in jobs:
+        if name not in STREAMING_INDICATORS:
+            raise ValueError(f'{name} has no streaming version, expected one of {list(STREAMING_INDICATORS)}')
+    return jobs
+
+def indicators_name(name:str)->str:
+    return f'{name}__indicators'
+
+def update_indicator_dataset(store, name:str, indicators:dict, incremental:bool=True)->int:
+    '''
+        Persist the indicator columns of a stored dataset as the dataset
+        indicators_name(name), their states in its metadata.
+        incremental=True only reads the bars after the last processed one
+        and appends their outputs, the first run (or a different request)
+        computes the whole history. Returns the rows written.
+        On a resampled dataset (see resample_dataset) the trailing partial
+        bucket is left out, states only ever see complete candles and the
+        next run picks the bucket up once it closes.
+        '''
+    jobs = streaming_jobs(indicators)
+    keys = [job_key(name_, params) for name_, params in jobs]
+    target = indicators_name(name)
+    metadata = load_metadata(store.root, target)
+    resume = incremental and metadata.get('jobs') == keys and store.exists(target)
+    if resume:
+        last_index = Timestamp(metadata['last_index'])
+        df = store.read(name, start=last_index + Timedelta(1, 'ns'))
+        # Stores may round the bound down to their time unit, drop what was already processed.
+        df = df[df.index > last_index] if df is not None else df
+        states = metadata['states']
+    else:
+        df = store.read(name)
+        states = {}
+    last_complete = load_metadata(store.root, name).get('last_complete')
+    if df is not None and last_complete:
+        df = df[df.index <= Timestamp(last_complete)]
+    if df is None or df.empty:
+        return 0
+    columns = {}
+    for (indicator, params), key in zip(jobs, keys):
+        streaming = STREAMING_INDICATORS[indicator](**params, state=states.get(key))
+        inputs = [np.ascontiguousarray(df[column].values, dtype=np.float64) for column in streaming.inputs]
+        columns.update(zip(output_columns(indicator, params), streaming.update(*inputs)))
+        states[key] = streaming.state
+    frame = DataFrame(columns, index=df.index)
+    if resume:
+        store.update(frame, target)
+    else:
+        store.write(frame, target)
+    save_metadata(store.root, target, dict(
+        jobs       = keys,
+        states     = states,
+        last_index = df.index[-1].isoformat(),
+    ))
+    return len(frame)
@@ -1,39 +1,126 @@
-from datetime import datetime
+from datetime import datetime, timedelta
 import inspect
 import logging
 import sys
 from time import time
+import warnings
 
 import dateparser
-from pandas import DataFrame, to_datetime
+import numpy as np
+from pandas import DataFrame, Timestamp
+
+from polaristools.ratelimiter import continuous_klines_weight
 # import pytz
 
 
+# Kline fields as stored in mongo, in api order ('ignore' dropped).
+KLINE_COLUMNS = [
+    'open_time','open','high','low','close',
+    'volume','close_time','quote_asset_volume',
+    'number_of_trades','taker_buy_base_asset_volume',
+    'taker_buy_quote_asset_volume',
+]
+EPOCH = datetime(1970,1,1)
+# Typed kline record, open_time / close_time in epoch milliseconds.
+KLINE_DTYPE = np.dtype([
+    ('open_time','<i8'),('open','<f8'),('high','<f8'),('low','<f8'),('close','<f8'),
+    ('volume','<f8'),('close_time','<i8'),('quote_asset_volume','<f8'),
+    ('number_of_trades','<i8'),('taker_buy_base_asset_volume','<f8'),
+    ('taker_buy_quote_asset_volume','<f8'),
+])
+
+def kline_documents(klines):
+    ''' 
+        Raw api klines (list of lists) or a NumPy record array
+        to mongo documents, same schema historicalKlinesParser + pdmongo wrote.
+        '''
+    if getattr(klines, 'dtype', None) is not None and klines.dtype.names:
+        columns = []
+        for name in KLINE_COLUMNS:
+            column = klines[name]
+            if column.dtype.kind == 'M':
+                column = column.astype('datetime64[ms]').astype('int64')
+            columns.append(column.tolist())
+        rows = zip(*columns)
+    else:
+        rows = klines
+    return [
+        {
+            'open_time': EPOCH + timedelta(milliseconds=int(row[0])),
+            'open': float(row[1]),
+            'high': float(row[2]),
+            'low': float(row[3]),
+            'close': float(row[4]),
+            'volume': float(row[5]),
+            'close_time': EPOCH + timedelta(milliseconds=int(row[6])),
+            'quote_asset_volume': float(row[7]),
+            'number_of_trades': int(row[8]),
+            'taker_buy_base_asset_volume': float(row[9]),
+            'taker_buy_quote_asset_volume': float(row[10]),
+        }
+        for row in rows
+    ]
+
+def klines_to_records(klines:list):
+    """
+        Raw api klines (list of lists of numeric strings) to a
+        NumPy record array of KLINE_DTYPE.
+        The page is transposed once, then every column is parsed in C
+        straight into the preallocated array (no DataFrame, no astype copies).
+        """
+    records = np.empty(len(klines), dtype=KLINE_DTYPE)
+    if not len(klines):
+        return records
+    columns = list(zip(*klines))
+    for idx, name in enumerate(KLINE_COLUMNS):
+        records[name] = np.array(columns[idx], dtype=KLINE_DTYPE[name])
+    return records
+
+def decode_klines(content:bytes):
+    """
+        Raw klines response body straight to a KLINE_DTYPE record array.
+        Brackets and quotes are stripped and the flat comma separated
+        numbers are parsed by NumPy in one go, no Python object is
+        created per value. Every kline has 12 fields ('ignore' dropped).
+        Error payloads ({"code":..., "msg":...}) and anything that is not
+        a list of numbers raise ValueError.
+        """
+    if content.lstrip()[:1] == b'{':
+        raise ValueError('Binance error payload: %s'%content[:200])
+    text = content.translate(None, b'[]" \n\r\t').decode('ascii')
+    if not text:
+        return np.empty(0, dtype=KLINE_DTYPE)
+    with warnings.catch_warnings():
+        # fromstring stops at the first non number, with a DeprecationWarning only.
+        warnings.simplefilter('ignore', DeprecationWarning)
+        flat = np.fromstring(text, dtype='float64', sep=',')
+    if flat.size != text.count(',') + 1 or flat.size % 12:
+        raise ValueError('Unexpected klines payload: %s'%content[:200])
+    flat = flat.reshape(-1, 12)
+    records = np.empty(len(flat), dtype=KLINE_DTYPE)
+    for idx, name in enumerate(KLINE_COLUMNS):
+        records[name] = flat[:, idx]
+    return records
+
+def klines_dataframe(records, set_index:bool=False):
+    """
+        Thin DataFrame over a KLINE_DTYPE record array,
+        open_time / close_time as datetimes.
+        """
+    data = {name: records[name] for name in KLINE_COLUMNS}
+    data['open_time'] = records['open_time'].astype('datetime64[ms]')
+    data['close_time'] = records['close_time'].astype('datetime64[ms]')
+    df = DataFrame(data, columns=KLINE_COLUMNS)
+    if set_index:
+        df.set_index(df['open_time'], inplace=True)
+    return df
+
 def historicalKlinesParser(klines:list):
     """
         Convert object raw kline to DataFrame
         obtained from the api
         """
-    set_index=False
-    columns_name = [ 'open_time','open','high','low','close',
-                    'volume','close_time','quote_asset_volume',
-                    'number_of_trades','taker_buy_base_asset_volume',
-                    'taker_buy_quote_asset_volume','ignore'
-                    ]
-    df = DataFrame(data=klines, columns=columns_name)
-    df['open_time'] = to_datetime(df['open_time'],   unit='ms')
-    df['close_time'] = to_datetime(df['close_time'],  unit='ms')
-    tofloat64 = [ 
-            'open','high','low','close','volume',
-            'quote_asset_volume',
-            'taker_buy_base_asset_volume',
-            'taker_buy_quote_asset_volume'
-    ]
-    df[tofloat64] = df[tofloat64].astype('float64') 
-    df.drop('ignore', axis=1, inplace=True)
-    if set_index:
-            df.set_index(df['open_time'], inplace=True)
-    return df
+    return klines_dataframe(klines_to_records(klines))
 
 def logger_func(logger_name,filename):
 	# logger = logging.getLogger(__name__)
@@ -88,6 +175,14 @@ def interval_to_milliseconds(interval: str) -> int():
     except (ValueError, KeyError):
         return None
 
+def interval_to_granularity(interval: str) -> str:
+    ''' 
+        MongoDB time-series granularity closest to a Binance interval.
+        '''
+    if interval_to_milliseconds(interval) < 60*60*1000:
+        return 'minutes'
+    return 'hours'
+
 def convert_ts_str(ts_str):
     if ts_str is None:
         return ts_str
@@ -102,6 +197,57 @@ def latest_valid_timestamp(timeframe):
         '''
     return int((time()*1000) - timeframe)
 
+# Page size limits and request weight of every klines endpoint.
+KLINES_ENDPOINTS = {
+    'klines': dict(max_limit=1000, weight=lambda limit: 1),
+    'continuous_klines': dict(max_limit=1500, weight=continuous_klines_weight),
+}
+
+def optimal_page_size(stream_type:str) -> int():
+    ''' 
+        Page size with the lowest request weight per kline for an endpoint.
+        Ties go to the biggest page, fewer requests.
+        e.g continuous_klines -> 499 (weight 2), klines -> 1000 (weight 1).
+        '''
+    endpoint = KLINES_ENDPOINTS[stream_type]
+    return min(
+        range(1, endpoint['max_limit']+1),
+        key=lambda limit: (endpoint['weight'](limit)/limit, -limit)
+    )
+
+def plan_kline_windows(start_ms:int, end_ms:int, timeframe:int, limit:int) -> list:
+    ''' 
+        Split [start_ms, end_ms] into (startTime, endTime) windows of at most
+        `limit` klines each, known up front so they can be requested in parallel.
+        start_ms must be aligned to the kline open time.
+        '''
+    span = limit * timeframe
+    return [
+        (page_start, min(page_start + span - timeframe, end_ms))
+        for page_start in range(start_ms, end_ms+1, span)
+    ]
+
+# date_range keys -> mongo operators, start / end read as [start, end).
+DATE_RANGE_OPERATORS = {
+    'start':'$gte', 'end':'$lt',
+    'gt':'$gt', 'gte':'$gte', 'lt':'$lt', 'lte':'$lte',
+}
+
+def date_range_query(date_range:dict, field:str='open_time')->dict:
+    ''' 
+        Mongo filter for a date window on `field`.
+        date_range: {start:.., end:..} (also gt / gte / lt / lte),
+        values as datetime or date strings, e.g {'start':'2022-01-01', 'end':'2022-08-25'}
+        '''
+    bounds = {}
+    for key, value in (date_range or {}).items():
+        if value is None:
+            continue
+        if key not in DATE_RANGE_OPERATORS:
+            raise ValueError(f'Unknown date_range key {key}, expected one of {list(DATE_RANGE_OPERATORS)}')
+        bounds[DATE_RANGE_OPERATORS[key]] = Timestamp(value).to_pydatetime()
+    return {field: bounds} if bounds else {}
+
 def parse_snapshotvos(snapshotVos:list):
     if snapshotVos:
         # SPOT
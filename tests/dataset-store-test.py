@@ -0,0 +1,189 @@
+from tempfile import TemporaryDirectory
+import unittest
+from unittest import mock
+import warnings
+
+import numpy as np
+
+from polaristools import datasetstore
+from polaristools.datasetstore import MemmapStore, ParquetStore, PickleStore
+
+from synthetic_klines import klines_frame
+
+''' 
+    Parquet, pickle and memmap stores: half-open reads, segment updates, compaction and crash safety.
+    '''
+
+class Unwritable:
+    def astype(self, *args, **kwargs):
+        raise OSError('No space left on device')
+
+
+@unittest.skipIf(datasetstore.pa is None, 'pyarrow not installed')
+class ParquetStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = TemporaryDirectory()
+        self.store = ParquetStore(self.tmp.name)
+        self.df = klines_frame(24*5, '2022-01-30')
+        self.store.write(self.df, 'df_klines_BTCUSDT_1h')
+    
+    def test_month_partitions(self):
+        self.assertEqual(self.store.months('df_klines_BTCUSDT_1h'), ['2022-01', '2022-02'])
+    
+    def test_roundtrip(self):
+        df = self.store.read('df_klines_BTCUSDT_1h')
+        self.assertTrue(df.equals(self.df))
+    
+    def test_half_open_window(self):
+        df = self.store.read('df_klines_BTCUSDT_1h', start='2022-01-31', end='2022-02-01 12:00', columns=['close'])
+        self.assertEqual(list(df.columns), ['close'])
+        self.assertEqual(len(df), 36)
+        self.assertEqual(df.index[-1], self.df.index[self.df.index < '2022-02-01 12:00'][-1])
+    
+    def test_nanosecond_bounds(self):
+        # 1ns past a row, e.g an inclusive end turned exclusive: the row is in, not out.
+        bound = self.df.index[30] + np.timedelta64(1, 'ns')
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            self.assertEqual(len(self.store.read('df_klines_BTCUSDT_1h', end=bound)), 31)
+            self.assertEqual(len(self.store.read('df_klines_BTCUSDT_1h', start=bound)), len(self.df) - 31)
+    
+    def test_update_appends_segment(self):
+        new = klines_frame(48, '2022-02-03', seed=4)
+        self.store.update(new, 'df_klines_BTCUSDT_1h')
+        self.assertEqual(self.store.months('df_klines_BTCUSDT_1h'), ['2022-01', '2022-02'])
+        self.assertEqual(len(self.store.segments('df_klines_BTCUSDT_1h', '2022-02')), 2)
+        self.assertEqual(len(self.store.segments('df_klines_BTCUSDT_1h', '2022-01')), 1)
+        df = self.store.read('df_klines_BTCUSDT_1h')
+        self.assertFalse(df.index.duplicated().any())
+        self.assertEqual(df.loc['2022-02-03 00:00', 'open'], new.open.iat[0])
+        self.assertEqual(self.store.lastIndex('df_klines_BTCUSDT_1h'), df.index[-1])
+        self.assertEqual(len(df), len(self.df) + 24)
+    
+    def test_compact(self):
+        for day in ('2022-02-04', '2022-02-05', '2022-02-06'):
+            self.store.update(klines_frame(24, day), 'df_klines_BTCUSDT_1h')
+        expected = self.store.read('df_klines_BTCUSDT_1h')
+        self.assertEqual(self.store.compact('df_klines_BTCUSDT_1h'), 3)
+        self.assertEqual(len(self.store.segments('df_klines_BTCUSDT_1h', '2022-02')), 1)
+        self.assertTrue(self.store.read('df_klines_BTCUSDT_1h').equals(expected))
+    
+    def test_auto_compaction(self):
+        self.store.max_segments = 2
+        for day in ('2022-02-04', '2022-02-05', '2022-02-06'):
+            self.store.update(klines_frame(24, day), 'df_klines_BTCUSDT_1h')
+        self.assertEqual(len(self.store.segments('df_klines_BTCUSDT_1h', '2022-02')), 2)
+        self.assertEqual(len(self.store.read('df_klines_BTCUSDT_1h')), len(self.df) + 72)
+    
+    def test_missing_dataset(self):
+        self.assertIsNone(self.store.read('df_klines_ETHUSDT_1h'))
+        self.assertIsNone(self.store.lastIndex('df_klines_ETHUSDT_1h'))
+    
+    def tearDown(self):
+        self.tmp.cleanup()
+
+
+class PickleStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = TemporaryDirectory()
+        self.store = PickleStore(self.tmp.name)
+        self.df = klines_frame(24*5, '2022-01-30')
+        self.store.write(self.df, 'df_klines_BTCUSDT_1h')
+    
+    def test_update_writes_segment_only(self):
+        new = klines_frame(24, '2022-02-04')
+        self.store.update(new, 'df_klines_BTCUSDT_1h')
+        self.assertEqual(len(self.store.segments('df_klines_BTCUSDT_1h')), 1)
+        self.assertTrue(self.store._load(self.store.path('df_klines_BTCUSDT_1h')).equals(self.df))
+        self.assertEqual(self.store.lastIndex('df_klines_BTCUSDT_1h'), new.index[-1])
+        self.assertEqual(len(self.store.read('df_klines_BTCUSDT_1h')), len(self.df) + 24)
+    
+    def test_update_keeps_stored_columns(self):
+        new = klines_frame(24, '2022-02-04')
+        new['number_of_trades'] = np.arange(24)
+        self.store.update(new, 'df_klines_BTCUSDT_1h')
+        df = self.store.read('df_klines_BTCUSDT_1h')
+        self.assertEqual(list(df.columns), list(self.df.columns))
+        self.assertFalse(df.isna().any().any())
+    
+    def test_compact(self):
+        self.store.update(klines_frame(24, '2022-02-04'), 'df_klines_BTCUSDT_1h')
+        self.store.update(klines_frame(24, '2022-02-05'), 'df_klines_BTCUSDT_1h')
+        expected = self.store.read('df_klines_BTCUSDT_1h')
+        self.assertEqual(self.store.compact('df_klines_BTCUSDT_1h'), 2)
+        self.assertEqual(self.store.segments('df_klines_BTCUSDT_1h'), [])
+        self.assertTrue(self.store.read('df_klines_BTCUSDT_1h').equals(expected))
+    
+    def test_auto_compaction(self):
+        self.store.max_segments = 2
+        for day in ('2022-02-04', '2022-02-05', '2022-02-06'):
+            self.store.update(klines_frame(24, day), 'df_klines_BTCUSDT_1h')
+        self.assertEqual(self.store.segments('df_klines_BTCUSDT_1h'), [])
+        self.assertEqual(len(self.store.read('df_klines_BTCUSDT_1h')), len(self.df) + 72)
+    
+    def tearDown(self):
+        self.tmp.cleanup()
+
+
+class MemmapStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = TemporaryDirectory()
+        self.store = MemmapStore(self.tmp.name)
+        self.df = klines_frame(24*5, '2022-01-30')
+        self.store.write(self.df, 'df_klines_BTCUSDT_1h')
+    
+    def test_roundtrip(self):
+        df = self.store.read('df_klines_BTCUSDT_1h')
+        self.assertTrue(df.equals(self.df))
+        self.assertEqual(self.store.header('df_klines_BTCUSDT_1h')['rows'], len(self.df))
+    
+    def test_lazy_half_open_window(self):
+        arrays = self.store.arrays('df_klines_BTCUSDT_1h', start='2022-01-31', end='2022-02-01 12:00', columns=['close'])
+        self.assertIsInstance(arrays['close'], np.memmap)
+        self.assertEqual(len(arrays['close']), 36)
+        df = self.store.read('df_klines_BTCUSDT_1h', start='2022-01-31', end='2022-02-01 12:00')
+        self.assertTrue(df.equals(self.df.loc['2022-01-31':'2022-02-01 11:00']))
+    
+    def test_read_shares_the_mapped_pages(self):
+        df = self.store.read('df_klines_BTCUSDT_1h', start='2022-01-31')
+        self.assertTrue(df.equals(self.df.loc['2022-01-31':]))
+        for column in df.columns:
+            self.assertIsInstance(df[column].values, np.memmap)
+        self.assertIsInstance(df.index.values.base, np.memmap)
+        self.assertFalse(df['close'].values.flags.writeable)
+        # Adding a column does not copy the stored ones.
+        df['extra'] = 1.0
+        self.assertIsInstance(df['close'].values, np.memmap)
+    
+    def test_update_appends_and_replaces_tail(self):
+        new = klines_frame(48, '2022-02-03', seed=4)
+        self.store.update(new, 'df_klines_BTCUSDT_1h')
+        df = self.store.read('df_klines_BTCUSDT_1h')
+        self.assertEqual(len(df), len(self.df) + 24)
+        self.assertTrue(df.index.is_monotonic_increasing)
+        self.assertEqual(df.loc['2022-02-03 00:00', 'open'], new.open.iat[0])
+        self.assertEqual(self.store.lastIndex('df_klines_BTCUSDT_1h'), df.index[-1])
+    
+    def test_interrupted_update_keeps_header_consistent(self):
+        # The write dies right after the 'open' file is cut.
+        def frame_columns(df):
+            columns = MemmapStore._frameColumns(self.store, df)
+            columns['open'] = Unwritable()
+            return columns
+        with mock.patch.object(self.store, '_frameColumns', frame_columns), self.assertRaises(OSError):
+            self.store.update(klines_frame(48, '2022-02-03'), 'df_klines_BTCUSDT_1h')
+        self.assertEqual(self.store.header('df_klines_BTCUSDT_1h')['rows'], 24*4)
+        self.assertTrue(self.store.read('df_klines_BTCUSDT_1h').equals(self.df.iloc[:24*4]))
+        # The next update cuts the leftovers and appends.
+        self.store.update(klines_frame(48, '2022-02-03'), 'df_klines_BTCUSDT_1h')
+        self.assertEqual(len(self.store.read('df_klines_BTCUSDT_1h')), len(self.df) + 24)
+    
+    def test_missing_dataset(self):
+        self.assertIsNone(self.store.read('df_klines_ETHUSDT_1h'))
+        self.assertIsNone(self.store.lastIndex('df_klines_ETHUSDT_1h'))
+    
+    def tearDown(self):
+        self.tmp.cleanup()
+    
+if __name__== '__main__':
+    unittest.main()
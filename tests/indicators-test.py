@@ -0,0 +1,108 @@
+import os
+from tempfile import TemporaryDirectory
+import unittest
+
+import numpy as np
+import talib
+
+from polaristools.indicators import IndicatorEngine, expand_request
+
+from synthetic_klines import klines_frame
+
+''' 
+    IndicatorEngine against TA-Lib, its npz cache versions and timeperiod families.
+    '''
+
+REQUEST = {
+    'simple_returns': {'lookback':2},
+    'log_returns': {},
+    'talib_EMA': [10, 20],
+    'talib_ATR': {'timeperiod':14},
+    'talib_SAR': {},
+    'talib_BBANDS': {'timeperiod':20},
+    'talib_STOCHRSI': {},
+    'talib_MACD': {},
+    'talib_ADX': {},
+    'talib_RSI': {'timeperiod':7},
+    'talib_AROON': {},
+    'talib_OBV': {},
+    'talib_doji': {},
+}
+
+
+class IndicatorEngineTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = TemporaryDirectory()
+        self.df = klines_frame(600)
+    
+    def test_expand_request(self):
+        self.assertEqual(
+            expand_request({'talib_EMA':[10, 20], 'talib_RSI':{'timeperiod':7}}),
+            [('talib_EMA', {'timeperiod':10}), ('talib_EMA', {'timeperiod':20}), ('talib_RSI', {'timeperiod':7})],
+        )
+        with self.assertRaises(ValueError):
+            expand_request({'talib_FOO':{}})
+    
+    def test_matches_talib(self):
+        df = IndicatorEngine().apply(self.df.copy(), REQUEST)
+        np.testing.assert_allclose(df['talib_EMA_20'], talib.EMA(self.df.close, timeperiod=20), equal_nan=True)
+        np.testing.assert_allclose(df['talib_ATR'], talib.ATR(self.df.high, self.df.low, self.df.close), equal_nan=True)
+        np.testing.assert_allclose(df['BB_low'], talib.BBANDS(self.df.close, timeperiod=20)[2], equal_nan=True)
+        np.testing.assert_allclose(df['talib_RSI'], talib.RSI(self.df.close, timeperiod=7), equal_nan=True)
+        np.testing.assert_allclose(df['simple_returns'], self.df.close.pct_change(2), equal_nan=True)
+        self.assertIn('log_returns_1', df.columns)
+        self.assertIn('talib_AROON_up', df.columns)
+    
+    def test_cache_reuse_and_invalidation(self):
+        engine = IndicatorEngine(self.tmp.name)
+        first = engine.apply(self.df.copy(), REQUEST)
+        self.assertEqual((engine.hits, engine.misses), (0, 14))
+        
+        engine = IndicatorEngine(self.tmp.name)
+        second = engine.apply(self.df.copy(), REQUEST)
+        self.assertEqual((engine.hits, engine.misses), (14, 0))
+        self.assertTrue(first.equals(second))
+        
+        # New data, new dataset version. OBV reads volume, EMA does not.
+        changed = self.df.copy()
+        changed.iloc[-1, changed.columns.get_loc('volume')] += 1
+        engine = IndicatorEngine(self.tmp.name)
+        engine.apply(changed, {'talib_EMA':[10], 'talib_OBV':{}})
+        self.assertEqual((engine.hits, engine.misses), (1, 1))
+    
+    def test_cache_keeps_newest_version(self):
+        engine = IndicatorEngine(self.tmp.name)
+        for rows in (500, 550, 600):
+            engine.apply(self.df.iloc[:rows].copy(), {'talib_EMA':[10, 20]})
+        self.assertEqual(len(os.listdir(self.tmp.name)), 2)
+        engine = IndicatorEngine(self.tmp.name)
+        engine.apply(self.df.copy(), {'talib_EMA':[10, 20]})
+        self.assertEqual((engine.hits, engine.misses), (2, 0))
+        engine.apply(self.df.iloc[:500].copy(), {'talib_EMA':[10]})
+        self.assertEqual((engine.hits, engine.misses), (2, 1))
+        self.assertEqual(len(os.listdir(self.tmp.name)), 2)
+    
+    def test_family(self):
+        periods = list(range(10, 51, 5))
+        engine = IndicatorEngine(self.tmp.name)
+        family = engine.computeFamily(self.df, 'talib_AROON', periods)
+        self.assertEqual(family['talib_AROON_up'].shape, (len(periods), len(self.df)))
+        for row, period in enumerate(periods):
+            down, up = talib.AROON(self.df.high, self.df.low, timeperiod=period)
+            np.testing.assert_allclose(family['talib_AROON_up'][row], up, equal_nan=True)
+            np.testing.assert_allclose(family['talib_AROON_down'][row], down, equal_nan=True)
+        
+        # Same cache entries as addIndicators requests.
+        frame = engine.familyFrame(self.df, 'talib_EMA', periods)
+        self.assertEqual(list(frame.columns), [f'talib_EMA_{period}' for period in periods])
+        engine = IndicatorEngine(self.tmp.name)
+        engine.compute(self.df, {'talib_EMA':[20]})
+        self.assertEqual((engine.hits, engine.misses), (1, 0))
+        with self.assertRaises(ValueError):
+            engine.computeFamily(self.df, 'talib_OBV', periods)
+    
+    def tearDown(self):
+        self.tmp.cleanup()
+    
+if __name__== '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+from datetime import datetime, timedelta
+import os
+from tempfile import TemporaryDirectory
+import unittest
+
+from polaristools.polarisbot import PolarisBot
+from polaristools.utils import interval_to_milliseconds, klines_to_records, latest_valid_timestamp
+
+'''
+    updateDatabaseKlines against stub exchange and database objects, one symbol's fetch failing.
+    '''
+
+class StubBinance:
+    def klineCandlestick(self, symbol, interval, startTime, endTime, limit, as_array):
+        if symbol == 'BADUSDT':
+            return {'code':-1121, 'msg':'Invalid symbol.'}
+        step = interval_to_milliseconds(interval)
+        return klines_to_records([
+            [ms, '1', '2', '0.5', '1.5', '10', ms+step-1, '15', 3, '5', '7.5', '0']
+            for ms in range(startTime, endTime+1, step)
+        ])
+
+
+class StubMongo:
+    def __init__(self, newest:datetime):
+        self.newest = newest
+        self.written = {}
+
+    def pingServer(self):
+        return 200
+
+    def extractNewestDates(self, db_name, collections):
+        return dict.fromkeys(collections, self.newest)
+
+    def insert_klines_bulk(self, db_name, collection, documents, meta=None):
+        self.written[collection] = self.written.get(collection, 0) + len(documents)
+        return len(documents)
+
+
+class UpdateDatabaseKlinesTest(unittest.TestCase):
+    def setUp(self):
+        # logger_func writes file.log in the working directory.
+        self.cwd = os.getcwd()
+        self.tmp = TemporaryDirectory()
+        os.chdir(self.tmp.name)
+
+    def test_failing_symbol_is_skipped(self):
+        symbols = ['BTCUSDT', 'BADUSDT', 'ETHUSDT']
+        last_valid = datetime.utcfromtimestamp(latest_valid_timestamp(60000)//60000*60)
+        for concurrency in (1, 3):
+            with self.subTest(concurrency=concurrency):
+                bot = PolarisBot()
+                bot.binance = StubBinance()
+                bot.mongo = StubMongo(newest=last_valid - timedelta(minutes=30))
+                bot.updateDatabaseKlines(symbols, '1m', 'usdt', 'klines', 'spot', concurrency=concurrency)
+                self.assertEqual(sorted(bot.mongo.written), ['klines_BTCUSDT_1m', 'klines_ETHUSDT_1m'])
+                self.assertTrue(all(rows >= 29 for rows in bot.mongo.written.values()))
+                self.assertEqual(bot.stage_timings['write']['items'], 2)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+if __name__== '__main__':
+    unittest.main()
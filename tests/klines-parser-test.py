@@ -0,0 +1,86 @@
+import json
+import unittest
+
+import numpy as np
+from pandas import DataFrame, to_datetime
+from pandas.testing import assert_frame_equal
+
+from polaristools.utils import (
+    KLINE_COLUMNS, decode_klines, historicalKlinesParser, kline_documents, klines_dataframe, klines_to_records,
+)
+
+from synthetic_klines import api_klines
+
+'''
+    Kline page parsers and JSON decoders against the legacy DataFrame parser, error payloads included.
+    '''
+
+def legacy_parser(klines:list):
+    '''
+        historicalKlinesParser before the record array parser.
+        '''
+    columns_name = [ 'open_time','open','high','low','close',
+                    'volume','close_time','quote_asset_volume',
+                    'number_of_trades','taker_buy_base_asset_volume',
+                    'taker_buy_quote_asset_volume','ignore'
+                    ]
+    df = DataFrame(data=klines, columns=columns_name)
+    df['open_time'] = to_datetime(df['open_time'],   unit='ms')
+    df['close_time'] = to_datetime(df['close_time'],  unit='ms')
+    tofloat64 = [
+            'open','high','low','close','volume',
+            'quote_asset_volume',
+            'taker_buy_base_asset_volume',
+            'taker_buy_quote_asset_volume'
+    ]
+    df[tofloat64] = df[tofloat64].astype('float64')
+    df.drop('ignore', axis=1, inplace=True)
+    return df
+
+
+class KlinesParserTest(unittest.TestCase):
+    def setUp(self):
+        self.page = api_klines(1500)
+        self.content = json.dumps(self.page).encode()
+
+    def test_records_match_legacy(self):
+        expected = legacy_parser(self.page)
+        records = klines_to_records(self.page)
+        for name in KLINE_COLUMNS:
+            values = records[name]
+            if name in ('open_time', 'close_time'):
+                values = values.astype('datetime64[ms]').astype('datetime64[ns]')
+            np.testing.assert_array_equal(values, expected[name].values)
+
+    def test_historical_parser_matches_legacy(self):
+        assert_frame_equal(historicalKlinesParser(self.page), legacy_parser(self.page))
+
+    def test_decode_matches_json_loads(self):
+        decoded = decode_klines(self.content)
+        self.assertEqual(decoded.dtype, klines_to_records(self.page).dtype)
+        np.testing.assert_array_equal(decoded, klines_to_records(json.loads(self.content)))
+        assert_frame_equal(klines_dataframe(decoded), legacy_parser(self.page))
+        # Compact separators as sent by the api.
+        compact = json.dumps(self.page, separators=(',', ':')).encode()
+        np.testing.assert_array_equal(decode_klines(compact), decoded)
+
+    def test_documents_match_records(self):
+        self.assertEqual(kline_documents(self.page[:50]), kline_documents(klines_to_records(self.page[:50])))
+
+    def test_empty_page(self):
+        self.assertEqual(len(decode_klines(b'[]')), 0)
+        self.assertEqual(len(klines_to_records([])), 0)
+        self.assertEqual(list(historicalKlinesParser([]).columns), KLINE_COLUMNS)
+
+    def test_error_payloads_raise(self):
+        for content in (
+            b'{"code":-1121,"msg":"Invalid symbol."}',
+            b' {"code":-1003,"msg":"Too many requests."}',
+            b'[[1,"a"]]',
+            b'[1,2,3]',
+        ):
+            with self.subTest(content=content), self.assertRaises(ValueError):
+                decode_klines(content)
+
+if __name__== '__main__':
+    unittest.main()
@@ -0,0 +1,187 @@
+from datetime import datetime
+import os
+import unittest
+
+import bson
+import numpy as np
+import pytz
+
+from polaristools.mongodatabase import MongoDatabase, decode_kline_batch, kline_column_dtype
+from polaristools.utils import KLINE_COLUMNS, date_range_query, kline_documents
+
+from synthetic_klines import api_klines
+
+''' 
+    Raw BSON batch decoding, then kline writes, index fallback and reads against a
+    local mongod (POLARIS_TEST_MONGO, default localhost:27017), skipped without one.
+    '''
+
+DB_NAME = 'polaris_test_reads'
+MINUTE = 60*1000
+START_MS = 1640995200000 # 2022-01-01
+
+def synthetic_klines(rows:int):
+    return api_klines(rows, START_MS, MINUTE)
+
+def winning_stages(plan:dict):
+    stages = [plan.get('stage')]
+    for key in ('inputStage', 'queryPlan'):
+        if key in plan:
+            stages += winning_stages(plan[key])
+    for child in plan.get('inputStages', []):
+        stages += winning_stages(child)
+    return stages
+
+def raw_batch(documents:list):
+    return b''.join(bson.encode(document) for document in documents)
+
+def dict_columns(batch:bytes, fields:list):
+    documents = bson.decode_all(batch)
+    return {field: np.array([doc[field] for doc in documents], dtype=kline_column_dtype(field)) for field in fields}
+
+
+class DecodeKlineBatchTest(unittest.TestCase):
+    def setUp(self):
+        self.documents = [
+            {'_id': bson.ObjectId(), **document} for document in kline_documents(synthetic_klines(300))
+        ]
+        for i, document in enumerate(self.documents):
+            document['close'] += i
+            document['number_of_trades'] += i
+    
+    def assertColumnsEqual(self, columns, expected):
+        self.assertEqual(list(columns), list(expected))
+        for field in expected:
+            self.assertEqual(columns[field].dtype, expected[field].dtype, field)
+            np.testing.assert_array_equal(columns[field], expected[field], field)
+    
+    def test_matches_decode_all(self):
+        batch = raw_batch(self.documents)
+        self.assertColumnsEqual(decode_kline_batch(batch, KLINE_COLUMNS), dict_columns(batch, KLINE_COLUMNS))
+    
+    def test_mixed_layouts_fall_back(self):
+        # An int64 trade count or a missing field changes the document layout.
+        self.documents[7]['number_of_trades'] = 2**40
+        self.documents[11] = {key: value for key, value in self.documents[11].items() if key != '_id'}
+        batch = raw_batch(self.documents)
+        self.assertColumnsEqual(decode_kline_batch(batch, KLINE_COLUMNS), dict_columns(batch, KLINE_COLUMNS))
+    
+    def test_empty_batch(self):
+        columns = decode_kline_batch(b'', ['open_time', 'close'])
+        self.assertEqual(len(columns['open_time']), 0)
+        self.assertEqual(columns['open_time'].dtype, kline_column_dtype('open_time'))
+
+
+class MongoDatabaseTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.mongo = MongoDatabase(dict(db_host=os.environ.get('POLARIS_TEST_MONGO', 'localhost:27017')))
+        if cls.mongo.pingServer() != 200:
+            raise unittest.SkipTest('mongod not available')
+        cls.mongo.dropDatabase(DB_NAME)
+        cls.mongo.insert_klines_bulk(DB_NAME, 'btcusdt', synthetic_klines(2500))
+    
+    def test_date_range_query(self):
+        self.assertEqual(
+            date_range_query({'start':'2022-01-01', 'end':datetime(2022,2,1)}),
+            {'open_time': {'$gte':datetime(2022,1,1), '$lt':datetime(2022,2,1)}},
+        )
+        self.assertEqual(date_range_query({'gt':datetime(2022,1,1)}), {'open_time': {'$gt':datetime(2022,1,1)}})
+        self.assertEqual(date_range_query({}), {})
+    
+    def test_range_served_by_index(self):
+        query = date_range_query({'start':datetime(2022,1,1,10), 'end':datetime(2022,1,1,20)})
+        stages = winning_stages(
+            self.mongo.explainKlinesQuery(DB_NAME, 'btcusdt', query, sort=[('open_time', 1)])
+        )
+        self.assertIn('IXSCAN', stages)
+        self.assertNotIn('COLLSCAN', stages)
+        self.assertNotIn('SORT', stages)
+    
+    def test_read_half_open_range(self):
+        columns = self.mongo.readKlineColumns(
+            DB_NAME, 'btcusdt', ['open_time', 'close'],
+            query = date_range_query({'start':datetime(2022,1,1,10), 'end':datetime(2022,1,1,20)}),
+            sort  = [('open_time', 1)],
+        )
+        self.assertEqual(len(columns['open_time']), 600)
+        self.assertEqual(columns['open_time'][0].item(), datetime(2022,1,1,10))
+        self.assertEqual(columns['open_time'][-1].item(), datetime(2022,1,1,19,59))
+    
+    def test_iter_fixed_size_chunks(self):
+        chunks = list(self.mongo.iterKlineColumns(
+            DB_NAME, 'btcusdt', ['open_time', 'close'], sort=[('open_time', 1)], chunk_rows=1000,
+        ))
+        self.assertEqual([len(chunk['close']) for chunk in chunks], [1000, 1000, 500])
+        self.assertEqual(chunks[1]['open_time'][0].item(), datetime(2022,1,1,16,40))
+    
+    def test_rerun_window_is_idempotent(self):
+        page = synthetic_klines(300)
+        self.assertEqual(self.mongo.insert_klines_bulk(DB_NAME, 'idempotent', page, batch_size=100), 300)
+        # Same window again, every candle is a duplicate key.
+        self.assertEqual(self.mongo.insert_klines_bulk(DB_NAME, 'idempotent', page, batch_size=100), 0)
+        # Overlapping window, only the new candles are written.
+        self.assertEqual(self.mongo.insert_klines_bulk(DB_NAME, 'idempotent', synthetic_klines(350)[250:]), 50)
+        self.assertEqual(self.mongo.countDocuments(DB_NAME, 'idempotent'), 350)
+    
+    def test_upsert_replaces_stored_candles(self):
+        stored = synthetic_klines(100)
+        self.mongo.insert_klines_bulk(DB_NAME, 'upsert', stored)
+        changed = synthetic_klines(120)[90:]
+        for kline in changed:
+            kline[4] = '9.25'
+        self.assertEqual(self.mongo.insert_klines_bulk(DB_NAME, 'upsert', changed, upsert=True), 30)
+        self.assertEqual(self.mongo.countDocuments(DB_NAME, 'upsert'), 120)
+        coll = self.mongo.client[DB_NAME]['upsert']
+        self.assertEqual(coll.count_documents({'close':9.25}), 30)
+        self.assertEqual(coll.find_one({'open_time':datetime(2022,1,1,1,29)})['close'], float(stored[89][4]))
+        self.assertEqual(coll.find_one({'open_time':datetime(2022,1,1,1,30)})['close'], 9.25)
+    
+    def test_duplicated_legacy_collection_keeps_an_index(self):
+        coll = self.mongo.client[DB_NAME]['legacy']
+        documents = kline_documents(synthetic_klines(50))
+        coll.insert_many([dict(document) for document in documents + documents[:5]])
+        self.assertFalse(self.mongo.ensureKlinesIndex(DB_NAME, 'legacy'))
+        self.assertIn('open_time_1', coll.index_information())
+        # The failure is remembered, no second build attempt.
+        self.assertFalse(self.mongo.ensureKlinesIndex(DB_NAME, 'legacy'))
+        self.assertEqual(self.mongo.removeDuplicateKlines(DB_NAME, 'legacy'), 5)
+        self.assertTrue(self.mongo.indexed[(DB_NAME, 'legacy')])
+        self.assertEqual(
+            [name for name in coll.index_information() if name != '_id_'], ['open_time_unique'],
+        )
+
+    def test_write_deduplicates_legacy_collection(self):
+        coll = self.mongo.client[DB_NAME]['legacy_writes']
+        documents = kline_documents(synthetic_klines(50))
+        coll.insert_many([dict(document) for document in documents + documents[:5]])
+        self.assertEqual(self.mongo.insert_klines_bulk(DB_NAME, 'legacy_writes', synthetic_klines(60)), 10)
+        self.assertEqual(self.mongo.countDocuments(DB_NAME, 'legacy_writes'), 60)
+        self.assertIn('open_time_unique', coll.index_information())
+
+    def test_newest_dates_and_edges(self):
+        self.mongo.insert_klines_bulk(DB_NAME, 'ethusdt', synthetic_klines(10))
+        self.assertEqual(
+            self.mongo.extractNewestDates(DB_NAME, ['btcusdt', 'missing', 'ethusdt']),
+            {
+                'btcusdt': datetime(2022,1,2,17,39, tzinfo=pytz.utc),
+                'missing': None,
+                'ethusdt': datetime(2022,1,1,0,9, tzinfo=pytz.utc),
+            },
+        )
+        # A missing first collection still reports the others.
+        self.assertEqual(self.mongo.extractNewestDates(DB_NAME, ['missing', 'ethusdt'])['ethusdt'],
+                         datetime(2022,1,1,0,9, tzinfo=pytz.utc))
+        self.assertIsNone(self.mongo.extractNewestDate(DB_NAME, 'missing'))
+        self.assertEqual(self.mongo.extractNewestDates(DB_NAME, []), {})
+        self.assertEqual(self.mongo.readEdges(DB_NAME, 'btcusdt'), (datetime(2022,1,1), datetime(2022,1,2,17,39)))
+        self.assertEqual(self.mongo.readEdges(DB_NAME, 'missing'), (None, None))
+        # Looking a collection up does not create it.
+        self.assertNotIn('missing', self.mongo.showCollections(db_name=DB_NAME))
+    
+    @classmethod
+    def tearDownClass(cls):
+        cls.mongo.dropDatabase(DB_NAME)
+    
+if __name__== '__main__':
+    unittest.main()
@@ -0,0 +1,34 @@
+import unittest
+
+from polaristools.utils import optimal_page_size, plan_kline_windows
+
+''' 
+    Kline paging planner: page size and non-overlapping windows over a date range.
+    '''
+
+class PagingPlannerTest(unittest.TestCase):
+    def setUp(self):
+        self.minute = 60*1000
+    
+    def test_optimal_page_size(self):
+        self.assertEqual(optimal_page_size('klines'), 1000)
+        self.assertEqual(optimal_page_size('continuous_klines'), 499)
+    
+    def test_windows_cover_range_without_overlap(self):
+        windows = plan_kline_windows(0, 2500*self.minute, self.minute, 1000)
+        self.assertEqual(windows[0], (0, 999*self.minute))
+        self.assertEqual(windows[-1], (2000*self.minute, 2500*self.minute))
+        for (_, end), (start, _) in zip(windows, windows[1:]):
+            self.assertEqual(start - end, self.minute)
+    
+    def test_single_window(self):
+        self.assertEqual(plan_kline_windows(0, 10*self.minute, self.minute, 499), [(0, 10*self.minute)])
+    
+    def test_empty_range(self):
+        self.assertEqual(plan_kline_windows(10*self.minute, 0, self.minute, 499), [])
+    
+    def tearDown(self):
+        pass
+    
+if __name__== '__main__':
+    unittest.main()
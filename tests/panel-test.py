@@ -0,0 +1,71 @@
+from tempfile import TemporaryDirectory
+import unittest
+
+import numpy as np
+import talib
+
+from polaristools.datasetstore import ParquetStore, PickleStore
+from polaristools.panel import compute_panel
+
+from synthetic_klines import klines_frame
+
+'''
+    compute_panel over several datasets, serial vs worker pool, date windows and missing datasets.
+    '''
+
+REQUEST = {'talib_EMA':[10, 20], 'talib_RSI':{}, 'talib_AROON':{}}
+
+
+class PanelTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = TemporaryDirectory()
+        # ETH starts later, BNB misses every other bar.
+        self.frames = {
+            'df_klines_BTCUSDT_60m': klines_frame(500, '2022-01-01', seed=1),
+            'df_klines_ETHUSDT_60m': klines_frame(300, '2022-01-10', seed=2),
+            'df_klines_BNBUSDT_60m': klines_frame(400, '2022-01-01', seed=3).iloc[::2],
+        }
+
+    def assertPanel(self, panel, names):
+        index = self.frames[names[0]].index
+        for name in names[1:]:
+            index = index.union(self.frames[name].index)
+        self.assertTrue(panel.index.equals(index))
+        self.assertEqual(list(panel.columns.names), ['dataset','column'])
+        for name in names:
+            df = self.frames[name]
+            own = panel[name].loc[df.index]
+            np.testing.assert_allclose(own['close'], df.close)
+            np.testing.assert_allclose(own['talib_EMA_20'], talib.EMA(df.close, timeperiod=20), equal_nan=True)
+            np.testing.assert_allclose(own['talib_RSI'], talib.RSI(df.close), equal_nan=True)
+            np.testing.assert_allclose(own['talib_AROON_up'], talib.AROON(df.high, df.low)[1], equal_nan=True)
+            # Bars missing in this dataset are NaN.
+            self.assertTrue(panel[name]['close'].drop(df.index).isna().all())
+
+    def test_serial_and_pool_match(self):
+        names = list(self.frames)
+        for store_class, fmt in ((PickleStore, 'pickle'), (ParquetStore, 'parquet')):
+            with self.subTest(fmt=fmt):
+                store = store_class(self.tmp.name)
+                for name, df in self.frames.items():
+                    store.write(df, name)
+                serial = compute_panel(names, REQUEST, fmt=fmt, root=self.tmp.name)
+                self.assertPanel(serial, names)
+                pooled = compute_panel(names, REQUEST, fmt=fmt, root=self.tmp.name, workers=2)
+                self.assertTrue(serial.equals(pooled))
+                cross = serial.xs('talib_RSI', axis=1, level='column')
+                self.assertEqual(list(cross.columns), names)
+
+    def test_window_and_missing(self):
+        store = PickleStore(self.tmp.name)
+        store.write(self.frames['df_klines_BTCUSDT_60m'], 'df_klines_BTCUSDT_60m')
+        panel = compute_panel(['df_klines_BTCUSDT_60m'], REQUEST, root=self.tmp.name, start='2022-01-05', end='2022-01-06')
+        self.assertEqual(len(panel), 24)
+        with self.assertRaises(FileNotFoundError):
+            compute_panel(['df_klines_BTCUSDT_60m', 'df_klines_FOOUSDT_60m'], REQUEST, root=self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+if __name__== '__main__':
+    unittest.main()
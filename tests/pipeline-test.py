@@ -0,0 +1,142 @@
+import random
+from threading import Thread
+from time import sleep
+import unittest
+
+from polaristools.pipeline import KlinesPipeline, merge_stage_stats, new_stage_stats, ordered_map
+
+'''
+    Fetch/parse/write pipeline ordering, stage stats and error propagation, and ordered_map.
+    '''
+
+class Boom(Exception):
+    pass
+
+def run_with_timeout(pipeline, timeout:float=10):
+    '''
+        pipeline.run() in a thread, (stats or None, error or None, finished).
+        '''
+    outcome = dict(stats=None, error=None)
+    def target():
+        try:
+            outcome['stats'] = pipeline.run()
+        except Exception as e:
+            outcome['error'] = e
+    thread = Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    return outcome['stats'], outcome['error'], not thread.is_alive()
+
+
+class KlinesPipelineTest(unittest.TestCase):
+    def test_order_and_stats(self):
+        written = []
+        def parse(page):
+            sleep(random.random()/1000)
+            return [value*2 for value in page]
+        pipeline = KlinesPipeline(
+            fetch = lambda: ([i, i+1] for i in range(0, 200, 2)),
+            parse = parse,
+            write = written.append,
+            maxsize = 2,
+        )
+        stats, error, finished = run_with_timeout(pipeline)
+        self.assertTrue(finished)
+        self.assertIsNone(error)
+        self.assertEqual([value for page in written for value in page], [i*2 for i in range(200)])
+        self.assertEqual([stats[stage]['items'] for stage in ('fetch','parse','write')], [100, 100, 100])
+
+    def test_empty_fetch(self):
+        written = []
+        stats, error, finished = run_with_timeout(KlinesPipeline(lambda: iter(()), list, written.append))
+        self.assertTrue(finished)
+        self.assertIsNone(error)
+        self.assertEqual(written, [])
+
+    def test_fetch_error_is_raised(self):
+        def fetch():
+            yield [1]
+            raise Boom('fetch')
+        written = []
+        _, error, finished = run_with_timeout(KlinesPipeline(fetch, list, written.append))
+        self.assertTrue(finished)
+        self.assertIsInstance(error, Boom)
+        self.assertEqual(str(error), 'fetch')
+
+    def test_fetch_error_at_start_is_raised(self):
+        def fetch():
+            raise Boom('fetch')
+        _, error, finished = run_with_timeout(KlinesPipeline(fetch, list, lambda page: None))
+        self.assertTrue(finished)
+        self.assertIsInstance(error, Boom)
+
+    def test_parse_error_is_raised(self):
+        def parse(page):
+            if page[0] == 5:
+                raise Boom('parse')
+            return page
+        written = []
+        _, error, finished = run_with_timeout(KlinesPipeline(lambda: ([i] for i in range(100)), parse, written.append))
+        self.assertTrue(finished)
+        self.assertIsInstance(error, Boom)
+        self.assertEqual(str(error), 'parse')
+        # Pages parsed before the error may or may not be written, never out of order.
+        self.assertLessEqual(len(written), 5)
+        self.assertEqual(written, [[i] for i in range(len(written))])
+
+    def test_write_error_does_not_hang(self):
+        # An endless fetch blocked on a full queue must still stop.
+        def fetch():
+            i = 0
+            while True:
+                yield [i]
+                i += 1
+        def write(page):
+            if page[0] == 3:
+                raise Boom('write')
+        _, error, finished = run_with_timeout(KlinesPipeline(fetch, list, write, maxsize=1))
+        self.assertTrue(finished)
+        self.assertIsInstance(error, Boom)
+        self.assertEqual(str(error), 'write')
+
+    def test_merge_stage_stats(self):
+        stats = new_stage_stats()
+        stats['fetch']['items'] = 3
+        total = merge_stage_stats(merge_stage_stats({}, stats), stats)
+        self.assertEqual(total['fetch']['items'], 6)
+        self.assertEqual(total['write']['busy'], 0.0)
+
+
+class OrderedMapTest(unittest.TestCase):
+    def test_keeps_input_order(self):
+        def work(i):
+            sleep(random.random()/500)
+            return i*i
+        for workers in (1, 4):
+            with self.subTest(workers=workers):
+                self.assertEqual(list(ordered_map(work, range(50), workers)), [i*i for i in range(50)])
+
+    def test_error_is_raised_in_order(self):
+        def work(i):
+            if i == 7:
+                raise Boom(str(i))
+            return i
+        results = []
+        with self.assertRaises(Boom):
+            for result in ordered_map(work, range(20), workers=4):
+                results.append(result)
+        self.assertEqual(results, list(range(7)))
+
+    def test_bounded_lookahead(self):
+        submitted = []
+        def work(i):
+            submitted.append(i)
+            return i
+        results = ordered_map(work, iter(range(100)), workers=3)
+        next(results)
+        sleep(0.05)
+        self.assertLessEqual(len(submitted), 4)
+        results.close()
+
+if __name__== '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+from time import monotonic
+
+from polaristools.binanceconnection import BinanceConnection
+from polaristools.ratelimiter import WeightRateLimiter, continuous_klines_weight
+
+''' 
+    Weight rate limiter: blocking, server used-weight sync, Retry-After and per host limiters.
+    '''
+
+class WeightRateLimiterTest(unittest.TestCase):
+    def setUp(self):
+        self.limiter = WeightRateLimiter(limit=100, interval=1.0, safety=1.0)
+    
+    def test_acquire_within_budget_does_not_block(self):
+        start = monotonic()
+        for _ in range(10):
+            self.limiter.acquire(weight=10)
+        self.assertLess(monotonic()-start, 0.05)
+    
+    def test_acquire_blocks_when_budget_exhausted(self):
+        self.limiter.acquire(weight=100)
+        start = monotonic()
+        self.limiter.acquire(weight=20)
+        self.assertGreaterEqual(monotonic()-start, 0.15)
+    
+    def test_update_trusts_server_used_weight(self):
+        self.limiter.update({'X-MBX-USED-WEIGHT-1S': '95'})
+        self.assertLessEqual(self.limiter.tokens, 5.5)
+        self.limiter.update({'x-mbx-used-weight-1s': '0'})
+        self.assertEqual(self.limiter.tokens, 100)
+    
+    def test_update_ignores_other_windows(self):
+        self.assertIsNone(self.limiter.usedWeight({'X-MBX-USED-WEIGHT-1M': '95'}))
+    
+    def test_retry_after_blocks(self):
+        self.limiter.update({'Retry-After': '0.2'}, status_code=429)
+        start = monotonic()
+        self.limiter.acquire(weight=1)
+        self.assertGreaterEqual(monotonic()-start, 0.15)
+    
+    def test_continuous_klines_weight(self):
+        self.assertEqual([continuous_klines_weight(l) for l in (1, 99, 100, 499, 500, 1000, 1001, 1500)],
+            [1, 1, 2, 2, 5, 5, 10, 10])
+    
+    def test_limiters_per_host(self):
+        binance = BinanceConnection()
+        self.assertEqual(binance.limiter(BinanceConnection.baseurl_spot_margin).limit, 1200)
+        self.assertEqual(binance.limiter(BinanceConnection.baseurl_futures_usd).limit, 2400)
+        # Hosts without a known weight limit, e.g benchmark stubs, are not throttled.
+        self.assertIsNone(binance.limiter('http://127.0.0.1:8080'))
+        binance.close()
+    
+    def tearDown(self):
+        pass
+    
+if __name__== '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+from tempfile import TemporaryDirectory
+import unittest
+
+import numpy as np
+from pandas import Timedelta
+from pandas.testing import assert_frame_equal
+
+from polaristools.datasetstore import MemmapStore, PickleStore, load_metadata
+from polaristools.resampler import KLINE_AGGREGATIONS, OHLCV_AGGREGATIONS, plan_sources, resample_dataset, resample_many
+
+from synthetic_klines import klines_frame
+
+''' 
+    Single pass resampler against DataFrame.resample, full and incremental runs.
+    '''
+
+PERIODS = [240,120,60,30,15,10,5,3]
+
+def klines_1m(minutes:int, start:str='2022-01-01 00:00', gaps:bool=True, seed:int=7):
+    df = klines_frame(minutes, start, '1min', seed)
+    if gaps:
+        # Missing bars, including whole missing buckets.
+        keep = np.random.default_rng(seed).random(minutes) > 0.05
+        keep[500:800] = False
+        df = df[keep]
+    return df
+
+def all_kline_columns(df, seed:int=11):
+    rng = np.random.default_rng(seed)
+    df = df.copy()
+    df['close_time'] = df.index + Timedelta(seconds=59.999)
+    df['quote_asset_volume'] = df.volume * df.close
+    df['number_of_trades'] = rng.integers(0, 500, len(df))
+    df['taker_buy_base_asset_volume'] = df.volume / 2
+    df['taker_buy_quote_asset_volume'] = df.quote_asset_volume / 2
+    return df
+
+def pandas_resample(df, period:int, how:dict=OHLCV_AGGREGATIONS):
+    return df.resample(f'{period}T', label='right', closed='right').agg(how)
+
+
+class ResamplerTest(unittest.TestCase):
+    def test_plan_sources(self):
+        self.assertEqual(
+            plan_sources(PERIODS),
+            {3:1, 5:1, 10:5, 15:5, 30:15, 60:30, 120:60, 240:120},
+        )
+        with self.assertRaises(ValueError):
+            plan_sources([7])
+    
+    def test_matches_pandas_with_gaps(self):
+        df = klines_1m(3*1440 + 17, start='2022-01-01 00:07')
+        frames = resample_many(df, PERIODS)
+        self.assertEqual(list(frames), PERIODS)
+        for period in PERIODS:
+            assert_frame_equal(frames[period], pandas_resample(df, period), check_freq=False)
+    
+    def test_matches_pandas_without_gaps(self):
+        df = klines_1m(2*1440, gaps=False)
+        for period, frame in resample_many(df, PERIODS).items():
+            assert_frame_equal(frame, pandas_resample(df, period), check_freq=False)
+    
+    def test_all_kline_columns(self):
+        df = all_kline_columns(klines_1m(2*1440 + 5, start='2022-01-01 00:07'))
+        frames = resample_many(df, PERIODS)
+        for period in PERIODS:
+            self.assertEqual(list(frames[period].columns), list(KLINE_AGGREGATIONS))
+            assert_frame_equal(frames[period], pandas_resample(df, period, KLINE_AGGREGATIONS), check_freq=False)
+    
+    def test_incremental_matches_full(self):
+        df = all_kline_columns(klines_1m(3*1440 + 17, start='2022-01-01 00:07'))
+        for store_class in (PickleStore, MemmapStore):
+            with TemporaryDirectory() as tmp:
+                store = store_class(tmp)
+                # Day by day, cutting in the middle of buckets and of a gap.
+                store.write(df.loc[:'2022-01-01 09:21'], 'df_klines_BTCUSDT_1m')
+                resample_dataset(store, 'df_klines_BTCUSDT_1m', PERIODS)
+                for cut in ('2022-01-02 13:00', '2022-01-03 04:58', None):
+                    last = store.lastIndex('df_klines_BTCUSDT_1m')
+                    new = df[df.index > last] if cut is None else df[(df.index > last) & (df.index <= cut)]
+                    store.update(new, 'df_klines_BTCUSDT_1m')
+                    written = resample_dataset(store, 'df_klines_BTCUSDT_1m', PERIODS)
+                    self.assertLess(written[3], 1440)
+                for period in PERIODS:
+                    assert_frame_equal(
+                        store.read(f'df_klines_BTCUSDT_{period}m'), pandas_resample(df, period, KLINE_AGGREGATIONS),
+                        check_freq=False,
+                    )
+                self.assertEqual(
+                    load_metadata(tmp, 'df_klines_BTCUSDT_240m')['last_complete'], '2022-01-04T00:00:00',
+                )
+    
+    def test_repeated_runs_keep_segments_bounded(self):
+        df = klines_1m(1440, gaps=False)
+        with TemporaryDirectory() as tmp:
+            store = PickleStore(tmp, max_segments=4)
+            store.write(df.iloc[:60], 'df_klines_BTCUSDT_1m')
+            resample_dataset(store, 'df_klines_BTCUSDT_1m', [3, 15])
+            for end in range(120, 1441, 60):
+                store.update(df.iloc[end-60:end], 'df_klines_BTCUSDT_1m')
+                resample_dataset(store, 'df_klines_BTCUSDT_1m', [3, 15])
+                for name in ('df_klines_BTCUSDT_1m', 'df_klines_BTCUSDT_3m', 'df_klines_BTCUSDT_15m'):
+                    self.assertLessEqual(len(store.segments(name)), 4)
+            assert_frame_equal(store.read('df_klines_BTCUSDT_15m'), pandas_resample(df, 15), check_freq=False)
+    
+    def test_empty(self):
+        frames = resample_many(klines_1m(10).iloc[:0], [3])
+        self.assertTrue(frames[3].empty)
+    
+if __name__== '__main__':
+    unittest.main()
@@ -0,0 +1,136 @@
+import json
+from tempfile import TemporaryDirectory
+import unittest
+
+import numpy as np
+import talib
+
+from polaristools.datasetstore import MemmapStore, ParquetStore, PickleStore, load_metadata
+from polaristools.resampler import resample_dataset
+from polaristools.streaming import (
+    StreamingATR, StreamingBBANDS, StreamingEMA, StreamingMACD, StreamingOBV, StreamingRSI,
+    indicators_name, update_indicator_dataset,
+)
+
+from synthetic_klines import klines_frame
+
+'''
+    Streaming indicators against TA-Lib, incremental indicator datasets and partial buckets.
+    '''
+
+REQUEST = {
+    'talib_EMA': [10, 20],
+    'talib_RSI': {'timeperiod':7},
+    'talib_MACD': {},
+    'talib_ATR': {},
+    'talib_OBV': {},
+    'talib_BBANDS': {'timeperiod':20},
+}
+
+def klines_1m(rows:int=2000):
+    df = klines_frame(rows, freq='1min', seed=5)
+    # Flat stretch, zero gains and losses.
+    df.iloc[300:320, df.columns.get_loc('close')] = df.close.iloc[299]
+    return df
+
+def in_chunks(streaming_class, params:dict, inputs:tuple, cuts:list):
+    '''
+        Outputs of streaming_class over inputs fed in chunks ending at cuts,
+        the state round tripped through json in between.
+        '''
+    state, outputs, previous = None, [], 0
+    for cut in cuts:
+        streaming = streaming_class(**params, state=state)
+        outputs.append(streaming.update(*(values[previous:cut] for values in inputs)))
+        state = json.loads(json.dumps(streaming.state))
+        previous = cut
+    return tuple(np.concatenate(column) for column in zip(*outputs))
+
+
+class StreamingIndicatorsTest(unittest.TestCase):
+    def setUp(self):
+        df = klines_1m()
+        self.rows = len(df)
+        self.columns = {column: df[column].values for column in df.columns}
+
+    def assertMatchesTalib(self, streaming_class, params:dict, inputs:tuple, talib_function):
+        expected = talib_function(*(self.columns[column] for column in inputs), **params)
+        expected = expected if isinstance(expected, tuple) else (expected,)
+        # Whole history at once, then warm-up split across tiny chunks.
+        for cuts in ([self.rows], [1, 2, 3, 5, 8, 13, 40, 41, 500, self.rows]):
+            result = in_chunks(streaming_class, params, tuple(self.columns[column] for column in inputs), cuts)
+            for got, want in zip(result, expected):
+                np.testing.assert_array_equal(np.isnan(got), np.isnan(want))
+                np.testing.assert_allclose(got, want, rtol=1e-9, atol=1e-7, equal_nan=True)
+
+    def test_ema(self):
+        self.assertMatchesTalib(StreamingEMA, dict(timeperiod=20), ('close',), talib.EMA)
+
+    def test_rsi(self):
+        self.assertMatchesTalib(StreamingRSI, dict(timeperiod=14), ('close',), talib.RSI)
+
+    def test_macd(self):
+        self.assertMatchesTalib(StreamingMACD, dict(fastperiod=12, slowperiod=26, signalperiod=9), ('close',), talib.MACD)
+
+    def test_atr(self):
+        self.assertMatchesTalib(StreamingATR, dict(timeperiod=14), ('high','low','close'), talib.ATR)
+
+    def test_obv(self):
+        self.assertMatchesTalib(StreamingOBV, dict(), ('close','volume'), talib.OBV)
+
+    def test_bbands(self):
+        self.assertMatchesTalib(StreamingBBANDS, dict(timeperiod=20, nbdevup=2, nbdevdn=2, matype=0), ('close',), talib.BBANDS)
+        with self.assertRaises(ValueError):
+            StreamingBBANDS(matype=1)
+
+    def test_dataset_update_reads_new_bars_only(self):
+        df = klines_1m()
+        for store_class in (PickleStore, ParquetStore, MemmapStore):
+            with self.subTest(store=store_class.__name__), TemporaryDirectory() as tmp:
+                store = store_class(tmp)
+                name = 'df_klines_BTCUSDT_1m'
+                store.write(df.iloc[:1500], name)
+                self.assertEqual(update_indicator_dataset(store, name, REQUEST), 1500)
+                store.update(df.iloc[1500:], name)
+                self.assertEqual(update_indicator_dataset(store, name, REQUEST), 500)
+                self.assertEqual(update_indicator_dataset(store, name, REQUEST), 0)
+
+                result = store.read(indicators_name(name))
+                self.assertEqual(len(result), len(df))
+                np.testing.assert_allclose(result['talib_EMA_20'], talib.EMA(df.close, timeperiod=20), equal_nan=True)
+                np.testing.assert_allclose(result['talib_RSI'], talib.RSI(df.close, timeperiod=7), equal_nan=True)
+                np.testing.assert_allclose(result['talib_MACD_hist'], talib.MACD(df.close)[2], equal_nan=True, atol=1e-9)
+                np.testing.assert_allclose(result['talib_ATR'], talib.ATR(df.high, df.low, df.close), equal_nan=True)
+                np.testing.assert_allclose(result['talib_OBV'], talib.OBV(df.close, df.volume), equal_nan=True)
+                np.testing.assert_allclose(result['BB_up'], talib.BBANDS(df.close, timeperiod=20)[0], equal_nan=True)
+                self.assertEqual(load_metadata(tmp, indicators_name(name))['last_index'], df.index[-1].isoformat())
+
+    def test_resampled_dataset_skips_partial_bucket(self):
+        df = klines_1m(30*15*4)
+        with TemporaryDirectory() as tmp:
+            store = MemmapStore(tmp)
+            store.write(df.iloc[:1000], 'df_klines_BTCUSDT_1m')
+            resample_dataset(store, 'df_klines_BTCUSDT_1m', [15])
+            # Bars up to 16:39, buckets are right closed: 00:00 ... 16:30 complete, 16:45 still open.
+            self.assertEqual(update_indicator_dataset(store, 'df_klines_BTCUSDT_15m', REQUEST), 67)
+            store.update(df.iloc[1000:], 'df_klines_BTCUSDT_1m')
+            resample_dataset(store, 'df_klines_BTCUSDT_1m', [15])
+            update_indicator_dataset(store, 'df_klines_BTCUSDT_15m', REQUEST)
+
+            resampled = store.read('df_klines_BTCUSDT_15m')
+            complete = resampled[resampled.index <= load_metadata(tmp, 'df_klines_BTCUSDT_15m')['last_complete']]
+            result = store.read(indicators_name('df_klines_BTCUSDT_15m'))
+            self.assertTrue(result.index.equals(complete.index))
+            np.testing.assert_allclose(result['talib_EMA_10'], talib.EMA(complete.close, timeperiod=10), equal_nan=True)
+            np.testing.assert_allclose(result['talib_ATR'], talib.ATR(complete.high, complete.low, complete.close), equal_nan=True)
+            np.testing.assert_allclose(result['talib_OBV'], talib.OBV(complete.close, complete.volume), equal_nan=True)
+
+    def test_unsupported_indicator(self):
+        with TemporaryDirectory() as tmp:
+            store = PickleStore(tmp)
+            store.write(klines_1m(400), 'df_klines_BTCUSDT_1m')
+            with self.assertRaises(ValueError):
+                update_indicator_dataset(store, 'df_klines_BTCUSDT_1m', {'talib_SAR':{}})
+
+if __name__== '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+import numpy as np
+from pandas import DataFrame, date_range
+
+'''
+    Reproducible random walk klines for tests and benchmarks, as raw api
+    pages or DataFrames indexed by open_time.
+    '''
+
+def klines_frame(rows:int, start:str='2022-01-01', freq:str='1h', seed:int=3, price:float=100):
+    '''
+        OHLCV DataFrame indexed by open_time, low <= open, close <= high.
+        '''
+    rng = np.random.default_rng(seed)
+    close = price + rng.standard_normal(rows).cumsum()
+    spread = rng.random(rows)
+    return DataFrame({
+        'open': close + (rng.random(rows)*2 - 1)*spread,
+        'high': close + spread,
+        'low': close - spread,
+        'close': close,
+        'volume': rng.random(rows)*10,
+    }, index=date_range(start, periods=rows, freq=freq, name='open_time'))
+
+def api_klines(rows:int, start_ms:int=1577836800000, timeframe:int=60000, seed:int=9, price:float=7000):
+    '''
+        Klines page as the api sends it: times and trades as numbers,
+        prices and volumes as '%.8f' strings, 'ignore' as '0'.
+        '''
+    df = klines_frame(rows, seed=seed, price=price)
+    rng = np.random.default_rng(seed+1)
+    taker = rng.random(rows)
+    quote = df.volume.values * df.close.values
+    open_time = start_ms + np.arange(rows, dtype=np.int64)*timeframe
+    decimals = lambda values: [f'{value:.8f}' for value in values.tolist()]
+    columns = [
+        open_time.tolist(),
+        *(decimals(df[column].values) for column in ('open','high','low','close','volume')),
+        (open_time + timeframe - 1).tolist(),
+        decimals(quote),
+        rng.integers(0, 5000, rows).tolist(),
+        decimals(df.volume.values*taker),
+        decimals(quote*taker),
+        ['0']*rows,
+    ]
+    return [list(kline) for kline in zip(*columns)]